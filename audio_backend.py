@@ -0,0 +1,331 @@
+import time
+import types
+import numpy as np
+
+
+class SoundDeviceBackend:
+    # Real devices through PortAudio
+    name = "sounddevice"
+
+    def __init__(self):
+        import sounddevice as sd
+        self.sd = sd
+        self.devices = None  # Catalogue, built on first use
+
+    def query_devices(self):
+        # Device dicts plus 'hostapi_name', enumerated once: PortAudio's
+        # list only changes on refresh_devices()
+        if self.devices is None:
+            hostapis = [api['name'] for api in self.sd.query_hostapis()]
+            self.devices = []
+            for d in self.sd.query_devices():
+                d = dict(d)
+                d['hostapi_name'] = hostapis[d['hostapi']]
+                self.devices.append(d)
+        return self.devices
+
+    def refresh_devices(self):
+        # Re-initialises PortAudio to pick up hot-plugged devices, which
+        # invalidates open streams: only call with the engine stopped.
+        # sounddevice has no public rescan, so this leans on its private
+        # _terminate()/_initialize() (tested with sounddevice 0.5); if they
+        # go away or fail, the device list is re-read without a rescan.
+        terminate = getattr(self.sd, '_terminate', None)
+        initialize = getattr(self.sd, '_initialize', None)
+        if terminate is None or initialize is None:
+            print(f"sounddevice {getattr(self.sd, '__version__', '?')} has no "
+                  f"_terminate/_initialize, rescanning without re-initialising PortAudio")
+        else:
+            try:
+                terminate()
+                initialize()
+            except Exception as e:
+                print(f"Re-initialising PortAudio failed ({e}), "
+                      f"hot-plugged devices may not show up")
+        self.devices = None
+        return self.query_devices()
+
+    def hostapi_name(self, device):
+        return device['hostapi_name']
+
+    def now(self):
+        # Callbacks run in real time, so the wall clock is the shared clock
+        return time.perf_counter()
+
+    def open_input(self, device, channels, samplerate, blocksize, callback, latency=None):
+        # latency: PortAudio hint, 'low' / 'high' or seconds (None: default)
+        return self.sd.InputStream(
+            device=device,
+            channels=channels,
+            samplerate=samplerate,
+            blocksize=blocksize,
+            callback=callback,
+            latency=latency
+        )
+
+    def open_output(self, device, channels, samplerate, blocksize, callback, latency=None):
+        return self.sd.OutputStream(
+            device=device,
+            channels=channels,
+            samplerate=samplerate,
+            blocksize=blocksize,
+            callback=callback,
+            latency=latency
+        )
+
+
+class SineSource:
+    def __init__(self, frequency=440.0, amplitude=0.5, name=None, samplerate=None, drift_ppm=0):
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.name = name or f"Sine {frequency:g} Hz"
+        self.samplerate = samplerate  # None: backend default
+        self.drift_ppm = drift_ppm
+        self.position = 0
+
+    def read(self, frames, channels, samplerate):
+        t = (self.position + np.arange(frames)) / samplerate
+        self.position += frames
+        block = (self.amplitude * np.sin(2 * np.pi * self.frequency * t)).astype(np.float32)
+        return np.repeat(block[:, None], channels, axis=1)
+
+
+class NoiseSource:
+    def __init__(self, amplitude=0.1, seed=None, name=None, samplerate=None, drift_ppm=0):
+        self.amplitude = amplitude
+        self.name = name or "White noise"
+        self.samplerate = samplerate
+        self.drift_ppm = drift_ppm
+        self.rng = np.random.default_rng(seed)
+
+    def read(self, frames, channels, samplerate):
+        block = self.rng.standard_normal((frames, channels), dtype=np.float32)
+        block *= self.amplitude
+        return block
+
+
+class CaptureSink:
+    def __init__(self, name=None, samplerate=None, drift_ppm=0):
+        self.name = name or "Capture"
+        self.samplerate = samplerate
+        self.drift_ppm = drift_ppm
+        self.blocks = []
+
+    def write(self, block):
+        self.blocks.append(block.copy())
+
+    def data(self, channels=2):
+        if not self.blocks:
+            return np.zeros((0, channels), dtype=np.float32)
+        return np.concatenate(self.blocks)
+
+    def clear(self):
+        self.blocks = []
+
+
+class LoopbackCable:
+    # A cable from a synthetic output to a synthetic input: put the same
+    # object in sources and sinks, and what the output plays at backend
+    # time t is captured by the input at t + delay frames. Works on the
+    # backend clock, so stream order and block sizes don't shift it.
+    def __init__(self, delay=0, name=None, samplerate=None, drift_ppm=0, capacity=1 << 20):
+        self.name = name or "Loopback"
+        self.samplerate = samplerate
+        self.drift_ppm = drift_ppm
+        self.delay = delay
+        self.capacity = capacity
+        self.backend = None
+        self.buffer = None
+        # Absolute frame held by each slot, so unplayed time reads silent
+        self.stamps = np.full(capacity, -1, dtype=np.int64)
+
+    def attach(self, backend):
+        self.backend = backend
+
+    def _frame(self, samplerate):
+        return int(round(self.backend.clock * samplerate))
+
+    def write(self, block):
+        rate = self.samplerate or self.backend.samplerate
+        if self.buffer is None:
+            self.buffer = np.zeros((self.capacity, block.shape[1]), dtype=np.float32)
+        frames = self._frame(rate) + np.arange(len(block))
+        slots = frames % self.capacity
+        self.buffer[slots] = block
+        self.stamps[slots] = frames
+
+    def read(self, frames, channels, samplerate):
+        # The block captured over the period that ends now
+        wanted = self._frame(samplerate) - self.delay - frames + np.arange(frames)
+        out = np.zeros((frames, channels), dtype=np.float32)
+        if self.buffer is None:
+            return out
+        slots = wanted % self.capacity
+        valid = self.stamps[slots] == wanted
+        out[valid] = self.buffer[slots[valid], :channels]
+        return out
+
+
+class SyntheticStatus:
+    # Same flags as sounddevice.CallbackFlags, never set
+    input_underflow = False
+    input_overflow = False
+    output_underflow = False
+    output_overflow = False
+    priming_output = False
+
+    def __bool__(self):
+        return False
+
+
+class SyntheticStream:
+    def __init__(self, backend, kind, endpoint, channels, samplerate, blocksize, callback,
+                 latency=None):
+        self.backend = backend
+        self.kind = kind
+        self.endpoint = endpoint
+        self.channels = channels
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.active = False
+        self.closed = False
+        self.buffer = np.zeros((blocksize, channels), dtype=np.float32)
+        # The device clock runs drift_ppm off its nominal rate
+        self.clock_rate = samplerate * (1 + getattr(endpoint, 'drift_ppm', 0) * 1e-6)
+        # Like sounddevice's Stream.latency: one block of device buffering
+        self.latency_hint = latency
+        self.latency = blocksize / samplerate
+        self.start_time = 0.0
+        self.blocks_done = 0
+
+    def start(self):
+        if self.closed:
+            raise RuntimeError("Stream is closed")
+        self.active = True
+        self.start_time = self.backend.clock
+        self.blocks_done = 0
+
+    def next_time(self):
+        return self.start_time + self.blocks_done * self.blocksize / self.clock_rate
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+        self.closed = True
+        if self in self.backend.streams:
+            self.backend.streams.remove(self)
+
+
+class SyntheticBackend:
+    # In-process fake devices: sources show up as input devices, sinks as
+    # output devices. Nothing runs by itself, call pump() to move blocks.
+    name = "synthetic"
+
+    def __init__(self, sources=(), sinks=(), samplerate=48000, channels=2):
+        self.sources = list(sources)
+        self.sinks = list(sinks)
+        self.samplerate = samplerate
+        self.channels = channels
+        self.streams = []
+        self.clock = 0.0  # seconds of simulated time
+        for endpoint in self.sources + self.sinks:
+            if hasattr(endpoint, 'attach'):
+                endpoint.attach(self)
+
+    def query_devices(self):
+        devices = []
+        for src in self.sources:
+            devices.append(self._device_info(len(devices), src, self.channels, 0))
+        for sink in self.sinks:
+            devices.append(self._device_info(len(devices), sink, 0, self.channels))
+        return devices
+
+    def _device_info(self, index, endpoint, max_in, max_out):
+        return {
+            'name': endpoint.name,
+            'index': index,
+            'hostapi': 0,
+            'hostapi_name': "Synthetic",
+            'max_input_channels': max_in,
+            'max_output_channels': max_out,
+            'default_samplerate': float(endpoint.samplerate or self.samplerate),
+        }
+
+    def refresh_devices(self):
+        return self.query_devices()
+
+    def hostapi_name(self, device):
+        return "Synthetic"
+
+    def now(self):
+        return self.clock
+
+    def open_input(self, device, channels, samplerate, blocksize, callback, latency=None):
+        if device is None or not 0 <= device < len(self.sources):
+            raise ValueError(f"No synthetic input device {device}")
+        stream = SyntheticStream(self, 'input', self.sources[device], channels,
+                                 samplerate, blocksize, callback, latency)
+        self.streams.append(stream)
+        return stream
+
+    def open_output(self, device, channels, samplerate, blocksize, callback, latency=None):
+        sink_idx = -1 if device is None else device - len(self.sources)
+        if not 0 <= sink_idx < len(self.sinks):
+            raise ValueError(f"No synthetic output device {device}")
+        stream = SyntheticStream(self, 'output', self.sinks[sink_idx], channels,
+                                 samplerate, blocksize, callback, latency)
+        self.streams.append(stream)
+        return stream
+
+    def pump(self, blocks=1, tick=None):
+        # Advance simulated time by `blocks` periods of the first active
+        # output (or input) stream. Every stream fires its callback whenever
+        # its own clock is due, so devices with different rates or drift
+        # interleave as they would on hardware. At equal times inputs run
+        # first, then tick(), then outputs.
+        streams = [s for s in self.streams if s.active]
+        if not streams:
+            for _ in range(blocks):
+                if tick is not None:
+                    tick()
+            return
+        ref = next((s for s in streams if s.kind == 'output'), streams[0])
+        period = ref.blocksize / ref.clock_rate
+        start = self.clock
+        end = start + blocks * period
+        ticks_done = 0
+        status = SyntheticStatus()
+        while True:
+            due = min(streams, key=lambda s: (s.next_time(), s.kind == 'output'))
+            t = due.next_time()
+            if tick is not None and ticks_done < blocks:
+                tick_time = start + ticks_done * period
+                if tick_time < t - 1e-9 or (tick_time < t + 1e-9 and due.kind == 'output'):
+                    self.clock = tick_time
+                    tick()
+                    ticks_done += 1
+                    continue
+            if t >= end - 1e-9:
+                break
+            self.clock = t
+            if due.kind == 'input':
+                indata = due.endpoint.read(due.blocksize, due.channels, due.samplerate)
+                due.callback(indata, due.blocksize, self._time(t, due), status)
+            else:
+                due.callback(due.buffer, due.blocksize, self._time(t, due), status)
+                due.endpoint.write(due.buffer)
+            due.blocks_done += 1
+            streams = [s for s in self.streams if s.active]
+            if not streams:
+                break
+        self.clock = end
+
+    def _time(self, now, stream):
+        # An input block was captured over the period before its callback;
+        # a sink takes the output block the moment it is written
+        period = stream.blocksize / stream.clock_rate
+        return types.SimpleNamespace(currentTime=now, inputBufferAdcTime=now - period,
+                                     outputBufferDacTime=now)
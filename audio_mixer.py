@@ -1,504 +1,838 @@
-import sys
-import numpy as np
-import sounddevice as sd
-from PyQt5.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QSlider, QComboBox, QProgressBar, QMessageBox, QSizePolicy, QDial, QDialog, QListWidget, QListWidgetItem
-)
-from PyQt5.QtCore import Qt, QTimer
-import re
-from scipy.signal import butter, lfilter
-
-class DeviceSelectDialog(QDialog):
-    def __init__(self, input_devices, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("Select Input Device")
-        self.setMinimumWidth(400)
-        self.selected_index = None
-        layout = QVBoxLayout()
-        self.list_widget = QListWidget()
-        # Use enumerate so idx matches the filtered input_devices list
-        for idx, d in enumerate(input_devices):
-            hostapi = sd.query_hostapis(d['hostapi'])['name']
-            item = QListWidgetItem(f"{d['name']} [{hostapi}]")
-            item.setData(Qt.UserRole, idx)
-            self.list_widget.addItem(item)
-        layout.addWidget(self.list_widget)
-        select_btn = QPushButton("Select")
-        select_btn.clicked.connect(self.select_device)
-        layout.addWidget(select_btn)
-        self.setLayout(layout)
-
-    def select_device(self):
-        selected = self.list_widget.currentItem()
-        if selected:
-            self.selected_index = selected.data(Qt.UserRole)
-            self.accept()
-
-class InputColumn(QWidget):
-    def __init__(self, input_devices, idx):
-        super().__init__()
-        self.input_devices = input_devices
-        self.selected_device_index = None  # No device selected by default
-
-        self.layout = QVBoxLayout()
-        self.setLayout(self.layout)
-        self.layout.setAlignment(Qt.AlignHCenter)
-
-        self.label = QLabel(f"Input {idx+1}")
-        self.layout.addWidget(self.label, alignment=Qt.AlignHCenter)
-
-        # Sample rate label above the device selector
-        self.sample_rate_label = QLabel("Sample Rate: 44100 Hz")
-        self.sample_rate_label.setAlignment(Qt.AlignHCenter)
-        self.layout.addWidget(self.sample_rate_label, alignment=Qt.AlignHCenter)
-
-        # Device select button (replaces dropdown)
-        self.device_select_btn = QPushButton("Select Input Device")
-        self.device_select_btn.clicked.connect(self.open_device_dialog)
-        self.layout.addWidget(self.device_select_btn)
-
-        # Show selected device name (fixed width, elided if too long)
-        self.selected_device_label = QLabel("No device selected")
-        self.selected_device_label.setAlignment(Qt.AlignHCenter)
-        self.selected_device_label.setFixedWidth(180)
-        self.selected_device_label.setWordWrap(False)
-        self.selected_device_label.setStyleSheet("QLabel { qproperty-alignment: AlignCenter; }")
-        self.layout.addWidget(self.selected_device_label)
-
-        # --- Knobs for Bass, Treble, Equalizer ---
-        knobs_layout = QHBoxLayout()
-        # Bass knob
-        bass_layout = QVBoxLayout()
-        self.bass_knob = QDial()
-        self.bass_knob.setMinimum(-10)
-        self.bass_knob.setMaximum(10)
-        self.bass_knob.setValue(0)
-        self.bass_knob.setNotchesVisible(True)
-        self.bass_knob.setFixedSize(48, 48)
-        bass_label = QLabel("Bass")
-        bass_label.setAlignment(Qt.AlignHCenter)
-        bass_layout.addWidget(self.bass_knob, alignment=Qt.AlignHCenter)
-        bass_layout.addWidget(bass_label)
-        knobs_layout.addLayout(bass_layout)
-        # Treble knob
-        treble_layout = QVBoxLayout()
-        self.treble_knob = QDial()
-        self.treble_knob.setMinimum(-10)
-        self.treble_knob.setMaximum(10)
-        self.treble_knob.setValue(0)
-        self.treble_knob.setNotchesVisible(True)
-        self.treble_knob.setFixedSize(48, 48)
-        treble_label = QLabel("Treble")
-        treble_label.setAlignment(Qt.AlignHCenter)
-        treble_layout.addWidget(self.treble_knob, alignment=Qt.AlignHCenter)
-        treble_layout.addWidget(treble_label)
-        knobs_layout.addLayout(treble_layout)
-        # Equalizer knob
-        eq_layout = QVBoxLayout()
-        self.eq_knob = QDial()
-        self.eq_knob.setMinimum(-10)
-        self.eq_knob.setMaximum(10)
-        self.eq_knob.setValue(0)
-        self.eq_knob.setNotchesVisible(True)
-        self.eq_knob.setFixedSize(48, 48)
-        eq_label = QLabel("EQ")
-        eq_label.setAlignment(Qt.AlignHCenter)
-        eq_layout.addWidget(self.eq_knob, alignment=Qt.AlignHCenter)
-        eq_layout.addWidget(eq_label)
-        knobs_layout.addLayout(eq_layout)
-        self.layout.addLayout(knobs_layout)
-        # --- End knobs ---
-
-        # Horizontal layout for visualizers (L and R), slider, and output buttons
-        slider_vis_layout = QHBoxLayout()
-
-        # Visualizers for left and right channels, side by side
-        lr_vis_layout = QHBoxLayout()
-        # Left channel
-        left_vis_layout = QVBoxLayout()
-        self.left_label = QLabel("L")
-        self.left_label.setAlignment(Qt.AlignHCenter)
-        left_vis_layout.addWidget(self.left_label)
-        self.left_visualizer = QProgressBar()
-        self.left_visualizer.setOrientation(Qt.Vertical)
-        self.left_visualizer.setMinimum(0)
-        self.left_visualizer.setMaximum(1000)
-        self.left_visualizer.setTextVisible(False)
-        self.left_visualizer.setFixedHeight(220)
-        self.left_visualizer.setFixedWidth(28)
-        self.left_visualizer.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Expanding)
-        left_vis_layout.addWidget(self.left_visualizer, alignment=Qt.AlignBottom)
-        lr_vis_layout.addLayout(left_vis_layout)
-
-        # Right channel
-        right_vis_layout = QVBoxLayout()
-        self.right_label = QLabel("R")
-        self.right_label.setAlignment(Qt.AlignHCenter)
-        right_vis_layout.addWidget(self.right_label)
-        self.right_visualizer = QProgressBar()
-        self.right_visualizer.setOrientation(Qt.Vertical)
-        self.right_visualizer.setMinimum(0)
-        self.right_visualizer.setMaximum(1000)
-        self.right_visualizer.setTextVisible(False)
-        self.right_visualizer.setFixedHeight(220)
-        self.right_visualizer.setFixedWidth(28)
-        self.right_visualizer.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Expanding)
-        right_vis_layout.addWidget(self.right_visualizer, alignment=Qt.AlignBottom)
-        lr_vis_layout.addLayout(right_vis_layout)
-
-        slider_vis_layout.addLayout(lr_vis_layout)
-
-        # Slider
-        self.slider = QSlider(Qt.Vertical)
-        self.slider.setMinimum(0)
-        self.slider.setMaximum(100)
-        self.slider.setValue(50)
-        self.slider.setTickPosition(QSlider.TicksBothSides)
-        self.slider.setTickInterval(10)
-        self.slider.setFixedHeight(220)
-        self.slider.setFixedWidth(40)
-        slider_vis_layout.addWidget(self.slider, alignment=Qt.AlignBottom)
-
-        # Output buttons A1-A6
-        output_btns_layout = QVBoxLayout()
-        self.output_buttons = []
-        for i in range(6):
-            btn = QPushButton(f"A{i+1}")
-            btn.setCheckable(True)
-            btn.setFixedWidth(36)
-            btn.setFixedHeight(28)
-            btn.setStyleSheet("QPushButton { margin: 2px; }")
-            btn.setChecked(False)  # No connection by default
-            output_btns_layout.addWidget(btn)
-            self.output_buttons.append(btn)
-        slider_vis_layout.addLayout(output_btns_layout)
-
-        self.layout.addLayout(slider_vis_layout)
-
-    def open_device_dialog(self):
-        dialog = DeviceSelectDialog(self.input_devices, self)
-        if dialog.exec_() == QDialog.Accepted and dialog.selected_index is not None:
-            self.selected_device_index = dialog.selected_index
-            self.selected_device_label.setText(self.get_selected_device_name())
-            if self.device_selected_callback:
-                self.device_selected_callback()
-
-    def get_selected_device_name(self):
-        if self.selected_device_index is None:
-            return "No device selected"
-        d = self.input_devices[self.selected_device_index]
-        hostapi = sd.query_hostapis(d['hostapi'])['name']
-        # Remove text in () or []
-        name = re.sub(r"[\(\[].*?[\)\]]", "", d['name']).strip()
-        return f"{name} {hostapi}"
-
-class AudioMixerApp(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("4-Input Audio Mixer")
-        self.resize(1200, 400)
-        self.num_inputs = 4
-        self.num_outputs = 6  # Now 6 outputs
-        self.channels = 2  # Stereo
-        self.samplerate = 48000  # or 44100, depending on your device
-        self.blocksize = 4096
-
-        # List input devices
-        self.input_devices = [d for d in sd.query_devices() if d['max_input_channels'] >= self.channels]
-        if len(self.input_devices) < self.num_inputs:
-            QMessageBox.critical(self, "Error", "Not enough stereo input devices detected!")
-            sys.exit(1)
-
-        # List output devices
-        self.output_devices = [d for d in sd.query_devices() if d['max_output_channels'] >= self.channels]
-        if len(self.output_devices) < self.num_outputs:
-            QMessageBox.critical(self, "Error", "Not enough stereo output devices detected!")
-            sys.exit(1)
-
-        # Main layout
-        self.main_layout = QVBoxLayout()
-        self.setLayout(self.main_layout)
-
-        # Inputs in columns
-        self.inputs_layout = QHBoxLayout()
-        self.inputs_layout.setContentsMargins(10, 10, 0, 10)  # Add more left margin, less right
-        self.inputs_layout.setSpacing(10)  # Optional: reduce spacing between columns
-        self.input_columns = []
-        for i in range(self.num_inputs):
-            col = InputColumn(self.input_devices, i)
-            self.inputs_layout.addWidget(col)
-            self.input_columns.append(col)
-
-        # Output selectors (vertical, to the right of inputs)
-        self.output_selector_layout = QVBoxLayout()
-        self.output_labels = []
-        self.output_selectors = []
-        for i in range(self.num_outputs):
-            label = QLabel(f"Output {i+1}")
-            self.output_labels.append(label)
-            self.output_selector_layout.addWidget(label, alignment=Qt.AlignHCenter)
-            selector = QComboBox()
-            selector.setFixedWidth(300)
-            selector.addItem("No device selected")  # Default: none selected
-            for d in self.output_devices:
-                hostapi = sd.query_hostapis(d['hostapi'])['name']
-                selector.addItem(f"{d['name']} [{hostapi}]")
-            selector.setCurrentIndex(0)  # No device selected by default
-            self.output_selector_layout.addWidget(selector)
-            self.output_selectors.append(selector)
-        self.inputs_layout.addLayout(self.output_selector_layout)
-
-        self.main_layout.addLayout(self.inputs_layout)
-
-        # Remove start/stop buttons
-        # self.buttons_layout = QHBoxLayout()
-        # self.start_btn = QPushButton("Start Mixer")
-        # self.stop_btn = QPushButton("Stop Mixer")
-        # self.stop_btn.setEnabled(False)
-        # self.buttons_layout.addWidget(self.start_btn)
-        # self.buttons_layout.addWidget(self.stop_btn)
-        # self.main_layout.addLayout(self.buttons_layout)
-
-        # self.start_btn.clicked.connect(self.start_mixer)
-        # self.stop_btn.clicked.connect(self.stop_mixer)
-
-        self.input_buffers = [np.zeros((self.blocksize, self.channels), dtype=np.float32)
-                              for _ in range(self.num_inputs)]
-        self.running = False
-
-        # Timer for mixing loop and visualizer update
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.mix_and_route)
-
-        # Connect input device selection to restart mixer
-        for col in self.input_columns:
-            col.device_selected_callback = self.reinitialize_mixer
-
-        # Connect output device selection to restart mixer
-        for selector in self.output_selectors:
-            selector.currentIndexChanged.connect(self.reinitialize_mixer)
-
-        # Start mixer automatically after a delay
-        QTimer.singleShot(2000, self.start_mixer)
-
-        # Remove the full screen button from the window
-        self.setWindowFlags(self.windowFlags() & ~Qt.WindowMaximizeButtonHint)
-
-    def reinitialize_mixer(self, *args, **kwargs):
-        try:
-            self.stop_mixer()
-        except Exception as e:
-            print("Error stopping mixer:", e)
-        QTimer.singleShot(300, self.safe_start_mixer)
-
-    def safe_start_mixer(self):
-        try:
-            self.start_mixer()
-        except Exception as e:
-            print("Error starting mixer:", e)
-            QMessageBox.critical(self, "Audio Error", f"Could not start audio streams:\n{e}")
-
-    def input_callback_factory(self, idx):
-        def callback(indata, frames, time, status):
-            self.input_buffers[idx] = indata.copy()
-            # Stereo RMS for visualizers
-            if indata.shape[1] == 2:
-                left_rms = np.sqrt(np.mean(np.square(indata[:, 0])))
-                right_rms = np.sqrt(np.mean(np.square(indata[:, 1])))
-            else:
-                left_rms = right_rms = np.sqrt(np.mean(np.square(indata)))
-            # More steps: set maximum to 1000 for finer granularity
-            sensitivity = 6000  # Adjust as needed for your signal
-            self.input_columns[idx].left_visualizer.setMaximum(1000)
-            self.input_columns[idx].right_visualizer.setMaximum(1000)
-            self.input_columns[idx].left_visualizer.setValue(int(min(1000, left_rms * sensitivity)))
-            self.input_columns[idx].right_visualizer.setValue(int(min(1000, right_rms * sensitivity)))
-        return callback
-
-    def start_mixer(self):
-        device_indices = []
-        for col in self.input_columns:
-            # If no device selected, append None (will use silence)
-            if col.selected_device_index is None:
-                device_indices.append(None)
-            else:
-                device_indices.append(col.input_devices[col.selected_device_index]['index'])
-
-        output_device_indices = []
-        for selector in self.output_selectors:
-            # If no device selected, append None (will not create output stream)
-            if selector.currentIndex() == 0:
-                output_device_indices.append(None)
-            else:
-                output_device_indices.append(self.output_devices[selector.currentIndex() - 1]['index'])
-
-        try:
-            self.inputs = []
-            for i in range(self.num_inputs):
-                if device_indices[i] is not None:
-                    dev = self.input_devices[self.input_columns[i].selected_device_index]
-                    print(f"Opening input {i}: {dev['name']} idx={dev['index']} channels={self.channels}")
-                    self.inputs.append(
-                        sd.InputStream(
-                            device=dev['index'],
-                            channels=self.channels,
-                            samplerate=self.samplerate,
-                            blocksize=self.blocksize,
-                            callback=self.input_callback_factory(i)
-                        )
-                    )
-                    self.inputs[-1].start()
-                else:
-                    # No device: fill buffer with zeros in callback
-                    self.inputs.append(None)
-
-            self.outputs = []
-            for i in range(self.num_outputs):
-                if output_device_indices[i] is not None:
-                    self.outputs.append(
-                        sd.OutputStream(
-                            device=output_device_indices[i],
-                            channels=self.channels,
-                            samplerate=self.samplerate,
-                            blocksize=self.blocksize,
-                            callback=self.make_output_callback(i)
-                        )
-                    )
-                    self.outputs[-1].start()
-                else:
-                    self.outputs.append(None)
-
-            self.running = True
-            self.timer.start(20)
-            # self.start_btn.setEnabled(False)
-            # self.stop_btn.setEnabled(True)
-        except Exception as e:
-            print("Audio stream error:", e)
-            QMessageBox.critical(self, "Audio Error", f"Could not start audio streams:\n{e}")
-            if hasattr(self, 'inputs'):
-                for inp in self.inputs:
-                    try:
-                        if inp is not None:
-                            inp.stop()
-                            inp.close()
-                    except Exception:
-                        pass
-            if hasattr(self, 'outputs'):
-                for out in self.outputs:
-                    try:
-                        if out is not None:
-                            out.stop()
-                            out.close()
-                    except Exception:
-                        pass
-            self.running = False
-            # self.start_btn.setEnabled(True)
-            # self.stop_btn.setEnabled(False)
-
-    def stop_mixer(self):
-        self.running = False
-        self.timer.stop()
-        for inp in self.inputs:
-            inp.stop()
-            inp.close()
-        for out in self.outputs:
-            out.stop()
-            out.close()
-        # self.start_btn.setEnabled(True)
-        # self.stop_btn.setEnabled(False)
-        for col in self.input_columns:
-            col.left_visualizer.setValue(0)
-            col.right_visualizer.setValue(0)
-
-    def mix_and_route(self):
-        self.mixed_buffers = []
-        for out_idx in range(self.num_outputs):
-            mix = np.zeros((self.blocksize, self.channels), dtype=np.float32)
-            active = 0
-            for in_idx, col in enumerate(self.input_columns):
-                slider_val = col.slider.value() / 100.0
-                lvl = np.power(slider_val, 4)
-                if col.output_buttons[out_idx].isChecked():
-                    # --- Apply Bass, Treble, EQ ---
-                    buf = self.input_buffers[in_idx]
-                    bass = col.bass_knob.value()
-                    treble = col.treble_knob.value()
-                    eq = col.eq_knob.value()
-                    buf = apply_bass(buf, bass, self.samplerate)
-                    buf = apply_treble(buf, treble, self.samplerate)
-                    buf = apply_eq(buf, eq, self.samplerate)
-                    # --- End filters ---
-                    mix += buf * lvl
-                    active += lvl
-            if active > 0:
-                mix /= active
-            self.mixed_buffers.append(mix.astype(np.float32))
-        levels = [col.slider.value() / 100.0 for col in self.input_columns]
-        mixed = sum(buf * lvl for buf, lvl in zip(self.input_buffers, levels))
-        if sum(levels) > 0:
-            mixed /= sum(levels)
-        else:
-            mixed[:] = 0
-        self.mixed_buffer = mixed.astype(np.float32)
-
-    def make_output_callback(self, out_idx):
-        def output_callback(outdata, frames, time, status):
-            if hasattr(self, 'mixed_buffers') and len(self.mixed_buffers) > out_idx:
-                outdata[:] = self.mixed_buffers[out_idx]
-            else:
-                outdata[:] = np.zeros((frames, self.channels), dtype=np.float32)
-        return output_callback
-
-    def restart_mixer_on_input_change(self):
-        self.stop_mixer()
-        self.start_mixer()
-
-    def restart_mixer_on_output_change(self, idx):
-        self.stop_mixer()
-        self.start_mixer()
-
-def apply_bass(audio, gain, samplerate):
-    # gain: -10 to +10, 0 = no change
-    if gain == 0:
-        return audio
-    b, a = butter(2, 200 / (samplerate / 2), btype='low')
-    filtered = lfilter(b, a, audio, axis=0)
-    return audio + (gain / 10.0) * filtered
-
-def apply_treble(audio, gain, samplerate):
-    if gain == 0:
-        return audio
-    b, a = butter(2, 4000 / (samplerate / 2), btype='high')
-    filtered = lfilter(b, a, audio, axis=0)
-    return audio + (gain / 10.0) * filtered
-
-def apply_eq(audio, gain, samplerate):
-    if gain == 0:
-        return audio
-    b, a = butter(2, [500/(samplerate/2), 2000/(samplerate/2)], btype='band')
-    filtered = lfilter(b, a, audio, axis=0)
-    return audio + (gain / 10.0) * filtered
-
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = AudioMixerApp()
-    window.show()
-    sys.exit(app.exec_())
-
-import sounddevice as sd
-
-device_index = 2  # Replace with the index you get from your selection
-channels = 2      # Or 1 for mono
-samplerate = 44100
-
-print(sd.query_devices(device_index))
-try:
-    with sd.InputStream(device=device_index, channels=channels, samplerate=samplerate) as stream:
-        print("Stream opened successfully!")
-except Exception as e:
-    print("Error:", e)
-
-import sounddevice as sd
-for i, d in enumerate(sd.query_devices()):
+import time
+_started = time.perf_counter()  # For the startup report; before the heavy imports
+
+import sys
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QSlider, QComboBox, QProgressBar, QMessageBox, QSizePolicy, QDial, QDialog, QListWidget, QListWidgetItem,
+    QTableWidget, QTableWidgetItem, QInputDialog, QScrollArea, QFileDialog
+)
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QColor, QPainter, QPen
+import os
+import re
+
+import dsp
+from audio_backend import SoundDeviceBackend
+from netaudio import NetworkBackend, parse_endpoint
+from latency import LATENCY_PROFILES, profile_for
+from meters import PEAK, RMS, MeterBallistics
+from mixer_engine import MixerEngine
+from stats import StatsServer
+
+class DeviceSelectDialog(QDialog):
+    def __init__(self, input_devices, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Select Input Device")
+        self.setMinimumWidth(400)
+        self.selected_index = None
+        layout = QVBoxLayout()
+        self.list_widget = QListWidget()
+        # Use enumerate so idx matches the filtered input_devices list
+        for idx, d in enumerate(input_devices):
+            item = QListWidgetItem(f"{d['name']} [{d['hostapi_name']}]")
+            item.setData(Qt.UserRole, idx)
+            self.list_widget.addItem(item)
+        layout.addWidget(self.list_widget)
+        select_btn = QPushButton("Select")
+        select_btn.clicked.connect(self.select_device)
+        layout.addWidget(select_btn)
+        self.setLayout(layout)
+
+    def select_device(self):
+        selected = self.list_widget.currentItem()
+        if selected:
+            self.selected_index = selected.data(Qt.UserRole)
+            self.accept()
+
+class StatsDialog(QDialog):
+    # Live per-stream callback stats; refreshes itself while open
+    COLUMNS = ("Stream", "Callbacks", "In under", "In over", "Out under", "Out over",
+               "p99 time (ms)", "Max gap (ms)", "p99 load", "Max load", "Ring fill",
+               "Ring under/over")
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Stream Statistics")
+        self.resize(900, 300)
+        self.engine = engine
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
+
+    def refresh(self):
+        stats = self.engine.callback_stats()
+        rings = {f"input{i}": s for i, s in enumerate(self.engine.input_ring_stats()) if s}
+        rings.update({f"output{i}": s for i, s in enumerate(self.engine.output_ring_stats()) if s})
+        self.table.setRowCount(len(stats))
+        for row, (name, s) in enumerate(sorted(stats.items())):
+            ring = rings.get(name)
+            x = s['xruns']
+            cells = (name, s['callbacks'], x['input_underflow'], x['input_overflow'],
+                     x['output_underflow'], x['output_overflow'],
+                     f"{s['duration_p99'] * 1e3:.2f}", f"{s['gap_max'] * 1e3:.1f}",
+                     f"{s['load_p99']:.0%}", f"{s['load_max']:.0%}",
+                     f"{ring['fill_level']:.0%}" if ring else "-",
+                     f"{ring['underruns']}/{ring['overruns']}" if ring else "-")
+            for col, value in enumerate(cells):
+                self.table.setItem(row, col, QTableWidgetItem(str(value)))
+
+
+class LevelMeter(QProgressBar):
+    # Meter bar with a held-peak marker: a line across the bar at
+    # peak_value, on the bar's own scale
+    def __init__(self):
+        super().__init__()
+        self.peak_value = 0
+
+    def set_peak(self, value):
+        if value != self.peak_value:
+            self.peak_value = value
+            self.update()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        span = self.maximum() - self.minimum()
+        if self.peak_value <= self.minimum() or span <= 0:
+            return
+        y = round((1 - (self.peak_value - self.minimum()) / span) * (self.height() - 2)) + 1
+        painter = QPainter(self)
+        painter.setPen(QPen(QColor(255, 170, 0), 2))
+        painter.drawLine(0, y, self.width(), y)
+        painter.end()
+
+
+class InputColumn(QWidget):
+    def __init__(self, input_devices, idx, num_outputs=6):
+        super().__init__()
+        self.input_devices = input_devices
+        self.selected_device_index = None  # No device selected by default
+
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+        self.layout.setAlignment(Qt.AlignHCenter)
+
+        self.label = QLabel(f"Input {idx+1}")
+        self.layout.addWidget(self.label, alignment=Qt.AlignHCenter)
+
+        # Sample rate label above the device selector
+        self.sample_rate_label = QLabel("Sample Rate: -")
+        self.sample_rate_label.setAlignment(Qt.AlignHCenter)
+        self.layout.addWidget(self.sample_rate_label, alignment=Qt.AlignHCenter)
+
+        # Device select button (replaces dropdown)
+        self.device_select_btn = QPushButton("Select Input Device")
+        self.device_select_btn.clicked.connect(self.open_device_dialog)
+        self.layout.addWidget(self.device_select_btn)
+
+        # Show selected device name (fixed width, elided if too long)
+        self.selected_device_label = QLabel("No device selected")
+        self.selected_device_label.setAlignment(Qt.AlignHCenter)
+        self.selected_device_label.setFixedWidth(180)
+        self.selected_device_label.setWordWrap(False)
+        self.selected_device_label.setStyleSheet("QLabel { qproperty-alignment: AlignCenter; }")
+        self.layout.addWidget(self.selected_device_label)
+
+        # --- Knobs for Bass, Treble, Equalizer ---
+        knobs_layout = QHBoxLayout()
+        # Bass knob
+        bass_layout = QVBoxLayout()
+        self.bass_knob = QDial()
+        self.bass_knob.setMinimum(-10)
+        self.bass_knob.setMaximum(10)
+        self.bass_knob.setValue(0)
+        self.bass_knob.setNotchesVisible(True)
+        self.bass_knob.setFixedSize(48, 48)
+        bass_label = QLabel("Bass")
+        bass_label.setAlignment(Qt.AlignHCenter)
+        bass_layout.addWidget(self.bass_knob, alignment=Qt.AlignHCenter)
+        bass_layout.addWidget(bass_label)
+        knobs_layout.addLayout(bass_layout)
+        # Treble knob
+        treble_layout = QVBoxLayout()
+        self.treble_knob = QDial()
+        self.treble_knob.setMinimum(-10)
+        self.treble_knob.setMaximum(10)
+        self.treble_knob.setValue(0)
+        self.treble_knob.setNotchesVisible(True)
+        self.treble_knob.setFixedSize(48, 48)
+        treble_label = QLabel("Treble")
+        treble_label.setAlignment(Qt.AlignHCenter)
+        treble_layout.addWidget(self.treble_knob, alignment=Qt.AlignHCenter)
+        treble_layout.addWidget(treble_label)
+        knobs_layout.addLayout(treble_layout)
+        # Equalizer knob
+        eq_layout = QVBoxLayout()
+        self.eq_knob = QDial()
+        self.eq_knob.setMinimum(-10)
+        self.eq_knob.setMaximum(10)
+        self.eq_knob.setValue(0)
+        self.eq_knob.setNotchesVisible(True)
+        self.eq_knob.setFixedSize(48, 48)
+        eq_label = QLabel("EQ")
+        eq_label.setAlignment(Qt.AlignHCenter)
+        eq_layout.addWidget(self.eq_knob, alignment=Qt.AlignHCenter)
+        eq_layout.addWidget(eq_label)
+        knobs_layout.addLayout(eq_layout)
+        # Compressor knob: 0 is off, each step lowers the threshold 3 dB
+        # at a 4:1 ratio
+        comp_layout = QVBoxLayout()
+        self.comp_knob = QDial()
+        self.comp_knob.setMinimum(0)
+        self.comp_knob.setMaximum(10)
+        self.comp_knob.setValue(0)
+        self.comp_knob.setNotchesVisible(True)
+        self.comp_knob.setFixedSize(48, 48)
+        comp_label = QLabel("Comp")
+        comp_label.setAlignment(Qt.AlignHCenter)
+        comp_layout.addWidget(self.comp_knob, alignment=Qt.AlignHCenter)
+        comp_layout.addWidget(comp_label)
+        knobs_layout.addLayout(comp_layout)
+        self.layout.addLayout(knobs_layout)
+        # Compressor gain reduction
+        self.gr_label = QLabel("GR 0.0 dB")
+        self.gr_label.setAlignment(Qt.AlignHCenter)
+        self.layout.addWidget(self.gr_label, alignment=Qt.AlignHCenter)
+
+        # Convolution insert after the tone stack
+        self.ir_btn = QPushButton("IR: none")
+        self.layout.addWidget(self.ir_btn)
+        # --- End knobs ---
+
+        # Horizontal layout for visualizers (L and R), slider, and output buttons
+        slider_vis_layout = QHBoxLayout()
+
+        # Visualizers for left and right channels, side by side
+        lr_vis_layout = QHBoxLayout()
+        # Left channel
+        left_vis_layout = QVBoxLayout()
+        self.left_label = QLabel("L")
+        self.left_label.setAlignment(Qt.AlignHCenter)
+        left_vis_layout.addWidget(self.left_label)
+        self.left_visualizer = LevelMeter()
+        self.left_visualizer.setOrientation(Qt.Vertical)
+        self.left_visualizer.setMinimum(0)
+        self.left_visualizer.setMaximum(1000)
+        self.left_visualizer.setTextVisible(False)
+        self.left_visualizer.setFixedHeight(220)
+        self.left_visualizer.setFixedWidth(28)
+        self.left_visualizer.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Expanding)
+        left_vis_layout.addWidget(self.left_visualizer, alignment=Qt.AlignBottom)
+        lr_vis_layout.addLayout(left_vis_layout)
+
+        # Right channel
+        right_vis_layout = QVBoxLayout()
+        self.right_label = QLabel("R")
+        self.right_label.setAlignment(Qt.AlignHCenter)
+        right_vis_layout.addWidget(self.right_label)
+        self.right_visualizer = LevelMeter()
+        self.right_visualizer.setOrientation(Qt.Vertical)
+        self.right_visualizer.setMinimum(0)
+        self.right_visualizer.setMaximum(1000)
+        self.right_visualizer.setTextVisible(False)
+        self.right_visualizer.setFixedHeight(220)
+        self.right_visualizer.setFixedWidth(28)
+        self.right_visualizer.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Expanding)
+        right_vis_layout.addWidget(self.right_visualizer, alignment=Qt.AlignBottom)
+        lr_vis_layout.addLayout(right_vis_layout)
+
+        slider_vis_layout.addLayout(lr_vis_layout)
+
+        # Slider
+        self.slider = QSlider(Qt.Vertical)
+        self.slider.setMinimum(0)
+        self.slider.setMaximum(100)
+        self.slider.setValue(50)
+        self.slider.setTickPosition(QSlider.TicksBothSides)
+        self.slider.setTickInterval(10)
+        self.slider.setFixedHeight(220)
+        self.slider.setFixedWidth(40)
+        slider_vis_layout.addWidget(self.slider, alignment=Qt.AlignBottom)
+
+        # Output buttons A1-An
+        output_btns_layout = QVBoxLayout()
+        self.output_buttons = []
+        for i in range(num_outputs):
+            btn = QPushButton(f"A{i+1}")
+            btn.setCheckable(True)
+            btn.setFixedWidth(36)
+            btn.setFixedHeight(28)
+            btn.setStyleSheet("QPushButton { margin: 2px; }")
+            btn.setChecked(False)  # No connection by default
+            output_btns_layout.addWidget(btn)
+            self.output_buttons.append(btn)
+        slider_vis_layout.addLayout(output_btns_layout)
+
+        self.layout.addLayout(slider_vis_layout)
+
+    def open_device_dialog(self):
+        dialog = DeviceSelectDialog(self.input_devices, self)
+        if dialog.exec_() == QDialog.Accepted and dialog.selected_index is not None:
+            self.selected_device_index = dialog.selected_index
+            self.selected_device_label.setText(self.get_selected_device_name())
+            rate = self.input_devices[self.selected_device_index]['default_samplerate']
+            self.sample_rate_label.setText(f"Sample Rate: {int(rate)} Hz")
+            if self.device_selected_callback:
+                self.device_selected_callback()
+
+    def get_selected_device_name(self):
+        if self.selected_device_index is None:
+            return "No device selected"
+        d = self.input_devices[self.selected_device_index]
+        # Remove text in () or []
+        name = re.sub(r"[\(\[].*?[\)\]]", "", d['name']).strip()
+        return f"{name} {d['hostapi_name']}"
+
+class AudioMixerApp(QWidget):
+    def __init__(self, stats_port=9464, num_inputs=4, num_outputs=6, dsp_workers=None,
+                 net_endpoints=()):
+        super().__init__()
+        self.setWindowTitle(f"{num_inputs}-Input Audio Mixer")
+        self.resize(1200, 400)
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+        # Per-input DSP threads; by default one per 8 inputs, leaving a core
+        # for the mixing thread and the GUI
+        if dsp_workers is None:
+            dsp_workers = min((os.cpu_count() or 1) - 1, num_inputs // 8)
+        self.dsp_workers = max(0, dsp_workers)
+        self.channels = 2  # Stereo
+        self.samplerate = None  # Follow the first selected output's native rate
+        # Blocksize and PortAudio latency hint come from the profile; the
+        # engine doubles the blocksize on sustained xruns
+        self.latency_profile = 'normal'
+        self.blocksize, self.latency = LATENCY_PROFILES[self.latency_profile]
+
+        # Startup phases (name, seconds since launch), printed once audio flows
+        self.startup = [('imports', time.perf_counter() - _started)]
+        self.startup_reported = False
+
+        self.backend = SoundDeviceBackend()
+        if net_endpoints:
+            # RTP streams listed after the sound cards, routed like them
+            self.backend = NetworkBackend(self.backend, net_endpoints)
+        devices = self.backend.query_devices()
+        self.startup.append(('devices', time.perf_counter() - _started))
+
+        # List input devices
+        self.input_devices = [d for d in devices if d['max_input_channels'] >= self.channels]
+        # Columns can share a device, so one of each is enough
+        if not self.input_devices:
+            QMessageBox.critical(self, "Error", "No stereo input devices detected!")
+            sys.exit(1)
+
+        # List output devices
+        self.output_devices = [d for d in devices if d['max_output_channels'] >= self.channels]
+        if not self.output_devices:
+            QMessageBox.critical(self, "Error", "No stereo output devices detected!")
+            sys.exit(1)
+
+        # Main layout
+        self.main_layout = QVBoxLayout()
+        self.setLayout(self.main_layout)
+
+        # Inputs in columns, scrolling sideways when there are many
+        self.inputs_layout = QHBoxLayout()
+        self.inputs_layout.setContentsMargins(10, 10, 0, 10)  # Add more left margin, less right
+        self.inputs_layout.setSpacing(10)  # Optional: reduce spacing between columns
+        self.columns_layout = QHBoxLayout()
+        self.columns_layout.setContentsMargins(0, 0, 0, 0)
+        self.columns_layout.setSpacing(10)
+        self.input_columns = []
+        for i in range(self.num_inputs):
+            col = InputColumn(self.input_devices, i, self.num_outputs)
+            self.columns_layout.addWidget(col)
+            self.input_columns.append(col)
+        columns = QWidget()
+        columns.setLayout(self.columns_layout)
+        self.columns_scroll = QScrollArea()
+        self.columns_scroll.setWidgetResizable(True)
+        self.columns_scroll.setWidget(columns)
+        self.inputs_layout.addWidget(self.columns_scroll, stretch=1)
+
+        # Output selectors (vertical, to the right of inputs)
+        self.output_selector_layout = QVBoxLayout()
+        self.output_labels = []
+        self.output_selectors = []
+        self.output_gr_labels = []
+        for i in range(self.num_outputs):
+            label = QLabel(f"Output {i+1}")
+            self.output_labels.append(label)
+            self.output_selector_layout.addWidget(label, alignment=Qt.AlignHCenter)
+            selector = QComboBox()
+            selector.setFixedWidth(300)
+            self.fill_output_selector(selector)
+            # Convolution insert on the bus (room correction, long EQ)
+            ir_btn = QPushButton("IR: none")
+            ir_btn.setFixedWidth(110)
+            ir_btn.clicked.connect(lambda _, i=i, b=ir_btn: self.choose_ir(self.engine.set_output_ir, i, b))
+            row = QHBoxLayout()
+            row.addWidget(selector)
+            row.addWidget(ir_btn)
+            # Limiter gain reduction on the bus
+            gr_label = QLabel("GR 0.0")
+            gr_label.setFixedWidth(60)
+            row.addWidget(gr_label)
+            self.output_gr_labels.append(gr_label)
+            self.output_selector_layout.addLayout(row)
+            self.output_selectors.append(selector)
+        self.latency_selector = QComboBox()
+        for name, (blocksize, _) in LATENCY_PROFILES.items():
+            self.latency_selector.addItem(f"Latency: {name} ({blocksize} frames)", name)
+        self.latency_selector.setCurrentIndex(list(LATENCY_PROFILES).index(self.latency_profile))
+        self.output_selector_layout.addWidget(self.latency_selector)
+        self.latency_label = QLabel("Latency: -")
+        self.output_selector_layout.addWidget(self.latency_label, alignment=Qt.AlignHCenter)
+        self.loopback_btn = QPushButton("Loopback Test")
+        self.loopback_btn.clicked.connect(self.run_loopback_test)
+        self.output_selector_layout.addWidget(self.loopback_btn)
+        self.record_btn = QPushButton("Record")
+        self.record_btn.setCheckable(True)
+        self.record_btn.toggled.connect(self.toggle_recording)
+        self.output_selector_layout.addWidget(self.record_btn)
+        self.record_dir = os.path.expanduser("~")
+        self.rescan_btn = QPushButton("Rescan Devices")
+        self.rescan_btn.clicked.connect(self.rescan_devices)
+        self.output_selector_layout.addWidget(self.rescan_btn)
+        self.stats_btn = QPushButton("Stats")
+        self.stats_btn.clicked.connect(self.open_stats_dialog)
+        self.output_selector_layout.addWidget(self.stats_btn)
+        self.inputs_layout.addLayout(self.output_selector_layout)
+
+        self.main_layout.addLayout(self.inputs_layout)
+
+        # Remove start/stop buttons
+        # self.buttons_layout = QHBoxLayout()
+        # self.start_btn = QPushButton("Start Mixer")
+        # self.stop_btn = QPushButton("Stop Mixer")
+        # self.stop_btn.setEnabled(False)
+        # self.buttons_layout.addWidget(self.start_btn)
+        # self.buttons_layout.addWidget(self.stop_btn)
+        # self.main_layout.addLayout(self.buttons_layout)
+
+        # self.start_btn.clicked.connect(self.start_mixer)
+        # self.stop_btn.clicked.connect(self.stop_mixer)
+
+        self.engine = MixerEngine(self.backend, num_inputs=self.num_inputs,
+                                  num_outputs=self.num_outputs, channels=self.channels,
+                                  samplerate=self.samplerate, blocksize=self.blocksize,
+                                  scheduling='pull', latency=self.latency,
+                                  adaptive_blocksize=True, dsp_workers=self.dsp_workers)
+        self.connect_engine_controls()
+        self.running = False
+        self.stats_dialog = None
+
+        # Prometheus text on http://127.0.0.1:<stats_port>/metrics (0 = off)
+        self.stats_server = None
+        if stats_port:
+            try:
+                self.stats_server = StatsServer(self.engine, port=stats_port).start()
+            except OSError as e:
+                print(f"Stats endpoint on port {stats_port} unavailable:", e)
+
+        # Timer for the mixing loop, only used if the engine is not clocked
+        # by its master output
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.mix_and_route)
+
+        # Meters poll the engine's level store at a capped frame rate; the
+        # audio callbacks never touch the widgets
+        self.meter_fps = 30
+        # Once a second: xrun watchdog, latency readout, loopback results
+        self.status_timer = QTimer()
+        self.status_timer.timeout.connect(self.update_status)
+        self.loopback_probe = None
+        self.latency_selector.currentIndexChanged.connect(self.change_latency_profile)
+        self.meter_timer = QTimer()
+        self.meter_timer.timeout.connect(self.update_visualizers)
+        self.rms_ballistics = MeterBallistics((self.num_inputs, self.channels))
+        self.peak_ballistics = MeterBallistics((self.num_inputs, self.channels), release=1.0, hold=2.0)
+        self.last_meter_update = time.monotonic()
+        self.clip_shown = [[False, False] for _ in range(self.num_inputs)]
+
+        # Connect input device selection to restart mixer
+        for col in self.input_columns:
+            col.device_selected_callback = self.reinitialize_mixer
+
+        # Connect output device selection to restart mixer
+        for selector in self.output_selectors:
+            selector.currentIndexChanged.connect(self.reinitialize_mixer)
+
+        # Start the mixer as soon as the event loop runs, then load the
+        # filter design code off the audio path
+        QTimer.singleShot(0, self.start_mixer)
+        QTimer.singleShot(0, dsp.preload)
+        self.startup.append(('window', time.perf_counter() - _started))
+
+        # Remove the full screen button from the window
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowMaximizeButtonHint)
+
+    def reinitialize_mixer(self, *args, **kwargs):
+        # Device picked: a running engine swaps only the streams that changed
+        if not self.engine.running:
+            self.safe_start_mixer()
+            return
+        try:
+            self.engine.set_devices(self.selected_input_devices(), self.selected_output_devices())
+        except Exception as e:
+            print("Error switching devices:", e)
+            QMessageBox.critical(self, "Audio Error", f"Could not open audio stream:\n{e}")
+
+    def safe_start_mixer(self):
+        try:
+            self.start_mixer()
+        except Exception as e:
+            print("Error starting mixer:", e)
+            QMessageBox.critical(self, "Audio Error", f"Could not start audio streams:\n{e}")
+
+    def connect_engine_controls(self):
+        # Push widget changes into the engine's parameter store; the DSP
+        # never reads widgets. Each change publishes one snapshot.
+        for i, col in enumerate(self.input_columns):
+            col.slider.valueChanged.connect(lambda v, i=i: self.engine.set_level(i, v / 100.0))
+            col.bass_knob.valueChanged.connect(lambda v, i=i: self.engine.set_tone(i, bass=v))
+            col.treble_knob.valueChanged.connect(lambda v, i=i: self.engine.set_tone(i, treble=v))
+            col.eq_knob.valueChanged.connect(lambda v, i=i: self.engine.set_tone(i, eq=v))
+            col.comp_knob.valueChanged.connect(
+                lambda v, i=i: self.engine.set_compressor(i, threshold=-3.0 * v, ratio=4.0 if v else 1.0))
+            col.ir_btn.clicked.connect(
+                lambda _, i=i, b=col.ir_btn: self.choose_ir(self.engine.set_input_ir, i, b))
+            for j, btn in enumerate(col.output_buttons):
+                btn.toggled.connect(lambda checked, i=i, j=j: self.engine.set_route(i, j, checked))
+        # Current widget state, as a single snapshot
+        with self.engine.params.edit() as p:
+            for i, col in enumerate(self.input_columns):
+                p['level'][i] = col.slider.value() / 100.0
+                p['bass'][i] = col.bass_knob.value()
+                p['treble'][i] = col.treble_knob.value()
+                p['eq'][i] = col.eq_knob.value()
+                p['comp_threshold'][i] = -3.0 * col.comp_knob.value()
+                p['comp_ratio'][i] = 4.0 if col.comp_knob.value() else 1.0
+                p['routes'][i] = [btn.isChecked() for btn in col.output_buttons]
+
+    def selected_input_devices(self):
+        # (device index, native rate) per input, (None, None) for silence
+        devices = []
+        for col in self.input_columns:
+            if col.selected_device_index is None:
+                devices.append((None, None))
+            else:
+                d = col.input_devices[col.selected_device_index]
+                devices.append((d['index'], d['default_samplerate']))
+        return devices
+
+    def selected_output_devices(self):
+        # (device index, native rate) per output, (None, None) for no stream
+        devices = []
+        for selector in self.output_selectors:
+            if selector.currentIndex() == 0:
+                devices.append((None, None))
+            else:
+                d = self.output_devices[selector.currentIndex() - 1]
+                devices.append((d['index'], d['default_samplerate']))
+        return devices
+
+    def start_mixer(self):
+        # Already running (a device was picked before the delayed start):
+        # set_devices() has swapped the changed streams
+        self.engine.set_devices(self.selected_input_devices(), self.selected_output_devices())
+        if self.engine.running:
+            return
+        try:
+            self.engine.start()
+            self.running = True
+            if self.engine.scheduling == 'timer':
+                self.timer.start(20)
+            self.last_meter_update = time.monotonic()
+            self.meter_timer.start(int(1000 / self.meter_fps))
+            self.status_timer.start(1000)
+            if not self.startup_reported:
+                self.startup.append(('streams', time.perf_counter() - _started))
+        except Exception as e:
+            print("Audio stream error:", e)
+            QMessageBox.critical(self, "Audio Error", f"Could not start audio streams:\n{e}")
+            self.running = False
+
+    def stop_mixer(self):
+        self.running = False
+        self.timer.stop()
+        self.meter_timer.stop()
+        self.status_timer.stop()
+        self.engine.stop()
+        self.rms_ballistics.reset()
+        self.peak_ballistics.reset()
+        for col in self.input_columns:
+            for meter in (col.left_visualizer, col.right_visualizer):
+                meter.setValue(0)
+                meter.set_peak(0)
+
+    def mix_and_route(self):
+        self.engine.mix_and_route()
+
+    def fill_output_selector(self, selector):
+        selector.addItem("No device selected")  # Default: none selected
+        for d in self.output_devices:
+            selector.addItem(f"{d['name']} [{d['hostapi_name']}]")
+        selector.setCurrentIndex(0)  # No device selected by default
+
+    def toggle_recording(self, checked):
+        # Every bus plus every input with a device, into a new session folder
+        if checked:
+            directory = QFileDialog.getExistingDirectory(self, "Record To", self.record_dir)
+            if not directory or not self.engine.running:
+                self.record_btn.setChecked(False)
+                return
+            self.record_dir = directory
+            try:
+                self.engine.start_recording(directory)
+            except Exception as e:
+                print("Error starting recording:", e)
+                QMessageBox.critical(self, "Record", f"Could not start recording:\n{e}")
+                self.record_btn.setChecked(False)
+            return
+        stats = self.engine.stop_recording()
+        self.record_btn.setText("Record")
+        if stats:
+            lost = sum(t['dropped_frames'] for t in stats.values())
+            if lost:
+                QMessageBox.warning(self, "Record", f"The disk fell behind: {lost} frames were "
+                                                    "replaced with silence.")
+
+    def closeEvent(self, event):
+        # Finalize recordings; the writer thread is a daemon
+        self.engine.stop_recording()
+        super().closeEvent(event)
+
+    def rescan_devices(self):
+        # PortAudio only sees hot-plugged devices after re-initialising,
+        # which needs every stream closed; selections are kept by name
+        was_running = self.engine.running
+        inputs = [col.get_selected_device_name() if col.selected_device_index is not None else None
+                  for col in self.input_columns]
+        outputs = [sel.currentText() if sel.currentIndex() > 0 else None
+                   for sel in self.output_selectors]
+        self.stop_mixer()
+        try:
+            devices = self.backend.refresh_devices()
+        except Exception as e:
+            print("Error rescanning devices:", e)
+            QMessageBox.critical(self, "Audio Error", f"Could not rescan audio devices:\n{e}")
+            return
+        self.input_devices[:] = [d for d in devices if d['max_input_channels'] >= self.channels]
+        self.output_devices = [d for d in devices if d['max_output_channels'] >= self.channels]
+        for col, name in zip(self.input_columns, inputs):
+            col.selected_device_index = None
+            for idx in range(len(self.input_devices)):
+                col.selected_device_index = idx
+                if col.get_selected_device_name() == name:
+                    break
+            else:
+                col.selected_device_index = None
+            col.selected_device_label.setText(col.get_selected_device_name())
+            if col.selected_device_index is not None:
+                rate = self.input_devices[col.selected_device_index]['default_samplerate']
+                col.sample_rate_label.setText(f"Sample Rate: {int(rate)} Hz")
+        for selector, name in zip(self.output_selectors, outputs):
+            selector.blockSignals(True)
+            selector.clear()
+            self.fill_output_selector(selector)
+            if name is not None:
+                selector.setCurrentIndex(max(0, selector.findText(name)))
+            selector.blockSignals(False)
+        if was_running:
+            self.safe_start_mixer()
+
+    def report_startup(self):
+        # Once the first output block has been played
+        if not any(s.callbacks for s in self.engine.stream_stats.values()
+                   if s.kind in ('master', 'output')):
+            return
+        self.startup.append(('audio', time.perf_counter() - _started))
+        self.startup_reported = True
+        phases = []
+        last = 0.0
+        for name, t in self.startup:
+            phases.append(f"{name} {(t - last) * 1e3:.0f} ms")
+            last = t
+        print(f"Startup: {', '.join(phases)}; audio after {last:.2f} s")
+
+    def change_latency_profile(self, index):
+        name = self.latency_selector.itemData(index)
+        try:
+            self.engine.set_latency_profile(name)
+            self.latency_profile = name
+        except Exception as e:
+            print("Error changing latency profile:", e)
+            QMessageBox.critical(self, "Audio Error", f"Could not reopen audio streams:\n{e}")
+
+    def update_status(self):
+        stepped = self.engine.check_xruns()
+        if stepped is not None:
+            name = profile_for(stepped)
+            self.latency_selector.blockSignals(True)
+            if name is not None:
+                self.latency_selector.setCurrentIndex(list(LATENCY_PROFILES).index(name))
+            self.latency_selector.blockSignals(False)
+            print(f"Sustained xruns: blocksize raised to {stepped} frames")
+        report = self.engine.latency_report()
+        text = f"Block {report['block'] * 1e3:.1f} ms"
+        if report['roundtrip']:
+            text += f", in->out {max(report['roundtrip'].values()) * 1e3:.1f} ms est."
+        if report['loopback'] and report['loopback']['median'] is not None:
+            text += f", loopback {report['loopback']['median'] * 1e3:.1f} ms"
+        self.latency_label.setText(text)
+        recorder = self.engine.recorder
+        if recorder is not None:
+            elapsed = int(time.time() - recorder.started)
+            overflows = sum(t.overflows for t in recorder.taps)
+            self.record_btn.setText(f"Recording {elapsed // 3600}:{elapsed // 60 % 60:02d}:"
+                                    f"{elapsed % 60:02d}" + (f" ({overflows} dropped)" if overflows else ""))
+        if self.loopback_probe is not None and self.loopback_probe.done:
+            self.show_loopback_result(self.loopback_probe.result())
+            self.loopback_probe = None
+
+    def run_loopback_test(self):
+        if not self.engine.running:
+            QMessageBox.information(self, "Loopback Test", "Start the mixer first.")
+            return
+        outputs = [f"Output {i+1}" for i, d in enumerate(self.engine.output_devices) if d is not None]
+        inputs = [f"Input {i+1}" for i, ch in enumerate(self.engine.inputs) if ch.device is not None]
+        if not outputs or not inputs:
+            QMessageBox.information(self, "Loopback Test", "Select an input and an output device first.")
+            return
+        out_name, ok = QInputDialog.getItem(self, "Loopback Test", "Send the click from:", outputs, 0, False)
+        if not ok:
+            return
+        in_name, ok = QInputDialog.getItem(self, "Loopback Test",
+                                           f"Cable {out_name} to this input:", inputs, 0, False)
+        if not ok:
+            return
+        self.loopback_probe = self.engine.measure_loopback(int(in_name.split()[-1]) - 1,
+                                                           int(out_name.split()[-1]) - 1)
+
+    def show_loopback_result(self, result):
+        if result['median'] is None:
+            QMessageBox.warning(self, "Loopback Test",
+                                f"No click came back ({result['lost']} lost). Check the cable and input level.")
+            return
+        QMessageBox.information(self, "Loopback Test",
+                                f"Round trip: {result['median'] * 1e3:.1f} ms median "
+                                f"({result['min'] * 1e3:.1f}-{result['max'] * 1e3:.1f} ms, "
+                                f"{result['pulses']} pulses, {result['lost']} lost)")
+
+    def choose_ir(self, set_ir, idx, button):
+        # Load an impulse response WAV; cancelling offers to remove the
+        # current one
+        path, _ = QFileDialog.getOpenFileName(self, "Impulse Response", "", "WAV files (*.wav)")
+        if not path:
+            if button.text() != "IR: none" and QMessageBox.question(
+                    self, "Impulse Response", "Remove the impulse response?") == QMessageBox.Yes:
+                set_ir(idx, None)
+                button.setText("IR: none")
+            return
+        try:
+            set_ir(idx, path)
+        except Exception as e:
+            print("Error loading impulse response:", e)
+            QMessageBox.critical(self, "Impulse Response", f"Could not load {path}:\n{e}")
+            return
+        name = os.path.splitext(os.path.basename(path))[0]
+        button.setText(f"IR: {name[:12]}")
+
+    def open_stats_dialog(self):
+        if self.stats_dialog is None:
+            self.stats_dialog = StatsDialog(self.engine, self)
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+
+    def update_visualizers(self):
+        # Also the GUI-side tick that closes streams left by device swaps
+        self.engine.release_swaps()
+        if not self.startup_reported:
+            self.report_startup()
+        now = time.monotonic()
+        dt = now - self.last_meter_update
+        self.last_meter_update = now
+        values = self.engine.input_meters.snapshot()
+        # The bar's own ballistics hold its highest recent level: the marker
+        rms, rms_hold = self.rms_ballistics.update(values[:, RMS], dt)
+        _, peak_hold = self.peak_ballistics.update(values[:, PEAK], dt)
+        # More steps: maximum is 1000 for finer granularity
+        sensitivity = 6000  # Adjust as needed for your signal
+        for i, col in enumerate(self.input_columns):
+            for c, meter in ((0, col.left_visualizer), (-1, col.right_visualizer)):
+                meter.setValue(int(min(1000, rms[i, c] * sensitivity)))
+                meter.set_peak(int(min(1000, rms_hold[i, c] * sensitivity)))
+            # Channel label turns red while a clipped peak is held
+            for c, label in enumerate((col.left_label, col.right_label)):
+                clipped = bool(peak_hold[i, min(c, self.channels - 1)] >= 0.99)
+                if clipped != self.clip_shown[i][c]:
+                    label.setStyleSheet("QLabel { color: red; }" if clipped else "")
+                    self.clip_shown[i][c] = clipped
+        # Most gain reduction since the last tick
+        comp_gr, limiter_gr = self.engine.gain_reduction()
+        for col, db in zip(self.input_columns, comp_gr):
+            text = f"GR {db:.1f} dB"
+            if col.gr_label.text() != text:
+                col.gr_label.setText(text)
+        for label, db in zip(self.output_gr_labels, limiter_gr):
+            text = f"GR {db:.1f}"
+            if label.text() != text:
+                label.setText(text)
+
+    def restart_mixer_on_input_change(self):
+        self.stop_mixer()
+        self.start_mixer()
+
+    def restart_mixer_on_output_change(self, idx):
+        self.stop_mixer()
+        self.start_mixer()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stats-port', type=int, default=9464,
+                        help="port for the Prometheus stats endpoint, 0 to disable")
+    parser.add_argument('--inputs', type=int, default=4, help="input channel strips")
+    parser.add_argument('--outputs', type=int, default=6, help="output buses")
+    parser.add_argument('--dsp-workers', type=int, default=None,
+                        help="per-input DSP threads (default: one per 8 inputs, 0 = none)")
+    parser.add_argument('--net-in', action='append', default=[], metavar='HOST:PORT[/FMT]',
+                        help="receive an RTP stream as an input device (float32 or int24)")
+    parser.add_argument('--net-out', action='append', default=[], metavar='HOST:PORT[/FMT]',
+                        help="offer an RTP stream to HOST:PORT as an output device")
+    args, qt_args = parser.parse_known_args()
+    try:
+        endpoints = [parse_endpoint('input', spec) for spec in args.net_in]
+        endpoints += [parse_endpoint('output', spec) for spec in args.net_out]
+    except ValueError as e:
+        parser.error(str(e))
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = AudioMixerApp(stats_port=args.stats_port, num_inputs=args.inputs,
+                           num_outputs=args.outputs, dsp_workers=args.dsp_workers,
+                           net_endpoints=endpoints)
+    window.show()
+    sys.exit(app.exec_())
+
+import sounddevice as sd
+
+device_index = 2  # Replace with the index you get from your selection
+channels = 2      # Or 1 for mono
+samplerate = 44100
+
+print(sd.query_devices(device_index))
+try:
+    with sd.InputStream(device=device_index, channels=channels, samplerate=samplerate) as stream:
+        print("Stream opened successfully!")
+except Exception as e:
+    print("Error:", e)
+
+import sounddevice as sd
+for i, d in enumerate(sd.query_devices()):
     print(i, d['name'], d['max_input_channels'], d['max_output_channels'])
\ No newline at end of file
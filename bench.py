@@ -0,0 +1,350 @@
+import argparse
+import contextlib
+import gc
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from audio_backend import CaptureSink, NoiseSource, SyntheticBackend
+from convolver import ImpulseResponse
+from mixer_engine import MixerEngine
+
+# DSP hot-path benchmark. Builds a pull-scheduled engine on synthetic
+# devices and calls the real stream callbacks by hand with pre-generated
+# blocks: every input callback, then the master output (which mixes), then
+# the follower outputs. One "block" is that whole period; its time is what
+# has to fit in blocksize / samplerate on one core.
+#
+#   python bench.py                          # default sweep, table on stdout
+#   python bench.py --save baseline.json
+#   python bench.py --compare baseline.json  # exit 1 on regression
+#   python bench.py --check-alloc            # exit 1 if steady blocks allocate
+
+DEFAULT_INPUTS = (4, 16, 64)
+DEFAULT_OUTPUTS = (6, 32)
+DEFAULT_BLOCKSIZES = (64, 256, 1024, 4096, 8192)
+DEFAULT_TONES = ('off', 'on')
+
+
+def build_engine(inputs, outputs, blocksize, tone, samplerate=48000, drift_compensation='auto',
+                 dsp_workers=0, ir_seconds=0, compress=False, true_peak_meters=False):
+    backend = SyntheticBackend(sources=[NoiseSource(seed=i) for i in range(inputs)],
+                               sinks=[CaptureSink() for _ in range(outputs)],
+                               samplerate=samplerate)
+    engine = MixerEngine(backend, num_inputs=inputs, num_outputs=outputs,
+                         samplerate=samplerate, blocksize=blocksize, scheduling='pull',
+                         drift_compensation=drift_compensation, dsp_workers=dsp_workers,
+                         true_peak_meters=true_peak_meters)
+    for i in range(inputs):
+        engine.set_input_device(i, i)
+        engine.set_level(i, 0.8)
+        if tone == 'on':
+            engine.set_tone(i, bass=4, treble=-3, eq=2)
+        if compress:
+            engine.set_compressor(i, threshold=-30, ratio=4)
+        # Half the crosspoints on, every input and output used
+        for o in range(outputs):
+            engine.set_route(i, o, (i + o) % 2 == 0)
+    if ir_seconds:
+        # Decaying noise, like a room response, on every output bus
+        rng = np.random.default_rng(1)
+        taps = int(ir_seconds * samplerate)
+        decay = np.exp(-np.arange(taps) / (0.2 * taps))[:, None]
+        ir = ImpulseResponse(0.01 * decay * rng.standard_normal((taps, engine.channels)), samplerate)
+    for o in range(outputs):
+        engine.set_output_device(o, inputs + o)
+        if ir_seconds:
+            engine.set_output_ir(o, ir)
+    return engine
+
+
+def run_case(inputs, outputs, blocksize, tone, seconds=1.0, min_blocks=20, max_blocks=500,
+             warmup=10, samplerate=48000, drift_compensation='auto', dsp_workers=0, ir_seconds=0,
+             compress=False):
+    engine = build_engine(inputs, outputs, blocksize, tone, samplerate, drift_compensation,
+                          dsp_workers, ir_seconds, compress)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.start()
+    try:
+        data = test_blocks(engine, inputs, blocksize)
+        in_streams, master, followers = engine_streams(engine)
+
+        totals, in_times, mix_times, out_times = [], [], [], []
+        deadline = None
+        n = 0
+        while n < max_blocks + warmup:
+            t0 = time.perf_counter_ns()
+            for k, s in enumerate(in_streams):
+                s.callback(data[k], blocksize, None, None)
+            t1 = time.perf_counter_ns()
+            master.callback(master.buffer, blocksize, None, None)
+            t2 = time.perf_counter_ns()
+            for s in followers:
+                s.callback(s.buffer, s.blocksize, None, None)
+            t3 = time.perf_counter_ns()
+            n += 1
+            if n <= warmup:
+                continue
+            if deadline is None:
+                deadline = time.perf_counter() + seconds
+            totals.append(t3 - t0)
+            in_times.append(t1 - t0)
+            mix_times.append(t2 - t1)
+            out_times.append(t3 - t2)
+            if len(totals) >= min_blocks and time.perf_counter() > deadline:
+                break
+    finally:
+        engine.stop()
+
+    totals = np.array(totals) / 1e3
+    period_us = blocksize / samplerate * 1e6
+    p50, p95, p99 = np.percentile(totals, [50, 95, 99])
+    return {
+        'inputs': inputs, 'outputs': outputs, 'blocksize': blocksize, 'tone': tone,
+        'workers': dsp_workers, 'ir_seconds': ir_seconds, 'compress': compress,
+        'drift_compensation': drift_compensation, 'blocks': len(totals),
+        'mean_us': float(totals.mean()), 'p50_us': float(p50), 'p95_us': float(p95),
+        'p99_us': float(p99), 'max_us': float(totals.max()),
+        'input_callbacks_us': float(np.mean(in_times) / 1e3),
+        'mix_us': float(np.mean(mix_times) / 1e3),
+        'output_callbacks_us': float(np.mean(out_times) / 1e3),
+        'period_us': period_us,
+        # How many times faster than real time, and worst-case load
+        'rt_factor': float(period_us / totals.mean()),
+        'load_p99': float(p99 / period_us),
+    }
+
+
+def test_blocks(engine, inputs, blocksize):
+    rng = np.random.default_rng(0)
+    return (0.1 * rng.standard_normal((inputs, blocksize, engine.channels))).astype(np.float32)
+
+
+def engine_streams(engine):
+    in_streams = [s for s in engine.input_streams if s is not None]
+    out_streams = [s for s in engine.output_streams if s is not None]
+    master = engine.output_streams[engine.active_master]
+    followers = [s for s in out_streams if s is not master]
+    return in_streams, master, followers
+
+
+ALLOC_BLOCKSIZES = (128, 256)
+# Where an allocation is counted from: the mixer's own modules and numpy
+# (array data has its own tracemalloc domain), not this script's loop
+ALLOC_FILTERS = [tracemalloc.Filter(True, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       '*.py')),
+                 tracemalloc.Filter(True, '*/numpy/*'),
+                 tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain),
+                 tracemalloc.Filter(False, os.path.abspath(__file__))]
+
+
+def check_alloc(inputs=4, outputs=6, blocksizes=ALLOC_BLOCKSIZES, tone='on', blocks=2000,
+                warmup=500, samplerate=48000, drift_compensation='auto', dsp_workers=0,
+                ir_seconds=0, compress=False):
+    # Run steady-state blocks under tracemalloc at each block size. kept:
+    # allocations from numpy or the mixer's modules still alive after the
+    # measured window, i.e. leaks, counted. churn: the typical (median)
+    # per-block peak above the block's start, i.e. temporaries. A first
+    # traced window lets one-off objects (ints growing past the small-int
+    # cache) settle. True-peak metering is on, so the check covers it too.
+    runs = [_alloc_run(inputs, outputs, blocksize, tone, blocks, warmup, samplerate,
+                       drift_compensation, dsp_workers, ir_seconds, compress)
+            for blocksize in blocksizes]
+    return {'blocks': blocks, 'blocksizes': list(blocksizes),
+            'kept': [kept for kept, _ in runs], 'churn': [churn for _, churn in runs]}
+
+
+def _alloc_run(inputs, outputs, blocksize, tone, blocks, warmup, samplerate, drift_compensation,
+               dsp_workers, ir_seconds, compress):
+    engine = build_engine(inputs, outputs, blocksize, tone, samplerate, drift_compensation,
+                          dsp_workers, ir_seconds, compress, true_peak_meters=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.start()
+    try:
+        data = test_blocks(engine, inputs, blocksize)
+        in_streams, master, followers = engine_streams(engine)
+
+        def run_block():
+            for k, s in enumerate(in_streams):
+                s.callback(data[k], blocksize, None, None)
+            master.callback(master.buffer, blocksize, None, None)
+            for s in followers:
+                s.callback(s.buffer, s.blocksize, None, None)
+
+        for _ in range(warmup):
+            run_block()
+        gc.collect()
+        peaks = np.zeros(blocks, dtype=np.int64)
+        tracemalloc.start()
+        try:
+            for _ in range(warmup):
+                run_block()
+            before = tracemalloc.take_snapshot().filter_traces(ALLOC_FILTERS)
+            for k in range(blocks):
+                start, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                run_block()
+                _, peak = tracemalloc.get_traced_memory()
+                peaks[k] = peak - start
+            after = tracemalloc.take_snapshot().filter_traces(ALLOC_FILTERS)
+        finally:
+            tracemalloc.stop()
+    finally:
+        engine.stop()
+    kept = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    return kept, int(np.median(peaks))
+
+
+def allocates(result):
+    # Anything kept per block leaves at least one allocation per block; a
+    # counter outgrowing its int object is a one-off. The Python objects a
+    # clean block churns (~2 KB of views, floats and frames) don't depend on
+    # the block size, while a temporary array grows with it, so the churn
+    # must not move between block sizes (256 B of slack for thread timing).
+    # Neither threshold depends on the block size, though a temporary
+    # smaller than the churn can hide under it: larger --blocksizes find
+    # those.
+    if max(result['kept']) >= result['blocks'] // 4:
+        return True
+    churn = result['churn']
+    return any(b - a >= 256 for a, b in zip(churn, churn[1:]))
+
+
+def case_key(case, drift_compensation='auto'):
+    # drift_compensation: the run's setting, for cases saved without their own
+    return (case['inputs'], case['outputs'], case['blocksize'], case['tone'],
+            case.get('workers', 0), case.get('ir_seconds', 0), case.get('compress', False),
+            case.get('drift_compensation', drift_compensation))
+
+
+def run_sweep(inputs, outputs, blocksizes, tones, seconds, drift_compensation='auto', log=None,
+              workers=(0,), ir_seconds=0, compress=False):
+    cases = []
+    for n_in, n_out, bs, tone, n_workers in itertools.product(inputs, outputs, blocksizes, tones,
+                                                               workers):
+        case = run_case(n_in, n_out, bs, tone, seconds=seconds,
+                        drift_compensation=drift_compensation, dsp_workers=n_workers,
+                        ir_seconds=ir_seconds, compress=compress)
+        cases.append(case)
+        if log is not None:
+            log(format_case(case))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'drift_compensation': drift_compensation,
+            'ir_seconds': ir_seconds,
+            'compress': compress,
+        },
+        'cases': cases,
+    }
+
+
+def format_header():
+    return (f"{'in':>4} {'out':>4} {'block':>6} {'tone':>4} {'wrk':>3} {'p50 us':>10} {'p95 us':>10} "
+            f"{'p99 us':>10} {'max us':>10} {'rt x':>8} {'load99':>7}")
+
+
+def format_case(case):
+    return (f"{case['inputs']:>4} {case['outputs']:>4} {case['blocksize']:>6} {case['tone']:>4} "
+            f"{case.get('workers', 0):>3} {case['p50_us']:>10.1f} {case['p95_us']:>10.1f} {case['p99_us']:>10.1f} "
+            f"{case['max_us']:>10.1f} {case['rt_factor']:>8.1f} {case['load_p99']:>7.1%}")
+
+
+def compare(results, baseline, tolerance=0.15, metric='p50_us'):
+    # Cases present in both runs whose metric got slower than tolerance
+    base_drift = baseline.get('meta', {}).get('drift_compensation', 'auto')
+    base = {case_key(c, base_drift): c for c in baseline['cases']}
+    drift = results.get('meta', {}).get('drift_compensation', 'auto')
+    regressions = []
+    for case in results['cases']:
+        ref = base.get(case_key(case, drift))
+        if ref is None:
+            continue
+        ratio = case[metric] / ref[metric]
+        if ratio > 1 + tolerance:
+            regressions.append((case, ref, ratio))
+    return regressions
+
+
+def parse_list(text, cast=int):
+    return tuple(cast(x) for x in text.split(','))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mixer DSP path")
+    parser.add_argument('--inputs', type=parse_list, default=DEFAULT_INPUTS)
+    parser.add_argument('--outputs', type=parse_list, default=DEFAULT_OUTPUTS)
+    parser.add_argument('--blocksizes', type=parse_list, default=None,
+                        help=f"default {DEFAULT_BLOCKSIZES}, {ALLOC_BLOCKSIZES} for --check-alloc")
+    parser.add_argument('--tones', type=lambda s: parse_list(s, str), default=DEFAULT_TONES)
+    parser.add_argument('--workers', type=parse_list, default=(0,),
+                        help="DSP worker threads (MixerEngine dsp_workers), e.g. 0,3")
+    parser.add_argument('--ir', type=float, default=0, metavar='SECONDS',
+                        help="convolve every output bus with an impulse response this long")
+    parser.add_argument('--compress', action='store_true',
+                        help="run a compressor on every input (output limiters are always on)")
+    parser.add_argument('--seconds', type=float, default=1.0, help="measuring time per case")
+    parser.add_argument('--no-drift', action='store_true',
+                        help="disable drift compensation (no resampling at equal rates)")
+    parser.add_argument('--resample', action='store_true',
+                        help="resample every stream from the start, as with drifting clocks")
+    parser.add_argument('--save', metavar='JSON', help="write results as a baseline")
+    parser.add_argument('--compare', metavar='JSON', help="compare against a baseline")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="allowed slowdown of p50 before a case counts as a regression")
+    parser.add_argument('--check-alloc', action='store_true',
+                        help="check that steady-state blocks allocate no arrays (first "
+                             "--inputs/--outputs/--workers value, last --tones, every "
+                             "--blocksizes value in increasing order)")
+    parser.add_argument('--blocks', type=int, default=2000, help="blocks for --check-alloc")
+    args = parser.parse_args(argv)
+    drift = True if args.resample else False if args.no_drift else 'auto'
+
+    if args.check_alloc:
+        result = check_alloc(args.inputs[0], args.outputs[0],
+                             args.blocksizes or ALLOC_BLOCKSIZES, args.tones[-1],
+                             blocks=args.blocks, drift_compensation=drift,
+                             dsp_workers=args.workers[0], ir_seconds=args.ir,
+                             compress=args.compress)
+        for blocksize, kept, churn in zip(result['blocksizes'], result['kept'], result['churn']):
+            print(f"{blocksize} frames, {result['blocks']} blocks: {kept} allocations kept, "
+                  f"{churn} B churned per block")
+        if allocates(result):
+            print("FAIL: the steady-state audio path allocates")
+            return 1
+        print("OK: no allocations in the steady state")
+        return 0
+
+    print(format_header())
+    results = run_sweep(args.inputs, args.outputs, args.blocksizes or DEFAULT_BLOCKSIZES,
+                        args.tones, args.seconds,
+                        drift_compensation=drift, log=print, workers=args.workers,
+                        ir_seconds=args.ir, compress=args.compress)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for case, ref, ratio in regressions:
+            print(f"REGRESSION {case_key(case)}: p50 {ref['p50_us']:.1f} -> "
+                  f"{case['p50_us']:.1f} us ({ratio - 1:+.0%})")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import os
+
+import numpy as np
+
+from resampler import StreamingResampler
+from wavio import open_wav, to_float32
+
+# np.fft takes out= from NumPy 2.0 on; before that every block's FFTs
+# allocate their results (works, but not allocation-free)
+FFT_OUT = int(np.__version__.split('.')[0]) >= 2
+
+
+class ImpulseResponse:
+    # An FIR filter or room impulse response, (taps, channels) at its own
+    # rate. One channel is applied to every engine channel, otherwise the
+    # channel counts must match. Partition spectra are computed once per
+    # block size and shared by every convolver using this response.
+    def __init__(self, taps, samplerate, name=None):
+        taps = np.asarray(taps, dtype=np.float32)
+        if taps.ndim == 1:
+            taps = taps[:, None]
+        if len(taps) == 0:
+            raise ValueError("Empty impulse response")
+        self.taps = taps
+        self.samplerate = samplerate
+        self.name = name or f"{len(taps)} taps"
+        self._spectra = {}
+
+    @property
+    def seconds(self):
+        return len(self.taps) / self.samplerate
+
+    def spectra(self, block, channels):
+        # (partitions, channels, block + 1): rfft of each block-sized slice
+        # of the response, zero-padded to 2 * block
+        key = (block, channels)
+        if key not in self._spectra:
+            taps = self.taps
+            if taps.shape[1] == 1:
+                taps = np.repeat(taps, channels, axis=1)
+            elif taps.shape[1] != channels:
+                raise ValueError(f"{self.name}: {taps.shape[1]}-channel response "
+                                 f"for {channels} channels")
+            partitions = -(-len(taps) // block)
+            padded = np.zeros((partitions * block, channels))
+            padded[:len(taps)] = taps
+            padded = padded.reshape(partitions, block, channels).transpose(0, 2, 1)
+            spectra = np.fft.rfft(padded, n=2 * block, axis=2)
+            spectra.setflags(write=False)
+            self._spectra[key] = spectra
+        return self._spectra[key]
+
+    def resampled(self, samplerate):
+        # The same response at another rate. Taps scale with the rate
+        # change so the frequency response keeps its gain.
+        if samplerate == self.samplerate:
+            return self
+        ratio = self.samplerate / samplerate
+        channels = self.taps.shape[1]
+        resampler = StreamingResampler(channels, ratio, max_frames=16)
+        # The interpolation kernel rings on both sides of a tap, so `lead`
+        # output frames start before the response: the source gets `pad`
+        # frames of silence in front, and the start position is moved by
+        # the fraction left over so output frame `lead` falls exactly on
+        # the response's first tap. Without them a response that starts at
+        # its first tap loses the kernel's leading half (~6% of its gain).
+        lead = int(np.ceil(resampler.half / ratio))
+        pad = int(np.ceil(lead * ratio))
+        frames = lead + int(np.ceil(len(self.taps) / ratio)) + resampler.half
+        resampler = StreamingResampler(channels, ratio, max_frames=frames)
+        resampler.position += pad - lead * ratio
+        needed = resampler.frames_needed(frames)
+        source = np.zeros((needed, channels), dtype=np.float32)
+        source[pad:pad + len(self.taps)] = self.taps
+        out = np.zeros((frames, channels), dtype=np.float32)
+        resampler.process(source, out)
+        # Lead frames that came out silent (the response had a pre-delay)
+        # are dropped again, keeping it aligned with the original
+        heard = np.flatnonzero(np.any(out[:lead] != 0, axis=1))
+        start = heard[0] if len(heard) else lead
+        return ImpulseResponse(out[start:] * ratio, samplerate, self.name)
+
+
+def load_ir(path):
+    info, raw = open_wav(path)
+    taps = np.zeros((info.frames, info.channels), dtype=np.float32)
+    to_float32(raw, info.bits, taps)
+    return ImpulseResponse(taps, info.samplerate, os.path.basename(path))
+
+
+class PartitionedConvolver:
+    # Uniformly partitioned overlap-save convolution of (block, channels)
+    # float32 blocks with an ImpulseResponse. The response is cut into
+    # block-sized partitions; every block's spectrum goes into a frequency
+    # domain delay line, which is multiplied with the partition spectra and
+    # summed in one einsum, then transformed back. A block's output is
+    # ready as soon as the block is, so the insert adds no latency however
+    # long the response. The FFTs run in float64: NumPy's float32 rfft
+    # allocates per call, and long sums keep their precision.
+    def __init__(self, ir, block, channels):
+        self.ir = ir
+        self.block = block
+        self.channels = channels
+        self.spectra = ir.spectra(block, channels)
+        self.partitions = len(self.spectra)
+        # Written at pos and pos + partitions, so the newest-first window
+        # over the last `partitions` spectra is one contiguous slice
+        self.fdl = np.zeros((2 * self.partitions, channels, block + 1), dtype=np.complex128)
+        self.pos = 0
+        self.frame = np.zeros((channels, 2 * block))  # previous block, this block
+        self.last = np.zeros((channels, block))
+        self.acc = np.zeros((channels, block + 1), dtype=np.complex128)
+        self.result = np.zeros((channels, 2 * block))
+        self.dirty = False
+
+    def reset(self):
+        # Cheap when nothing has run since the last reset
+        if self.dirty:
+            self.fdl[:] = 0
+            self.last[:] = 0
+            self.dirty = False
+
+    def process(self, audio, out=None):
+        # audio: (block, channels); out may be audio itself
+        if out is None:
+            out = np.empty(audio.shape, dtype=np.float32)
+        block = self.block
+        frame = self.frame
+        frame[:, :block] = self.last
+        frame[:, block:] = audio.T
+        self.last[:] = frame[:, block:]
+        self.pos = pos = (self.pos - 1) % self.partitions
+        spectrum = self.fdl[pos]
+        if FFT_OUT:
+            np.fft.rfft(frame, axis=1, out=spectrum)
+        else:
+            spectrum[:] = np.fft.rfft(frame, axis=1)
+        self.fdl[pos + self.partitions] = spectrum
+        np.einsum('pcb,pcb->cb', self.fdl[pos:pos + self.partitions], self.spectra, out=self.acc)
+        # Overlap-save: the first half is circular wrap-around, discarded
+        if FFT_OUT:
+            np.fft.irfft(self.acc, n=2 * block, axis=1, out=self.result)
+        else:
+            self.result[:] = np.fft.irfft(self.acc, n=2 * block, axis=1)
+        out[:] = self.result[:, block:].T
+        self.dirty = True
+        return out
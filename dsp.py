@@ -0,0 +1,163 @@
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+# scipy.signal takes seconds to import and is only needed once a tone
+# control leaves 0, so it is loaded on first use; preload() does it from a
+# background thread so that first use doesn't happen in an audio callback.
+_signal = None
+# sosfilt's in-place kernel: filters a C-contiguous (signals, samples)
+# array and its (signals, sections, 2) state without allocating. It is
+# private to SciPy (there up to at least 1.17), so it is probed once on
+# load; without it the tone stack falls back to signal.sosfilt, which gives
+# the same output but allocates every block.
+_sosfilt = None
+
+
+def _probe_sosfilt():
+    # The kernel if it is there and still filters in place: one
+    # pass-through section over an impulse
+    try:
+        from scipy.signal._sosfilt import _sosfilt as kernel
+        sos = np.array([[1, 0, 0, 1, 0, 0]], dtype=np.float32)
+        x = np.array([[1, 0, 0]], dtype=np.float32)
+        kernel(sos, x, np.zeros((1, 1, 2), dtype=np.float32))
+        if not np.array_equal(x, [[1, 0, 0]]):
+            raise ValueError("unexpected output")
+    except Exception as e:
+        import scipy
+        print(f"scipy {scipy.__version__}: in-place sosfilt kernel unavailable ({e}); "
+              f"tone filters fall back to signal.sosfilt, which allocates per block")
+        return None
+    return kernel
+
+
+def scipy_signal():
+    global _signal, _sosfilt
+    if _signal is None:
+        from scipy import signal
+        _sosfilt = _probe_sosfilt()
+        _signal = signal
+    return _signal
+
+
+def preload():
+    thread = threading.Thread(target=scipy_signal, name="dsp-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def apply_bass(audio, gain, samplerate):
+    # gain: -10 to +10, 0 = no change
+    if gain == 0:
+        return audio
+    signal = scipy_signal()
+    b, a = signal.butter(2, 200 / (samplerate / 2), btype='low')
+    filtered = signal.lfilter(b, a, audio, axis=0)
+    return audio + (gain / 10.0) * filtered
+
+def apply_treble(audio, gain, samplerate):
+    if gain == 0:
+        return audio
+    signal = scipy_signal()
+    b, a = signal.butter(2, 4000 / (samplerate / 2), btype='high')
+    filtered = signal.lfilter(b, a, audio, axis=0)
+    return audio + (gain / 10.0) * filtered
+
+def apply_eq(audio, gain, samplerate):
+    if gain == 0:
+        return audio
+    signal = scipy_signal()
+    b, a = signal.butter(2, [500/(samplerate/2), 2000/(samplerate/2)], btype='band')
+    filtered = signal.lfilter(b, a, audio, axis=0)
+    return audio + (gain / 10.0) * filtered
+
+
+# Tone stages in processing order: (name, number of SOS sections)
+TONE_STAGES = (('bass', 1), ('treble', 1), ('eq', 2))
+
+
+@lru_cache(maxsize=256)
+def tone_stage_sos(stage, gain, samplerate):
+    # x + g * H(x) == ((a + g * b) / a)(x), so each apply_* stage is a
+    # single IIR filter and the whole tone stack is one SOS cascade
+    signal = scipy_signal()
+    nyq = samplerate / 2
+    if stage == 'bass':
+        b, a = signal.butter(2, 200 / nyq, btype='low')
+    elif stage == 'treble':
+        b, a = signal.butter(2, 4000 / nyq, btype='high')
+    else:
+        b, a = signal.butter(2, [500 / nyq, 2000 / nyq], btype='band')
+    b = np.pad(b, (0, len(a) - len(b)))
+    sos = signal.tf2sos(a + (gain / 10.0) * b, a).astype(np.float32)
+    sos.setflags(write=False)
+    return sos
+
+
+class ToneFilter:
+    # Per-input bass/treble/EQ with filter state carried across blocks.
+    # Coefficients are only rebuilt when a gain changes; with fixed gains a
+    # block is filtered in float32 on preallocated buffers.
+    def __init__(self, samplerate, channels):
+        self.samplerate = samplerate
+        self.channels = channels
+        num_sections = sum(n for _, n in TONE_STAGES)
+        # State of every section, (channels, sections, 2); the active ones
+        # are worked on in a contiguous copy, zi_active
+        self.zi = np.zeros((channels, num_sections, 2), dtype=np.float32)
+        self.zi_active = None
+        self.work = None
+        self.gains = None
+        self.sos = None
+        self.active = None
+
+    def reset(self):
+        self.zi[:] = 0
+        if self.zi_active is not None:
+            self.zi_active[:] = 0
+
+    def _update(self, gains):
+        if self.zi_active is not None:
+            self.zi[:, self.active] = self.zi_active
+        sos = []
+        active = []
+        pos = 0
+        for (stage, n), gain in zip(TONE_STAGES, gains):
+            if gain != 0:
+                sos.append(tone_stage_sos(stage, gain, self.samplerate))
+                active.extend(range(pos, pos + n))
+            else:
+                # Stage switched off: start clean if it comes back
+                self.zi[:, pos:pos + n] = 0
+            pos += n
+        self.sos = np.concatenate(sos) if sos else None
+        self.active = np.array(active, dtype=np.intp)
+        self.zi_active = np.ascontiguousarray(self.zi[:, self.active])
+        self.gains = gains
+
+    def process(self, audio, bass, treble, eq, out=None):
+        # Filters audio (frames, channels) into out (default: a new array)
+        gains = (bass, treble, eq)
+        if gains != self.gains:
+            self._update(gains)
+        if out is None:
+            out = np.empty(audio.shape, dtype=np.float32)
+        if self.sos is None:
+            if out is not audio:
+                out[:] = audio
+            return out
+        if _sosfilt is None:
+            filtered, zf = _signal.sosfilt(self.sos, audio, axis=0, zi=self.zi_active.transpose(1, 2, 0))
+            self.zi_active[:] = zf.transpose(2, 0, 1)
+            out[:] = filtered
+            return out
+        frames = len(audio)
+        if self.work is None or self.work.shape[1] != frames:
+            self.work = np.zeros((self.channels, frames), dtype=np.float32)
+        work = self.work
+        work[:] = audio.T
+        _sosfilt(self.sos, work, self.zi_active)
+        out[:] = work.T
+        return out
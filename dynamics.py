@@ -0,0 +1,330 @@
+import numpy as np
+
+from resampler import sinc_table
+
+# Gain reduction is worked out in dB, in float64: the recursions below are
+# rewritten as running maxima and cumulative sums over a whole block, and
+# those need the headroom. Every ufunc runs on whole, contiguous,
+# same-shape arrays (per-strip settings are expanded to full blocks when
+# they change): NumPy allocates temporaries for strided or broadcast
+# operands, and the audio path must not allocate.
+DB = 20 / np.log(10)  # dB per neper
+FLOOR = 1e-6  # -120 dB, for the logs
+ATTACK_SPAN = 512  # Frames per closed-form attack step, see CompressorBank
+
+
+def _decay_per_frame(seconds, samplerate):
+    # An exponential release with time constant `seconds` is a straight
+    # line in dB: this many dB per frame
+    return DB / np.maximum(seconds * samplerate, 1.0)
+
+
+class GainReduction:
+    # Gain-reduction readings in dB, one per compressor or limiter. `last`
+    # is the most reduction in the latest block (for stats); `peak` is the
+    # most since the last snapshot(), for the GUI, like meters.MeterBank.
+    def __init__(self, count):
+        self.last = np.zeros(count)
+        self.peak = np.zeros(count)
+        self.snapshot_values = np.zeros(count)
+
+    def update(self, reduction, axis):
+        # reduction: dB, strips along the other axis
+        np.max(reduction, axis=axis, out=self.last)
+        np.maximum(self.peak, self.last, out=self.peak)
+
+    def snapshot(self):
+        np.copyto(self.snapshot_values, self.peak)
+        self.peak[:] = 0
+        return self.snapshot_values
+
+    def reset(self):
+        self.last[:] = 0
+        self.peak[:] = 0
+
+
+class CompressorBank:
+    # Feed-forward compressors for every input at once, on (inputs, frames,
+    # channels) blocks, stereo-linked. Settings come per input from the
+    # params snapshot (comp_threshold dB, comp_ratio, comp_attack and
+    # comp_release ms, comp_makeup dB); a ratio of 1 with no makeup is off,
+    # and with every input off the bank costs nothing.
+    #
+    # The envelope has no per-sample loop. Release is a peak follower that
+    # falls a fixed number of dB per frame,
+    #   rel[n] = max(gr[n], rel[n-1] - c)  ==  max_k<=n (gr[k] + c k) - c n
+    # which is one maximum.accumulate. Attack is a one-pole lowpass over
+    # that, y[n] = a y[n-1] + (1 - a) rel[n], in closed form
+    #   y[n] = a^n (y[0] + (1 - a) sum_0<k<=n rel[k] a^-k)
+    # which is one cumsum. Column 0 of the work array carries the previous
+    # block's last value into both. The attack runs in steps of at most
+    # ATTACK_SPAN frames, each starting from the last one's output, so
+    # a^-k stays within float64 for any time constant above ATTACK_SPAN /
+    # 600 frames whatever the block size: output doesn't depend on how the
+    # audio is split into blocks.
+    def __init__(self, count, channels, samplerate, blocksize):
+        self.count = count
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        shape = (count, blocksize)
+        ext = (count, blocksize + 1)
+        # (inputs, channels, frames): reducing over a middle axis of two is
+        # far quicker than over a last one
+        self.rectified = np.zeros((count, channels, blocksize), dtype=np.float32)
+        self.level = np.zeros(shape, dtype=np.float32)
+        self.gain = np.zeros(shape, dtype=np.float32)
+        self.gain_channels = np.zeros((count, blocksize, channels), dtype=np.float32)
+        self.work = np.zeros(ext)
+        # Attack steps as (start, frames); per step length a contiguous
+        # scratch and its (1 - a) a^-k and a^k rows, as strided views of
+        # `work` would make the ufuncs allocate
+        span = min(blocksize, ATTACK_SPAN)
+        self.spans = [(start, min(span, blocksize - start)) for start in range(0, blocksize, span)]
+        self.attack = {n: (np.zeros((count, n + 1)), np.zeros((count, n + 1)),
+                           np.zeros((count, n + 1)))
+                       for _, n in self.spans}
+        # Per-input settings as full blocks, see _configure()
+        self.threshold = np.zeros(ext)
+        self.slope = np.zeros(ext)
+        self.makeup = np.zeros(ext)
+        self.decay_ramp = np.zeros(ext)
+        self.rel_state = np.zeros(count)  # Release follower, dB
+        self.att_state = np.zeros(count)  # Attack smoother, dB
+        self.reduction = GainReduction(count)
+        self.version = None
+        self.enabled = False
+
+    def reset(self):
+        self.rel_state[:] = 0
+        self.att_state[:] = 0
+        self.reduction.reset()
+
+    def _configure(self, params):
+        # Coefficients for the snapshot's settings; only when they change
+        inputs = params.inputs
+        ratio = np.maximum(inputs['comp_ratio'].astype(np.float64), 1.0)
+        self.enabled = bool(np.any(ratio > 1) or np.any(inputs['comp_makeup'] != 0))
+        self.threshold[:] = inputs['comp_threshold'][:, None]
+        self.slope[:] = (1 - 1 / ratio)[:, None]
+        self.makeup[:] = inputs['comp_makeup'][:, None]
+        k = np.arange(self.blocksize + 1, dtype=np.float64)
+        release = np.maximum(inputs['comp_release'].astype(np.float64), 1.0) / 1000
+        self.decay_ramp[:] = _decay_per_frame(release, self.samplerate)[:, None] * k
+        tau = np.maximum(inputs['comp_attack'] / 1000 * self.samplerate, ATTACK_SPAN / 600)
+        coef = np.exp(-1 / tau)
+        for n, (rise, fall, _) in self.attack.items():
+            k = np.arange(n + 1, dtype=np.float64)
+            rise[:] = (1 - coef)[:, None] * np.exp(k / tau[:, None])  # (1 - a) a^-k
+            rise[:, 0] = 1
+            fall[:] = np.exp(-k / tau[:, None])  # a^k
+        self.version = params.version
+
+    def process(self, blocks, params, skip=()):
+        # Compresses blocks (inputs, blocksize, channels) in place. Rows in
+        # `skip` (inputs whose DSP worker is still writing them) are left
+        # alone and their envelopes hold where they were.
+        if self.version != params.version:
+            self._configure(params)
+        if not self.enabled:
+            self.reduction.reset()
+            return
+        held = [(i, self.rel_state[i], self.att_state[i]) for i in skip]
+        level = self.level
+        self.rectified[:] = blocks.transpose(0, 2, 1)
+        np.abs(self.rectified, out=self.rectified)
+        np.max(self.rectified, axis=1, out=level)
+        np.maximum(level, FLOOR, out=level)
+        np.log10(level, out=level)
+        work = self.work
+        work[:, 1:] = level
+        # Gain computer: dB over the threshold, times 1 - 1/ratio
+        np.multiply(work, 20, out=work)
+        np.subtract(work, self.threshold, out=work)
+        np.maximum(work, 0, out=work)
+        np.multiply(work, self.slope, out=work)
+        # Release
+        work[:, 0] = self.rel_state
+        np.add(work, self.decay_ramp, out=work)
+        np.maximum.accumulate(work, axis=1, out=work)
+        np.subtract(work, self.decay_ramp, out=work)
+        self.rel_state[:] = work[:, -1]
+        # Attack
+        work[:, 0] = self.att_state
+        for start, n in self.spans:
+            rise, fall, step = self.attack[n]
+            step[:] = work[:, start:start + n + 1]
+            np.multiply(step, rise, out=step)
+            np.cumsum(step, axis=1, out=step)
+            np.multiply(step, fall, out=step)
+            work[:, start + 1:start + n + 1] = step[:, 1:]
+        self.att_state[:] = work[:, -1]
+        for i, rel, att in held:
+            self.rel_state[i] = rel
+            self.att_state[i] = att
+            work[i] = att
+        self.reduction.update(work, axis=1)
+        # Gain: 10^((makeup - y) / 20) on both channels
+        np.subtract(self.makeup, work, out=work)
+        np.divide(work, DB, out=work)
+        np.exp(work, out=work)
+        self.gain[:] = work[:, 1:]
+        self.gain_channels[:] = self.gain[:, :, None]
+        if not skip:
+            np.multiply(blocks, self.gain_channels, out=blocks)
+            return
+        for i in range(self.count):
+            if i not in skip:
+                np.multiply(blocks[i], self.gain_channels[i], out=blocks[i])
+
+
+class LimiterBank:
+    # True-peak look-ahead limiters for every output bus at once, on
+    # (outputs, frames, channels) blocks, stereo-linked, keeping the
+    # oversampled signal under each bus's ceiling (dBTP).
+    #
+    # Per frame the true peak is the larger of the samples and of
+    # `oversample` - 1 interpolated points between each pair (the
+    # meters.MeterBank estimate), as dB over the ceiling: r. The audio is
+    # delayed by the look-ahead W so the gain can be down before a peak
+    # arrives:
+    #   h = max of r over [n - 1, n + W - 1]   (van Herk running max)
+    #   b = mean of h over [n - W + 1, n]      (cumsum difference)
+    # Every h in b's window covers both sides of frame n, so b >= r and the
+    # gain reaches the needed reduction exactly as the peak plays, along a
+    # smooth ramp. Release is the compressor's dB-per-frame follower.
+    # 16-tap interpolators keep the true peak within 0.25 dB of the ceiling
+    # up to 17 kHz at 48 kHz. Limiting adds W + taps/2 - 1 frames of latency
+    # (`delay`) to every bus.
+    #
+    # Internally (channels, frames, outputs): every window over the frames
+    # of a channel is one contiguous slab, and channels are linked with
+    # elementwise maxima.
+    def __init__(self, count, channels, samplerate, blocksize, lookahead=0.0015,
+                 release=0.08, oversample=4, taps=16):
+        self.count = count
+        self.channels = channels
+        self.samplerate = samplerate
+        self.blocksize = F = blocksize
+        self.window = W = max(2, int(round(lookahead * samplerate)))
+        self.taps = taps
+        self.lag = taps // 2
+        self.delay = self.lag + W - 1
+        self.kernels = sinc_table(taps, oversample, 1.0)[1:oversample]
+        self.decay = float(_decay_per_frame(release, samplerate))
+        # Carried over between blocks: the last taps - 1 frames of input
+        # for the interpolators, W frames of r, W - 1 of h, `delay` of audio
+        self.history = np.zeros((channels, taps - 1 + F, count), dtype=np.float32)
+        self.audio = np.zeros((channels, self.delay + F, count), dtype=np.float32)
+        self.r = np.zeros((W + F, count))
+        self.h = np.zeros((W - 1 + F, count))
+        self.follower = np.zeros(count)
+        # Scratch
+        self.interp = np.zeros((F, count), dtype=np.float32)
+        self.term = np.zeros((F, count), dtype=np.float32)
+        self.out = np.zeros((channels, F, count), dtype=np.float32)
+        self.peak = np.zeros((F, count), dtype=np.float32)
+        self.point = np.zeros((F, count), dtype=np.float32)
+        self.sums = np.zeros((W + F, count))
+        self.b = np.zeros((F, count))
+        self.ramp = self.decay * np.repeat(np.arange(F, dtype=np.float64)[:, None], count, 1)
+        self.ceilings = np.zeros((F, count))
+        self.gain = np.zeros((F, count), dtype=np.float32)
+        # Running max of width W + 1 over r: forward and backward maxima
+        # within chunks of that width, padded with -inf
+        self.span = span = W + 1
+        chunks = -(-(W + F) // span)
+        self.padded = np.full((chunks * span, count), -np.inf)
+        self.forward = np.zeros_like(self.padded)
+        self.backward = np.zeros_like(self.padded)
+        self.padded_chunks = self.padded.reshape(chunks, span, count)
+        self.forward_chunks = self.forward.reshape(chunks, span, count)
+        self.backward_chunks = self.backward.reshape(chunks, span, count)
+        self.reduction = GainReduction(count)
+
+    def set_ceilings(self, ceilings_db):
+        # dBTP per output; inf for no gain reduction
+        self.ceilings[:] = ceilings_db
+
+    def reset(self):
+        self.history[:] = 0
+        self.audio[:] = 0
+        self.r[:] = 0
+        self.h[:] = 0
+        self.follower[:] = 0
+        self.reduction.reset()
+
+    @property
+    def latency(self):
+        return self.delay / self.samplerate
+
+    def process(self, blocks):
+        # blocks (outputs, blocksize, channels), limited in place
+        F = self.blocksize
+        W = self.window
+        taps = self.taps
+        lag = self.lag
+        history = self.history
+        audio = self.audio
+        history[:, taps - 1:] = blocks.transpose(2, 1, 0)
+        audio[:, self.delay:] = history[:, taps - 1:]
+        # True peak per frame over both channels: the samples on both
+        # sides, then the points in between
+        peak = self.peak
+        point = self.point
+        term = self.term
+        interp = self.interp
+        peak[:] = 0
+        for ch in history:
+            for side in (lag - 1, lag):
+                np.abs(ch[side:side + F], out=point)
+                np.maximum(peak, point, out=peak)
+            for kernel in self.kernels:
+                np.multiply(ch[:F], kernel[0], out=interp)
+                for j in range(1, taps):
+                    np.multiply(ch[j:j + F], kernel[j], out=term)
+                    np.add(interp, term, out=interp)
+                np.abs(interp, out=interp)
+                np.maximum(peak, interp, out=peak)
+            ch[:taps - 1] = ch[F:F + taps - 1]
+        # r: dB over the ceiling, after the W carried values
+        r = self.r
+        new_r = r[W:]
+        np.maximum(peak, FLOOR, out=peak)
+        np.log10(peak, out=peak)
+        new_r[:] = peak
+        np.multiply(new_r, 20, out=new_r)
+        np.subtract(new_r, self.ceilings, out=new_r)
+        np.maximum(new_r, 0, out=new_r)
+        # h: running max over W + 1
+        span = self.span
+        self.padded[:W + F] = r
+        np.maximum.accumulate(self.padded_chunks, axis=1, out=self.forward_chunks)
+        np.maximum.accumulate(self.padded_chunks[:, ::-1], axis=1,
+                              out=self.backward_chunks[:, ::-1])
+        h = self.h
+        np.maximum(self.backward[:F], self.forward[span - 1:span - 1 + F], out=h[W - 1:])
+        r[:W] = r[F:F + W]
+        # b: mean of h over W
+        sums = self.sums
+        sums[0] = 0
+        np.cumsum(h, axis=0, out=sums[1:])
+        b = self.b
+        np.subtract(sums[W:W + F], sums[:F], out=b)
+        np.divide(b, W, out=b)
+        h[:W - 1] = h[F:F + W - 1]
+        # Release follower, carried in from the last block
+        np.add(b, self.ramp, out=b)
+        np.subtract(self.follower, self.decay, out=self.follower)
+        np.maximum(b[0], self.follower, out=b[0])
+        np.maximum.accumulate(b, axis=0, out=b)
+        np.subtract(b, self.ramp, out=b)
+        self.follower[:] = b[-1]
+        self.reduction.update(b, axis=0)
+        # Gain on the delayed audio
+        np.divide(b, -DB, out=b)
+        np.exp(b, out=b)
+        self.gain[:] = b
+        for ch, out in zip(audio, self.out):
+            np.multiply(ch[:F], self.gain, out=out)
+            ch[:self.delay] = ch[F:F + self.delay]
+        blocks[:] = self.out.transpose(2, 1, 0)
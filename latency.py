@@ -0,0 +1,79 @@
+import numpy as np
+
+# name: (blocksize, PortAudio latency hint). The hint asks the host API
+# for its low- or high-latency device buffering on top of the block.
+LATENCY_PROFILES = {
+    'safe': (4096, 'high'),
+    'normal': (1024, 'high'),
+    'low': (256, 'low'),
+    'ultra': (128, 'low'),
+}
+
+
+def profile_for(blocksize):
+    # Name of the profile with this blocksize, or None
+    for name, (size, _) in LATENCY_PROFILES.items():
+        if size == blocksize:
+            return name
+    return None
+
+
+class LoopbackProbe:
+    # Round-trip latency through a loopback cable from output bus out_idx
+    # to input in_idx. An impulse is written into the bus and looked for on
+    # the input, both counted in engine frames, so the result covers every
+    # ring, resampler and device buffer between the mixer and the cable.
+    # The engine calls listen() after reading its inputs and send() after
+    # mixing; the probed input is muted in the mix while the test runs so
+    # the click can't come back around.
+    def __init__(self, in_idx, out_idx, samplerate, pulses=5, interval=0.3, amplitude=0.5,
+                 threshold=0.1, timeout=1.0):
+        self.in_idx = in_idx
+        self.out_idx = out_idx
+        self.samplerate = samplerate
+        self.pulses = pulses
+        self.interval = int(interval * samplerate)
+        self.amplitude = amplitude
+        self.threshold = threshold
+        self.timeout = int(timeout * samplerate)
+        self.frame = 0  # engine frames at the start of the current block
+        self.next_send = self.interval
+        self.sent_at = None
+        self.delays = []  # frames per detected pulse
+        self.lost = 0
+        self.done = False
+
+    def listen(self, blocks):
+        block = blocks[self.in_idx]
+        frames = len(block)
+        if self.sent_at is not None:
+            hits = np.flatnonzero(np.abs(block).max(axis=1) > self.threshold)
+            if len(hits):
+                self.delays.append(self.frame + hits[0] - self.sent_at)
+                self.sent_at = None
+            elif self.frame + frames - self.sent_at > self.timeout:
+                self.lost += 1
+                self.sent_at = None
+            if self.sent_at is None:
+                self.next_send = self.frame + frames + self.interval
+                self.done = len(self.delays) + self.lost >= self.pulses
+        block[:] = 0
+
+    def send(self, mixed):
+        frames = mixed.shape[1]
+        if self.sent_at is None and not self.done and self.next_send < self.frame + frames:
+            offset = max(0, self.next_send - self.frame)
+            mixed[self.out_idx, offset] = self.amplitude
+            self.sent_at = self.frame + offset
+        self.frame += frames
+
+    def result(self):
+        # None while running; seconds otherwise (None values if every
+        # pulse was lost: no loopback, or the threshold is too high)
+        if not self.done:
+            return None
+        delays = np.array(self.delays, dtype=np.float64) / self.samplerate
+        if len(delays) == 0:
+            return {'median': None, 'min': None, 'max': None, 'pulses': 0, 'lost': self.lost}
+        return {'median': float(np.median(delays)), 'min': float(delays.min()),
+                'max': float(delays.max()), 'pulses': len(delays), 'lost': self.lost}
@@ -0,0 +1,124 @@
+import numpy as np
+
+PEAK, RMS, TRUE_PEAK = 0, 1, 2
+
+
+class MeterBank:
+    # Shared level store: audio callbacks call measure(), the GUI calls
+    # snapshot() at its own frame rate. values[meter, field, channel] with
+    # field PEAK / RMS / TRUE_PEAK, all linear. measure() only reduces into
+    # this preallocated array and never touches the GUI. PEAK and TRUE_PEAK
+    # hold the maximum since the last snapshot, so short blocks between two
+    # redraws can't hide a transient.
+    #
+    # The true-peak scratch is sized per meter for blocks of up to
+    # max_frames; reserve() makes room for a stream with longer blocks
+    # before it starts, so measuring never allocates.
+    def __init__(self, num_meters, channels, true_peak=False, oversample=4, taps=8,
+                 max_frames=0):
+        self.num_meters = num_meters
+        self.channels = channels
+        self.values = np.zeros((num_meters, 3, channels), dtype=np.float32)
+        self.snapshot_values = np.zeros_like(self.values)
+        # Scratch per meter: each input stream calls back on its own thread
+        self._peak = np.zeros((num_meters, channels), dtype=np.float32)
+        self._sumsq = np.zeros((num_meters, channels), dtype=np.float32)
+        self.true_peak = true_peak
+        if true_peak:
+            # Fractional-delay interpolators for the in-between samples of
+            # an oversample-times upsampled signal (BS.1770 style estimate)
+            from resampler import sinc_table
+            table = sinc_table(taps, oversample, 1.0)
+            self._tp_kernels = table[1:oversample]
+            self._tp_taps = taps
+            self._tp_work = [None] * num_meters
+            self._tp_term = [None] * num_meters
+            for idx in range(num_meters):
+                self.reserve(idx, max_frames)
+
+    def reserve(self, idx, frames):
+        # Interpolated points (work) and one tap's term, per meter: each
+        # input stream calls back on its own thread
+        if not self.true_peak:
+            return
+        work = self._tp_work[idx]
+        if work is None or len(work) < frames:
+            self._tp_work[idx] = np.zeros((frames, self.channels), dtype=np.float32)
+            self._tp_term[idx] = np.zeros((frames, self.channels), dtype=np.float32)
+
+    def measure(self, idx, block):
+        frames = len(block)
+        if frames == 0:
+            return
+        row = self.values[idx]
+        peak = self._peak[idx]
+        sumsq = self._sumsq[idx]
+        # Per-column reductions: numpy reduces a (frames, 2) array along
+        # axis 0 several times slower than two strided 1-D passes
+        for c in range(block.shape[1]):
+            col = block[:, c]
+            peak[c] = max(col.max(), -col.min())
+            sumsq[c] = np.dot(col, col)
+        np.maximum(row[PEAK], peak, out=row[PEAK])
+        np.divide(sumsq, frames, out=sumsq)
+        np.sqrt(sumsq, out=row[RMS])
+        if self.true_peak and frames > self._tp_taps:
+            self._measure_true_peak(idx, row, block, peak)
+
+    def _measure_true_peak(self, idx, row, block, peak):
+        taps = self._tp_taps
+        span = len(block) - taps + 1
+        if self._tp_work[idx] is None or len(self._tp_work[idx]) < span:
+            self.reserve(idx, len(block))  # Only for a stream nobody reserved for
+        work = self._tp_work[idx][:span]
+        term = self._tp_term[idx][:span]
+        for kernel in self._tp_kernels:
+            np.multiply(block[:span], kernel[0], out=work)
+            for j in range(1, taps):
+                np.multiply(block[j:j + span], kernel[j], out=term)
+                np.add(work, term, out=work)
+            np.abs(work, out=term)
+            for c in range(term.shape[1]):
+                peak[c] = max(peak[c], term[:, c].max())
+        np.maximum(row[TRUE_PEAK], peak, out=row[TRUE_PEAK])
+
+    def snapshot(self):
+        # Copy out, then restart the peak-since-last-read fields. A block
+        # landing between the two lines loses its peak; the next one won't.
+        np.copyto(self.snapshot_values, self.values)
+        self.values[:, PEAK] = 0
+        self.values[:, TRUE_PEAK] = 0
+        return self.snapshot_values
+
+    def reset(self):
+        self.values[:] = 0
+
+
+class MeterBallistics:
+    # Display-side smoothing for any array of linear levels: exponential
+    # attack/release on the bar plus a peak-hold marker that falls back
+    # after `hold` seconds. Times are in seconds.
+    def __init__(self, shape, attack=0.005, release=0.3, hold=1.5):
+        self.attack = attack
+        self.release = release
+        self.hold = hold
+        self.level = np.zeros(shape, dtype=np.float32)
+        self.peak = np.zeros(shape, dtype=np.float32)
+        self.hold_left = np.zeros(shape, dtype=np.float32)
+
+    def update(self, level, dt):
+        attack = 1 - np.exp(-dt / self.attack)
+        release = 1 - np.exp(-dt / self.release)
+        coef = np.where(level > self.level, attack, release)
+        self.level += coef * (level - self.level)
+        new_peak = level >= self.peak
+        self.hold_left = np.where(new_peak, self.hold, self.hold_left - dt)
+        falling = self.peak * np.exp(-dt / self.release)
+        self.peak = np.where(new_peak, level,
+                             np.where(self.hold_left > 0, self.peak, np.maximum(falling, level)))
+        return self.level, self.peak
+
+    def reset(self):
+        self.level[:] = 0
+        self.peak[:] = 0
+        self.hold_left[:] = 0
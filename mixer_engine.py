@@ -0,0 +1,1031 @@
+import os
+import time
+
+import numpy as np
+
+from audio_backend import SoundDeviceBackend
+from convolver import PartitionedConvolver, load_ir
+from dsp import ToneFilter
+from dynamics import CompressorBank, LimiterBank
+from latency import LATENCY_PROFILES, LoopbackProbe
+from meters import MeterBank
+from params import ParamStore, routing_gains
+from resampler import DriftController, StreamingResampler
+from recorder import Recorder, session_directory
+from ringbuffer import RingBuffer
+from stats import StreamStats, instrument
+from workers import BlockWorkerPool
+
+
+class InputChannel:
+    # Device side of an input; its controls live in the ParamStore
+    def __init__(self):
+        self.device = None  # No device selected by default
+        self.device_rate = None  # None: open at the engine rate
+
+
+class StreamPath:
+    # Ring between a device stream and the engine. With a resampler the
+    # device side runs at its own rate and clock, and the ratio is trimmed
+    # from the ring fill so neither side slowly over- or underruns.
+    #
+    # A same-rate path can start with its resampler on standby: reads copy
+    # straight from the ring while the smoothed fill is watched, and the
+    # resampler only takes over once the fill wanders half a block from
+    # where it settled, or the ring over- or underruns after settling,
+    # i.e. when the two clocks really drift apart. It switches on a read
+    # that finds the filter's lookahead queued as well as the block, so
+    # switching doesn't underrun (the ring's prefill keeps that much
+    # queued, see MixerEngine._make_path), and primes the filter's history
+    # with the last frames copied, so the signal carries on without a
+    # click.
+    WATCH_SETTLE = 64  # reads before the fill's resting point is taken
+
+    def __init__(self, samplerate, blocksize, ring, resampler=None, controller=None,
+                 clock=None, producer_rate=None, producer_block=None, standby=None):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.ring = ring
+        self.resampler = resampler
+        self.controller = controller
+        self.clock = clock
+        self.producer_rate = producer_rate
+        self.producer_block = producer_block
+        self.last_write = None
+        self.standby = standby  # (resampler, controller) to engage on drift
+        self.history = None
+        if standby is not None:
+            self.history = np.zeros((standby[0].half - 1, ring.channels), dtype=np.float32)
+        self.watched = 0
+        self.rest_fill = 0.0
+        self.wander = 0.0
+        self.rest_xruns = 0
+        self.drifting = False
+
+    def write(self, data):
+        self.ring.write(data)
+        if self.clock is not None:
+            self.last_write = self.clock()
+
+    def smoothed_fill(self):
+        # The producer delivers a block at a time, so the raw fill is a
+        # sawtooth that beats against the consumer's period. Adding the
+        # frames produced since the last write gives a fill that only
+        # moves with real clock drift.
+        fill = self.ring.fill()
+        if self.last_write is None:
+            return fill
+        pending = (self.clock() - self.last_write) * self.producer_rate
+        return fill + min(max(pending, 0.0), self.producer_block)
+
+    def latency(self):
+        # Seconds a frame waits in this path. The block being read leaves
+        # as soon as it lands, so the wait is the queue beyond one producer
+        # block, plus half the resampler's filter. Without a resampler both
+        # sides share a clock and the queue sits at the prefill.
+        if self.resampler is None:
+            queued = self.ring.prefill
+        else:
+            queued = self.smoothed_fill() + self.resampler.taps / 2
+        return max(0.0, queued - self.producer_block) / self.producer_rate
+
+    def read(self, out):
+        if self.drifting and self.ring.fill() >= self.standby[0].frames_needed(len(out)):
+            self._engage()
+        if self.resampler is None:
+            self.ring.read(out)
+            if self.standby is not None:
+                count = min(len(out), len(self.history))
+                self.history[len(self.history) - count:] = out[len(out) - count:]
+                if not self.drifting:
+                    self._watch()
+        else:
+            self.resampler.set_correction(self.controller.update(self.smoothed_fill()))
+            self.resampler.pull(self.ring, out)
+
+    def _watch(self):
+        ring = self.ring
+        fill = self.smoothed_fill()
+        xruns = ring.underruns + ring.overruns
+        self.watched += 1
+        if self.watched <= self.WATCH_SETTLE:
+            self.rest_fill += (fill - self.rest_fill) / self.watched
+            self.rest_xruns = xruns
+            return
+        self.wander += 0.05 * (fill - self.rest_fill - self.wander)
+        if abs(self.wander) > self.producer_block / 2 or xruns > self.rest_xruns:
+            self.drifting = True
+
+    def _engage(self):
+        resampler, controller = self.standby
+        resampler.reset()
+        resampler.prime(self.history)
+        controller.reset()
+        self.controller = controller
+        self.resampler = resampler
+        self.standby = None
+        self.drifting = False
+
+    def stats(self):
+        ring = self.ring
+        stats = {'samplerate': self.samplerate, 'blocksize': self.blocksize,
+                 'fill': ring.fill(), 'fill_level': ring.fill_level(),
+                 'underruns': ring.underruns, 'overruns': ring.overruns,
+                 'dropped_frames': ring.dropped_frames,
+                 'missing_frames': ring.missing_frames}
+        if self.resampler is not None:
+            stats['ratio'] = self.resampler.ratio
+            stats['correction_ppm'] = self.controller.correction * 1e6
+        return stats
+
+
+class StreamSwap:
+    # A device change in flight. The new stream is already running; the
+    # audio thread crossfades from old_path to new_path on a block boundary
+    # and sets done, then the control thread closes old_stream and
+    # publishes new_stats, the new stream's own callback stats.
+    def __init__(self, old_stream, old_path, new_path, drain=False, new_stats=None):
+        self.old_stream = old_stream
+        self.old_path = old_path
+        self.new_path = new_path
+        self.new_stats = new_stats
+        self.drain = drain  # Outputs: let the old ring play out first
+        self.done = False
+        self.done_at = None
+
+    def ready(self):
+        # An input is attached once its ring holds real audio
+        if self.new_path is None:
+            return True
+        ring = self.new_path.ring
+        return ring.fill() >= max(ring.prefill, 1)
+
+
+class MixerEngine:
+    # Headless mixer: streams, routing and tone settings. The GUI (or a
+    # service) drives it through the set_* methods.
+    #
+    # scheduling='timer': the caller runs mix_and_route() on its own clock.
+    # scheduling='pull': the master output's callback mixes exactly one
+    # block per period and hands the other outputs their block through
+    # per-output rings, so nothing else has to call mix_and_route().
+    #
+    # Every stream is opened at its device's rate (set_*_device samplerate).
+    # samplerate=None runs the engine at the master output's rate, so the
+    # master never needs converting. Other streams whose rate differs go
+    # through a StreamPath resampler. drift_compensation='auto' gives
+    # same-rate streams one on standby that engages when their clock
+    # drifts measurably; True resamples every stream from the start, False
+    # never resamples at equal rates. In timer mode outputs are opened at
+    # the engine rate.
+    #
+    # set_devices() on a running engine only reopens the slots that
+    # changed, crossfading over one block (see StreamSwap).
+    #
+    # latency is the PortAudio hint passed to every stream ('low', 'high',
+    # seconds or None); set_latency_profile() sets it with the blocksize.
+    # With adaptive_blocksize, check_xruns() doubles the blocksize (up to
+    # max_blocksize) when xruns keep coming.
+    #
+    # dsp_workers > 0 spreads the per-input work of each live block over
+    # that many threads plus the mixing one (workers.BlockWorkerPool).
+    # Inputs not done after dsp_deadline of the block period are left out
+    # of that block's mix and counted in deadline_misses / late_blocks.
+    #
+    # Every input has a compressor (off until its ratio is set, see
+    # ParamStore.set_compressor) and, with limiter=True, every output bus a
+    # true-peak look-ahead limiter at limiter_ceiling dBTP
+    # (set_output_limiter). Both run vectorized over all strips at once
+    # (dynamics.py); gain_reduction() is their meter.
+    def __init__(self, backend=None, num_inputs=4, num_outputs=6, channels=2,
+                 samplerate=48000, blocksize=4096, scheduling='timer', queue_depth=4,
+                 ring_depth=4, prefill_blocks=1, drift_compensation='auto', true_peak_meters=False,
+                 latency=None, adaptive_blocksize=False, max_blocksize=4096, dsp_workers=0,
+                 dsp_deadline=0.75, limiter=True, limiter_ceiling=-1.0):
+        if backend is None:
+            backend = SoundDeviceBackend()
+        self.backend = backend
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+        self.channels = channels
+        self.requested_samplerate = samplerate
+        self.samplerate = samplerate or 48000
+        self.blocksize = blocksize
+        self.latency = latency
+        self.adaptive_blocksize = adaptive_blocksize
+        self.max_blocksize = max_blocksize
+        self.xrun_window = 10.0  # seconds
+        self.xrun_limit = 4  # xruns within the window that step up
+        self.xrun_history = []
+        self.drift_compensation = drift_compensation
+        if scheduling not in ('timer', 'pull'):
+            raise ValueError(f"Unknown scheduling mode: {scheduling}")
+        self.scheduling = scheduling
+        self.queue_depth = queue_depth
+        self.master_output = None  # None: first output with a device
+
+        self.inputs = [InputChannel() for _ in range(num_inputs)]
+        # Levels, tone and routing, published as one snapshot per change
+        # (params.ParamStore); each block mixes with the snapshot it starts
+        # with, block_params
+        self.params = ParamStore(num_inputs, num_outputs)
+        self.block_params = self.params.current
+        self.output_devices = [None] * num_outputs
+        self.output_rates = [None] * num_outputs
+
+        # Input callbacks write into a ring per input; the mixer takes
+        # exactly one block from each ring per period into input_blocks.
+        # Paths are built on start() for the devices selected then.
+        self.ring_depth = ring_depth
+        self.prefill_blocks = prefill_blocks
+        self.input_paths = [None] * num_inputs
+        self.tone_filters = [ToneFilter(self.samplerate, self.channels)
+                             for _ in range(self.num_inputs)]
+        # Convolution inserts (convolver.ImpulseResponse), after the tone
+        # stack per input and after the mix per output; the convolvers are
+        # rebuilt when the blocksize or engine rate changes
+        self.input_irs = [None] * num_inputs
+        self.output_irs = [None] * num_outputs
+        self.input_convolvers = [None] * num_inputs
+        self.output_convolvers = [None] * num_outputs
+        # Dynamics, rebuilt with the blocks: ceiling per bus in dBTP (None:
+        # unity, but still delayed like the other buses)
+        self.limiter_enabled = limiter
+        self.output_ceilings = np.full(num_outputs, limiter_ceiling, dtype=np.float64)
+        self.compressors = None
+        self.limiter = None
+        self._allocate_blocks()
+        # (outputs, inputs) gains the last block ended on, and the version
+        # of the snapshot they came from (None: snap to the next one). A new
+        # snapshot is ramped to over one block.
+        self.gains_now = np.zeros((self.num_outputs, self.num_inputs), dtype=np.float32)
+        self.gains_version = None
+        self.gains_late = np.zeros_like(self.gains_now)
+        # Peak/RMS per input channel, written by the input callbacks and
+        # polled by the GUI (meters.MeterBank)
+        self.input_meters = MeterBank(num_inputs, channels, true_peak=true_peak_meters,
+                                      max_frames=blocksize)
+
+        # Pull scheduling: blocks waiting for the non-master outputs
+        self.output_paths = [None] * num_outputs
+        self.active_master = None
+
+        # Hot-swaps: published per slot by set_devices(), picked up by the
+        # mixer on its next block
+        self.input_swaps = [None] * num_inputs
+        self.output_swaps = [None] * num_outputs
+        self.pending_swaps = []
+        self.swap_release_timeout = 1.0
+
+        self.dsp_workers = dsp_workers
+        self.dsp_deadline = dsp_deadline
+        self.dsp_pool = None
+        self.deadline_misses = 0
+        self.late_blocks = np.zeros(num_inputs, dtype=np.int64)
+
+        # Recording taps (recorder.Tap): inputs as they come off the
+        # device, outputs as they go to it
+        self.input_taps = [None] * num_inputs
+        self.output_taps = [None] * num_outputs
+        self.recorder = None
+
+        # Loopback latency test in progress (latency.LoopbackProbe) and the
+        # result of the last one
+        self.probe = None
+        self.last_loopback = None
+
+        self.input_streams = []
+        self.output_streams = []
+        self.running = False
+        # Callback timing and xrun flags per stream name ("input0",
+        # "output3"), kept across restarts so counters only go up
+        self.stream_stats = {}
+
+    def _allocate_blocks(self):
+        # Everything sized by the blocksize; rebuilt by set_blocksize()
+        shape = (self.blocksize, self.channels)
+        self.input_blocks = np.zeros((self.num_inputs,) + shape, dtype=np.float32)
+        # (inputs, frames, channels) after the tone stack, mixed in one go
+        self.processed_buffers = np.zeros((self.num_inputs,) + shape, dtype=np.float32)
+        self.mixed_buffers = np.zeros((self.num_outputs,) + shape, dtype=np.float32)
+        ramp = np.linspace(0, np.pi / 2, self.blocksize, dtype=np.float32)[:, None]
+        self.fade_in = np.sin(ramp)
+        self.fade_out = np.cos(ramp)
+        self.fade_block = np.zeros(shape, dtype=np.float32)
+        # Per input, so crossfades can run on any DSP worker
+        self.input_fade_blocks = np.zeros((self.num_inputs,) + shape, dtype=np.float32)
+        # Gain ramps: 1/frames .. 1 per frame, laid out like the mixed
+        # buffers seen by the routing matmul, and scratch for the second mix
+        frames = np.arange(1, self.blocksize + 1, dtype=np.float32) / self.blocksize
+        self.gain_ramp = np.ascontiguousarray(np.broadcast_to(
+            np.repeat(frames, self.channels), (self.num_outputs, self.blocksize * self.channels)))
+        self.ramp_scratch = np.zeros_like(self.gain_ramp)
+        self._build_dynamics()
+
+    def _build_dynamics(self):
+        self.compressors = CompressorBank(self.num_inputs, self.channels, self.samplerate,
+                                          self.blocksize)
+        self.limiter = None
+        if self.limiter_enabled:
+            self.limiter = LimiterBank(self.num_outputs, self.channels, self.samplerate,
+                                       self.blocksize)
+            self.limiter.set_ceilings(self.output_ceilings)
+
+    def set_blocksize(self, blocksize, latency=None):
+        # Restarts a running engine; latency=None keeps the current hint
+        running = self.running
+        if running:
+            self.stop()
+        self.blocksize = blocksize
+        if latency is not None:
+            self.latency = latency
+        self._allocate_blocks()
+        self._build_convolvers()
+        if running:
+            self.start()
+
+    def set_latency_profile(self, name):
+        blocksize, latency = LATENCY_PROFILES[name]
+        self.set_blocksize(blocksize, latency)
+
+    def set_input_device(self, idx, device, samplerate=None):
+        self.inputs[idx].device = device
+        self.inputs[idx].device_rate = samplerate
+
+    def set_output_device(self, idx, device, samplerate=None):
+        self.output_devices[idx] = device
+        self.output_rates[idx] = samplerate
+
+    def set_devices(self, inputs=None, outputs=None):
+        # Apply a whole device assignment, [(device, samplerate), ...] per
+        # input and output slot (None keeps that side). Stopped: only records
+        # it. Running: each changed slot gets its new stream opened and
+        # started before the mixer crossfades to it; the old one is closed
+        # by release_swaps(). Changing the master output, the clock of pull
+        # scheduling, restarts everything. Returns the changed slots as
+        # ('input' | 'output', idx).
+        if inputs is None:
+            inputs = [(ch.device, ch.device_rate) for ch in self.inputs]
+        if outputs is None:
+            outputs = list(zip(self.output_devices, self.output_rates))
+        changed = [('input', i) for i, (device, rate) in enumerate(inputs)
+                   if (device, rate) != (self.inputs[i].device, self.inputs[i].device_rate)]
+        changed += [('output', i) for i, (device, rate) in enumerate(outputs)
+                    if (device, rate) != (self.output_devices[i], self.output_rates[i])]
+        if not self.running or not changed or self._needs_restart(changed, outputs):
+            restart = self.running and bool(changed)
+            if restart:
+                self.stop()
+            for i, (device, rate) in enumerate(inputs):
+                self.set_input_device(i, device, rate)
+            for i, (device, rate) in enumerate(outputs):
+                self.set_output_device(i, device, rate)
+            if restart:
+                self.start()
+            return changed
+        for kind, i in changed:
+            if kind == 'input':
+                self._swap_input(i, *inputs[i])
+            else:
+                self._swap_output(i, *outputs[i])
+        return changed
+
+    def _needs_restart(self, changed, outputs):
+        for kind, i in changed:
+            swaps = self.input_swaps if kind == 'input' else self.output_swaps
+            if swaps[i] is not None:
+                return True  # Still crossfading from the last change
+            if kind == 'output' and self.scheduling == 'pull':
+                if i == self.active_master:
+                    return True
+                if self.active_master is None and outputs[i][0] is not None:
+                    return True  # First output: nothing clocks the mixer yet
+        return False
+
+    def _swap_input(self, idx, device, samplerate):
+        path = stream = stats = None
+        if device is not None:
+            path = self._make_path(samplerate, self.ring_depth, True)
+            print(f"Opening input {idx}: idx={device} channels={self.channels} "
+                  f"rate={path.samplerate}")
+            stats = self._swap_stats(f"input{idx}", 'input', path.samplerate,
+                                     self.input_streams[idx])
+            callback = instrument(stats, self.input_callback_factory(idx, path))
+            stream = self.backend.open_input(device, self.channels, path.samplerate,
+                                             path.blocksize, callback, latency=self.latency)
+            try:
+                stream.start()
+            except Exception:
+                stream.close()
+                raise
+        self.set_input_device(idx, device, samplerate)
+        swap = StreamSwap(self.input_streams[idx], self.input_paths[idx], path,
+                          new_stats=stats)
+        self.input_streams[idx] = stream
+        self.pending_swaps.append(swap)
+        self.input_swaps[idx] = swap
+
+    def _swap_output(self, idx, device, samplerate):
+        path = stream = stats = None
+        if device is not None:
+            if self.scheduling == 'pull':
+                path = self._make_path(samplerate, self.queue_depth, False)
+                rate, blocksize = path.samplerate, path.blocksize
+                callback = self._make_follower_callback(idx, path)
+            else:
+                rate, blocksize = self.samplerate, self.blocksize
+                callback = self.make_output_callback(idx)
+            stats = self._swap_stats(f"output{idx}", 'output', rate, self.output_streams[idx])
+            stream = self.backend.open_output(device, self.channels, rate, blocksize,
+                                              instrument(stats, callback), latency=self.latency)
+            try:
+                stream.start()
+            except Exception:
+                stream.close()
+                raise
+        self.set_output_device(idx, device, samplerate)
+        old_stream = self.output_streams[idx]
+        self.output_streams[idx] = stream
+        if self.scheduling != 'pull':
+            # Timer mode: every output reads the shared mix, nothing to fade
+            self._close_stream(old_stream)
+            self._publish_stats(stats)
+            return
+        swap = StreamSwap(old_stream, self.output_paths[idx], path, drain=True, new_stats=stats)
+        self.pending_swaps.append(swap)
+        self.output_swaps[idx] = swap
+
+    def _ring_residue(self, path):
+        # A resampling reader leaves its filter lookahead in the ring
+        return path.resampler.taps if path.resampler is not None else 0
+
+    def release_swaps(self):
+        # Control thread: close the streams finished crossfades left behind.
+        # An old output keeps running until its ring has played out.
+        now = time.monotonic()
+        pending = []
+        for swap in self.pending_swaps:
+            if swap.done and swap.done_at is None:
+                swap.done_at = now
+            drained = (not swap.drain or swap.old_path is None
+                       or swap.old_path.ring.fill() <= self._ring_residue(swap.old_path))
+            if swap.done and (drained or now - swap.done_at > self.swap_release_timeout):
+                self._close_stream(swap.old_stream)
+                self._publish_stats(swap.new_stats)
+            else:
+                pending.append(swap)
+        self.pending_swaps = pending
+
+    def set_level(self, idx, level):
+        self.params.set_level(idx, level)
+
+    def set_tone(self, idx, bass=None, treble=None, eq=None):
+        self.params.set_tone(idx, bass, treble, eq)
+
+    def set_input_ir(self, idx, ir):
+        # ir: ImpulseResponse, path to a WAV file, or None to remove. The
+        # convolver is built here and swapped in on the next block.
+        if isinstance(ir, str):
+            ir = load_ir(ir)
+        self.input_irs[idx] = ir
+        self.input_convolvers[idx] = self._convolver(ir)
+
+    def set_output_ir(self, idx, ir):
+        if isinstance(ir, str):
+            ir = load_ir(ir)
+        self.output_irs[idx] = ir
+        self.output_convolvers[idx] = self._convolver(ir)
+
+    def _convolver(self, ir):
+        if ir is None:
+            return None
+        return PartitionedConvolver(ir.resampled(self.samplerate), self.blocksize, self.channels)
+
+    def _build_convolvers(self):
+        self.input_convolvers = [self._convolver(ir) for ir in self.input_irs]
+        self.output_convolvers = [self._convolver(ir) for ir in self.output_irs]
+
+    def start_recording(self, directory, inputs=None, outputs=None, fmt='wav', buffer_seconds=10.0,
+                        session=True):
+        # Record inputs and output buses to in<N>.<fmt> / A<N>.<fmt>, in a
+        # timestamped subdirectory with session=True. inputs=None: every
+        # input with a device; outputs=None: every bus. Call once the
+        # engine runs, so files get the engine rate. Returns the Recorder.
+        if self.recorder is not None:
+            self.stop_recording()
+        if session:
+            directory = session_directory(directory)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        if inputs is None:
+            inputs = [i for i, ch in enumerate(self.inputs) if ch.device is not None]
+        if outputs is None:
+            outputs = range(self.num_outputs)
+        recorder = Recorder()
+        try:
+            in_taps = {i: recorder.add(f"in{i+1}", os.path.join(directory, f"in{i+1}.{fmt}"),
+                                       self.samplerate, self.channels, fmt, buffer_seconds)
+                       for i in inputs}
+            out_taps = {o: recorder.add(f"A{o+1}", os.path.join(directory, f"A{o+1}.{fmt}"),
+                                        self.samplerate, self.channels, fmt, buffer_seconds)
+                        for o in outputs}
+        except Exception:
+            recorder.close()
+            raise
+        self.recorder = recorder.start()
+        self.input_taps = [in_taps.get(i) for i in range(self.num_inputs)]
+        self.output_taps = [out_taps.get(o) for o in range(self.num_outputs)]
+        return recorder
+
+    def stop_recording(self):
+        recorder = self.recorder
+        if recorder is None:
+            return None
+        self.input_taps = [None] * self.num_inputs
+        self.output_taps = [None] * self.num_outputs
+        self.recorder = None
+        recorder.close()
+        return recorder.stats()
+
+    def set_route(self, in_idx, out_idx, enabled):
+        self.params.set_route(in_idx, out_idx, enabled)
+
+    def set_compressor(self, idx, threshold=None, ratio=None, attack=None, release=None,
+                       makeup=None):
+        self.params.set_compressor(idx, threshold, ratio, attack, release, makeup)
+
+    def set_output_limiter(self, idx, ceiling):
+        # ceiling in dBTP, None for no gain reduction on that bus
+        self.output_ceilings[idx] = np.inf if ceiling is None else ceiling
+        if self.limiter is not None:
+            self.limiter.set_ceilings(self.output_ceilings)
+
+    def gain_reduction(self):
+        # Most gain reduction in dB since the last call, per input
+        # compressor and per output limiter (zeros without a limiter)
+        inputs = self.compressors.reduction.snapshot().copy()
+        if self.limiter is None:
+            return inputs, np.zeros(self.num_outputs)
+        return inputs, self.limiter.reduction.snapshot().copy()
+
+    def set_master_output(self, idx):
+        # Takes effect on the next start()
+        self.master_output = idx
+
+    def _pick_master(self):
+        if self.master_output is not None and self.output_devices[self.master_output] is not None:
+            return self.master_output
+        for i, device in enumerate(self.output_devices):
+            if device is not None:
+                return i
+        return None
+
+    def input_callback_factory(self, idx, path=None):
+        if path is None:
+            path = self.input_paths[idx]
+        meters = self.input_meters
+        meters.reserve(idx, path.blocksize)
+
+        def callback(indata, frames, time, status):
+            path.write(indata)
+            meters.measure(idx, indata)
+        return callback
+
+    def make_output_callback(self, out_idx):
+        if self.scheduling == 'pull':
+            if out_idx == self.active_master:
+                return self._make_master_callback(out_idx)
+            return self._make_follower_callback(out_idx)
+
+        def output_callback(outdata, frames, time, status):
+            outdata[:] = self.mixed_buffers[out_idx]
+        return output_callback
+
+    def _make_master_callback(self, out_idx):
+        paths = self.output_paths
+        swaps = self.output_swaps
+
+        def master_callback(outdata, frames, time, status):
+            self.mix_and_route()
+            mixed = self.mixed_buffers
+            for i, path in enumerate(paths):
+                if swaps[i] is not None:
+                    self._crossfade_output(i, swaps[i], mixed[i])
+                elif path is not None:
+                    # A full ring drops the block and counts an overrun
+                    path.write(mixed[i])
+            outdata[:] = mixed[out_idx]
+        return master_callback
+
+    def _crossfade_output(self, idx, swap, block):
+        # Last block to the old device fades out, first to the new one in
+        fade = self.fade_block
+        if swap.old_path is not None:
+            np.multiply(block, self.fade_out, out=fade)
+            swap.old_path.write(fade)
+        if swap.new_path is not None:
+            np.multiply(block, self.fade_in, out=fade)
+            swap.new_path.write(fade)
+        self.output_paths[idx] = swap.new_path
+        self.output_swaps[idx] = None
+        swap.done = True
+
+    def _make_follower_callback(self, out_idx, path=None):
+        if path is None:
+            path = self.output_paths[out_idx]
+
+        def follower_callback(outdata, frames, time, status):
+            path.read(outdata)
+        return follower_callback
+
+    def input_fill_levels(self):
+        return [path.ring.fill_level() if path is not None else 0.0
+                for path in self.input_paths]
+
+    def input_ring_stats(self):
+        return [path.stats() if path is not None else None for path in self.input_paths]
+
+    def output_ring_stats(self):
+        return [path.stats() if path is not None else None for path in self.output_paths]
+
+    def _stream_stats(self, name, kind, samplerate):
+        stats = self.stream_stats.get(name)
+        if stats is None:
+            stats = self.stream_stats[name] = StreamStats(name, kind, samplerate)
+        stats.kind = kind
+        stats.samplerate = samplerate
+        stats.last_start = None
+        return stats
+
+    def _swap_stats(self, name, kind, samplerate, old_stream):
+        # A stream replacing a running one gets stats of its own while both
+        # callbacks run; they are published once the old stream is closed
+        if old_stream is None or name not in self.stream_stats:
+            return self._stream_stats(name, kind, samplerate)
+        return StreamStats(name, kind, samplerate)
+
+    def _publish_stats(self, stats):
+        if stats is None:
+            return
+        old = self.stream_stats.get(stats.name)
+        if old is stats:
+            return
+        if old is not None:
+            stats.carry = old
+        self.stream_stats[stats.name] = stats
+
+    def callback_stats(self):
+        # Summary per stream for display; stats.prometheus_text() has it all
+        summary = {}
+        for name, s in self.stream_stats.items():
+            summary[name] = {'callbacks': s.callbacks, 'xruns': dict(s.xruns),
+                             'duration_p99': s.duration.quantile(0.99),
+                             'gap_max': s.gap.quantile(1.0),
+                             'load_p99': s.load.quantile(0.99), 'load_max': s.max_load}
+        return summary
+
+    def xrun_count(self):
+        # Device xrun flags plus ring under/overruns since the last start
+        count = sum(s.total_xruns() for s in self.stream_stats.values())
+        for path in self.input_paths + self.output_paths:
+            if path is not None:
+                count += path.ring.underruns + path.ring.overruns
+        return count
+
+    def check_xruns(self, now=None):
+        # Control thread, every second or so. With adaptive_blocksize, more
+        # than xrun_limit xruns within xrun_window seconds double the
+        # blocksize (restarting the streams). Returns the new blocksize or
+        # None.
+        if not self.running:
+            return None
+        now = time.monotonic() if now is None else now
+        history = self.xrun_history
+        history.append((now, self.xrun_count()))
+        while now - history[0][0] > self.xrun_window:
+            history.pop(0)
+        xruns = history[-1][1] - history[0][1]
+        if (not self.adaptive_blocksize or xruns < self.xrun_limit
+                or self.blocksize >= self.max_blocksize):
+            return None
+        blocksize = min(2 * self.blocksize, self.max_blocksize)
+        print(f"{xruns} xruns in {self.xrun_window:g} s: blocksize {self.blocksize} -> {blocksize}")
+        self.set_blocksize(blocksize)
+        return blocksize
+
+    def latency_report(self):
+        # Seconds per stage from the engine's buffers and the devices' time
+        # info (device 0.0 where the host API reports nothing), and the
+        # resulting input -> output monitoring latency for every pair
+        block = self.blocksize / self.samplerate
+        inputs = {}
+        for i, path in enumerate(self.input_paths):
+            if path is not None:
+                stats = self.stream_stats.get(f"input{i}")
+                inputs[i] = {'device': stats.device_latency if stats else 0.0,
+                             'buffer': path.latency()}
+        outputs = {}
+        for i, device in enumerate(self.output_devices):
+            if device is None or not self.running:
+                continue
+            stats = self.stream_stats.get(f"output{i}")
+            path = self.output_paths[i]
+            # Timer mode: a block waits up to a period for the output
+            buffer = path.latency() if path is not None else (
+                block if self.scheduling == 'timer' else 0.0)
+            limiter = self.limiter.latency if self.limiter is not None else 0.0
+            outputs[i] = {'device': stats.device_latency if stats else 0.0, 'buffer': buffer,
+                          'limiter': limiter}
+        roundtrip = {(i, o): inp['device'] + inp['buffer'] + out['buffer'] + out['limiter']
+                     + out['device']
+                     for i, inp in inputs.items() for o, out in outputs.items()}
+        return {'blocksize': self.blocksize, 'block': block, 'inputs': inputs,
+                'outputs': outputs, 'roundtrip': roundtrip, 'loopback': self.last_loopback}
+
+    def measure_loopback(self, in_idx, out_idx, **kwargs):
+        # Start a loopback impulse test (cable output out_idx to input
+        # in_idx first); poll the returned probe's result(). The median also
+        # lands in last_loopback.
+        probe = LoopbackProbe(in_idx, out_idx, self.samplerate, **kwargs)
+        self.probe = probe
+        return probe
+
+    def _configure_samplerate(self):
+        rate = self.requested_samplerate
+        if rate is None:
+            rate = 48000
+            if self.active_master is not None:
+                rate = self.output_rates[self.active_master] or rate
+        if rate != self.samplerate or self.tone_filters[0].samplerate != rate:
+            self.samplerate = rate
+            self.tone_filters = [ToneFilter(rate, self.channels) for _ in range(self.num_inputs)]
+            self._build_convolvers()
+            self._build_dynamics()
+
+    def _make_path(self, device_rate, depth, towards_engine):
+        # towards_engine: device -> engine (input), else engine -> device
+        rate = device_rate or self.samplerate
+        device_block = max(1, int(round(self.blocksize * rate / self.samplerate)))
+        # The ring holds frames on the producer's side
+        ring_block = device_block if towards_engine else self.blocksize
+        ring = RingBuffer(depth * ring_block, self.channels,
+                          prefill=self.prefill_blocks * ring_block)
+        producer_rate = rate if towards_engine else self.samplerate
+        if rate == self.samplerate and self.drift_compensation is not True:
+            standby = None
+            if self.drift_compensation == 'auto':
+                standby = self._drift_resampler(ring, ring_block, 1.0, device_block)
+                # Reads start with the standby filter's lookahead queued on
+                # top of the prefill, so it can take over without waiting
+                ring.prefill = min(ring.prefill + standby[0].half, ring.capacity)
+            return StreamPath(rate, device_block, ring, clock=self.backend.now,
+                              producer_rate=producer_rate, producer_block=ring_block,
+                              standby=standby)
+        if towards_engine:
+            ratio, out_frames = rate / self.samplerate, self.blocksize
+        else:
+            ratio, out_frames = self.samplerate / rate, device_block
+        resampler, controller = self._drift_resampler(ring, ring_block, ratio, out_frames)
+        return StreamPath(rate, device_block, ring, resampler, controller,
+                          clock=self.backend.now, producer_rate=producer_rate,
+                          producer_block=ring_block)
+
+    def _drift_resampler(self, ring, ring_block, ratio, out_frames):
+        resampler = StreamingResampler(self.channels, ratio, max_frames=out_frames)
+        # The smoothed fill counts the producer's next block as it arrives,
+        # so a read finds at least prefill frames (plus the filter's
+        # lookahead) queued when it sits one block above that
+        target = ring.prefill + ring_block + resampler.taps
+        return resampler, DriftController(target, ring_block)
+
+    def start(self):
+        self.xrun_history = []
+        self.gains_version = None  # No ramp from whatever played last time
+        self.compressors.reset()
+        if self.limiter is not None:
+            self.limiter.reset()
+        if self.dsp_workers > 0 and self.scheduling == 'pull':
+            self.dsp_pool = BlockWorkerPool(self.num_inputs, self.dsp_workers, self._live_input)
+        self.active_master = self._pick_master() if self.scheduling == 'pull' else None
+        self._configure_samplerate()
+        self.input_blocks[:] = 0
+        try:
+            self.input_streams = []
+            for i, ch in enumerate(self.inputs):
+                if ch.device is not None:
+                    path = self._make_path(ch.device_rate, self.ring_depth, True)
+                    self.input_paths[i] = path
+                    print(f"Opening input {i}: idx={ch.device} channels={self.channels} "
+                          f"rate={path.samplerate}")
+                    stats = self._stream_stats(f"input{i}", 'input', path.samplerate)
+                    callback = instrument(stats, self.input_callback_factory(i))
+                    stream = self.backend.open_input(ch.device, self.channels, path.samplerate,
+                                                     path.blocksize, callback,
+                                                     latency=self.latency)
+                    self.input_streams.append(stream)
+                    stream.start()
+                else:
+                    # No device: buffer stays silent
+                    self.input_paths[i] = None
+                    self.input_streams.append(None)
+
+            for i, device in enumerate(self.output_devices):
+                if device is not None and self.scheduling == 'pull' and i != self.active_master:
+                    self.output_paths[i] = self._make_path(self.output_rates[i],
+                                                           self.queue_depth, False)
+                else:
+                    self.output_paths[i] = None
+            self.output_streams = []
+            for i, device in enumerate(self.output_devices):
+                if device is not None:
+                    path = self.output_paths[i]
+                    if path is not None:
+                        rate, blocksize = path.samplerate, path.blocksize
+                    else:
+                        rate, blocksize = self.samplerate, self.blocksize
+                    kind = 'master' if i == self.active_master else 'output'
+                    stats = self._stream_stats(f"output{i}", kind, rate)
+                    callback = instrument(stats, self.make_output_callback(i))
+                    stream = self.backend.open_output(device, self.channels, rate,
+                                                      blocksize, callback, latency=self.latency)
+                    self.output_streams.append(stream)
+                    stream.start()
+                else:
+                    self.output_streams.append(None)
+            self.running = True
+        except Exception:
+            self._close_streams()
+            self.running = False
+            raise
+
+    def stop(self):
+        self.running = False
+        self.probe = None
+        for swap in self.pending_swaps:
+            self._close_stream(swap.old_stream)
+        self.pending_swaps = []
+        self.input_swaps[:] = [None] * self.num_inputs
+        self.output_swaps[:] = [None] * self.num_outputs
+        self._close_streams()
+        if self.dsp_pool is not None:
+            self.dsp_pool.close()
+            self.dsp_pool = None
+        self.input_blocks[:] = 0
+        self.input_meters.reset()
+
+    def _close_stream(self, stream):
+        if stream is None:
+            return
+        try:
+            stream.stop()
+            stream.close()
+        except Exception as e:
+            print("Error closing stream:", e)
+
+    def _close_streams(self):
+        for stream in self.input_streams + self.output_streams:
+            self._close_stream(stream)
+        self.input_streams = []
+        self.output_streams = []
+
+    def routing_matrix(self):
+        # inputs x outputs gains of the current controls
+        return routing_gains(self.params.current.inputs)
+
+    def mix_and_route(self):
+        # One live block: every input's ring read, crossfade and tone stack
+        # (shared out over the DSP workers when there are any), then the
+        # routing matrix. Inputs whose worker misses the deadline sit this
+        # block out instead of making every output late.
+        self.block_params = params = self.params.current
+        probe = self.probe
+        pool = self.dsp_pool
+        missed = None
+        if pool is None:
+            for in_idx in range(self.num_inputs):
+                self._live_input(in_idx)
+        else:
+            period = self.blocksize / self.samplerate
+            missed = pool.run(time.perf_counter() + self.dsp_deadline * period)
+        # Not on the rows of late inputs: their workers may still be writing
+        self.compressors.process(self.processed_buffers, params, missed or ())
+        if missed:
+            self._mix_without(params, missed)
+        else:
+            self._mix(params)
+        self._output_inserts()
+        for out_idx, tap in enumerate(self.output_taps):
+            if tap is not None:
+                tap.push(self.mixed_buffers[out_idx])
+        if probe is not None:
+            probe.send(self.mixed_buffers)
+            if probe.done:
+                self.last_loopback = probe.result()
+                self.probe = None
+
+    def _live_input(self, in_idx):
+        # Everything one input needs per live block; runs on a DSP worker
+        # when there is a pool, and touches no other input's state
+        block = self.input_blocks[in_idx]
+        path = self.input_paths[in_idx]
+        # Drain every open input, routed or not, so its latency stays put
+        if path is not None:
+            path.read(block)
+        else:
+            block[:] = 0
+        swap = self.input_swaps[in_idx]
+        if swap is not None and swap.ready():
+            self._crossfade_input(in_idx, swap)
+        tap = self.input_taps[in_idx]
+        if tap is not None:
+            tap.push(block)
+        probe = self.probe
+        if probe is not None and probe.in_idx == in_idx:
+            probe.listen(self.input_blocks)
+        self._process_input(in_idx)
+
+    def _mix_without(self, params, missed):
+        # The late rows may still be being written: mix them at zero gain,
+        # and jump straight to the snapshot's gains
+        self.deadline_misses += 1
+        gains = self.gains_late
+        np.copyto(gains, params.gains_t)
+        for in_idx in missed:
+            self.late_blocks[in_idx] += 1
+            gains[:, in_idx] = 0
+        np.matmul(gains, self.processed_buffers.reshape(self.num_inputs, -1),
+                  out=self.mixed_buffers.reshape(self.num_outputs, -1))
+        np.copyto(self.gains_now, params.gains_t)
+        self.gains_version = params.version
+
+    def _crossfade_input(self, idx, swap):
+        # blocks[idx] holds the old stream's block; blend in the new one's
+        block = self.input_blocks[idx]
+        old = self.input_fade_blocks[idx]
+        old[:] = block
+        if swap.new_path is not None:
+            swap.new_path.read(block)
+            block *= self.fade_in
+        else:
+            block[:] = 0
+        old *= self.fade_out
+        block += old
+        self.input_paths[idx] = swap.new_path
+        self.input_swaps[idx] = None
+        swap.done = True
+
+    def process_block(self):
+        # Tone stack and routing over whatever is in input_blocks, on the
+        # calling thread; render.py fills them from files. Works in place on
+        # the engine's buffers, so a steady block allocates no arrays
+        # (bench.py --check-alloc).
+        self.block_params = params = self.params.current
+        for in_idx in range(self.num_inputs):
+            self._process_input(in_idx)
+        self.compressors.process(self.processed_buffers, params)
+        self._mix(params)
+        self._output_inserts()
+
+    def _process_input(self, in_idx):
+        # Each input is filtered once, however many outputs it feeds
+        params = self.block_params
+        conv = self.input_convolvers[in_idx]
+        if not params.routed[in_idx]:
+            self.processed_buffers[in_idx] = 0
+            self.tone_filters[in_idx].reset()
+            if conv is not None:
+                conv.reset()
+            return
+        block = self.processed_buffers[in_idx]
+        bass, treble, eq = params.tones[in_idx]
+        self.tone_filters[in_idx].process(self.input_blocks[in_idx], bass, treble, eq, out=block)
+        if conv is not None:
+            conv.process(block, out=block)
+
+    def _output_inserts(self):
+        # Convolution, then the limiters as the last thing before the devices
+        for out_idx, conv in enumerate(self.output_convolvers):
+            if conv is not None:
+                conv.process(self.mixed_buffers[out_idx], out=self.mixed_buffers[out_idx])
+        if self.limiter is not None:
+            self.limiter.process(self.mixed_buffers)
+
+    def _mix(self, params):
+        # (outputs, inputs) @ (inputs, frames * channels) in one matmul.
+        # After a control change the gains move linearly across the block,
+        # which is the old gains' mix crossfaded into the new gains' mix:
+        # a second matmul and three in-place ops, only on that block.
+        processed = self.processed_buffers.reshape(self.num_inputs, -1)
+        mixed = self.mixed_buffers.reshape(self.num_outputs, -1)
+        if self.gains_version is None or self.gains_version == params.version:
+            np.matmul(params.gains_t, processed, out=mixed)
+        else:
+            scratch = self.ramp_scratch
+            np.matmul(self.gains_now, processed, out=mixed)
+            np.matmul(params.gains_t, processed, out=scratch)
+            np.subtract(scratch, mixed, out=scratch)
+            np.multiply(scratch, self.gain_ramp, out=scratch)
+            np.add(mixed, scratch, out=mixed)
+        if self.gains_version != params.version:
+            np.copyto(self.gains_now, params.gains_t)
+            self.gains_version = params.version
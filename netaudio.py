@@ -0,0 +1,667 @@
+import abc
+import socket
+import struct
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+# RTP payload types (dynamic range) and bytes per sample. float32 is sent
+# little-endian, straight from the mix buffers; int24 is network-order L24
+# as in AES67.
+FORMATS = {'float32': (97, 4), 'int24': (96, 3)}
+PAYLOAD_TYPES = {pt: fmt for fmt, (pt, _) in FORMATS.items()}
+
+RTP_HEADER = struct.Struct('!BBHII')
+MAX_PAYLOAD = 1440  # Fits one Ethernet frame with IP, UDP and RTP headers
+
+# Linux UDP generic segmentation offload: one sendmsg() carries a run of
+# equal-sized datagrams, the kernel cuts them apart
+UDP_SEGMENT = getattr(socket, 'UDP_SEGMENT', 103)
+GSO_MAX_SEGMENTS = 64
+GSO_MAX_BYTES = 65000
+
+
+class NetEndpoint:
+    # A network stream shown as a device: kind 'input' listens on
+    # host:port (a multicast group is joined), kind 'output' sends there
+    def __init__(self, kind, host, port, fmt='float32', samplerate=48000, channels=2,
+                 name=None):
+        if kind not in ('input', 'output'):
+            raise ValueError(f"Endpoint kind must be 'input' or 'output', not {kind!r}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown network format {fmt!r} (use {', '.join(FORMATS)})")
+        self.kind = kind
+        self.host = host
+        self.port = port
+        self.fmt = fmt
+        self.samplerate = samplerate
+        self.channels = channels
+        arrow = "from" if kind == 'input' else "to"
+        self.name = name or f"RTP {arrow} {host}:{port} ({fmt})"
+
+
+def parse_endpoint(kind, spec, samplerate=48000):
+    # "host:port" or "host:port/int24"
+    address, _, fmt = spec.partition('/')
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Network endpoint must be host:port[/format], not {spec!r}")
+    return NetEndpoint(kind, host, int(port), fmt or 'float32', samplerate)
+
+
+def _is_multicast(host):
+    try:
+        return 224 <= int(socket.gethostbyname(host).split('.')[0]) <= 239
+    except (OSError, ValueError):
+        return False
+
+
+class _Flags:
+    # Same flags as sounddevice.CallbackFlags
+    input_underflow = False
+    input_overflow = False
+    output_underflow = False
+    output_overflow = False
+    priming_output = False
+
+    def __init__(self, **flags):
+        for name, value in flags.items():
+            setattr(self, name, value)
+
+    def __bool__(self):
+        return bool(self.input_underflow or self.input_overflow or self.output_underflow
+                    or self.output_overflow or self.priming_output)
+
+
+ON_TIME = _Flags()
+# When the stream's clock thread fell behind, the one xrun the stream's
+# direction can have: audio lost on the way in, a gap on the way out
+LATE = {'input': _Flags(input_overflow=True), 'output': _Flags(output_underflow=True)}
+
+
+class ClockedStream(abc.ABC):
+    # A stream without audio hardware: a thread runs the callback every
+    # blocksize / samplerate seconds of the system clock. Same surface as a
+    # sounddevice stream as far as the engine goes; subclasses move the
+    # audio in _tick().
+    def __init__(self, kind, channels, samplerate, blocksize, callback, name):
+        self.kind = kind
+        self.channels = channels
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.name = name
+        self.buffer = np.zeros((blocksize, channels), dtype=np.float32)
+        self.time_info = types.SimpleNamespace(currentTime=0.0, inputBufferAdcTime=0.0,
+                                               outputBufferDacTime=0.0)
+        self.active = False
+        self.closed = False
+        self.late_blocks = 0
+        self.thread = None
+
+    @property
+    def latency(self):
+        return self.blocksize / self.samplerate
+
+    def start(self):
+        if self.closed:
+            raise RuntimeError("Stream is closed")
+        if self.active:
+            return
+        self.active = True
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.active = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+        self.thread = None
+
+    def close(self):
+        self.stop()
+        self.closed = True
+
+    def _run(self):
+        period = self.blocksize / self.samplerate
+        due = time.perf_counter()
+        while self.active:
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+                now = time.perf_counter()
+            status = ON_TIME
+            if now - due > period:
+                # More than a block behind: drop the backlog, don't burst
+                self.late_blocks += 1
+                status = LATE[self.kind]
+                due = now
+            try:
+                self._tick(now, status)
+            except Exception as e:
+                print(f"{self.name}: {e}")
+                self.active = False
+                return
+            due += period
+
+    @abc.abstractmethod
+    def _tick(self, now, status):
+        # One period: run the callback on self.buffer, move its audio
+        pass
+
+
+class RtpPacketizer:
+    # Cuts (frames, channels) float32 blocks into RTP packets. The iovecs
+    # of every packet - its 12-byte header and a memoryview of its slice of
+    # the block - are built once per block buffer, so sending copies no
+    # audio in Python: the kernel gathers straight from the mix buffer
+    # (float32) or from one preallocated L24 buffer (int24).
+    def __init__(self, block, fmt, packet_frames=None, ssrc=None):
+        frames, channels = block.shape
+        pt, width = FORMATS[fmt]
+        self.fmt = fmt
+        self.pt = pt
+        self.block = block
+        self.frame_bytes = channels * width
+        self.packet_frames = packet_frames or max(1, MAX_PAYLOAD // self.frame_bytes)
+        self.packets = -(-frames // self.packet_frames)
+        rng = np.random.default_rng()
+        self.ssrc = int(rng.integers(1 << 32)) if ssrc is None else ssrc
+        self.seq = int(rng.integers(1 << 16))
+        self.timestamp = int(rng.integers(1 << 32))
+        self.marker = True
+        self.headers = bytearray(RTP_HEADER.size * self.packets)
+        if fmt == 'float32':
+            if sys.byteorder != 'little':
+                self.payload = np.zeros(block.shape, dtype='<f4')
+            else:
+                self.payload = block
+            payload = memoryview(self.payload).cast('B')
+        else:
+            # Big-endian 24-bit: three byte planes of the scaled samples
+            self.scaled = np.zeros(block.shape, dtype=np.float32)
+            self.ints = np.zeros(block.shape, dtype=np.int32)
+            self.shifted = np.zeros(block.shape, dtype=np.int32)
+            self.payload = np.zeros(block.shape + (3,), dtype=np.uint8)
+            payload = memoryview(self.payload.reshape(-1))
+        headers = memoryview(self.headers)
+        self.iovecs = []
+        self.sizes = []
+        for k in range(self.packets):
+            start = k * self.packet_frames
+            n = min(self.packet_frames, frames - start)
+            self.iovecs.append(headers[k * RTP_HEADER.size:(k + 1) * RTP_HEADER.size])
+            self.iovecs.append(payload[start * self.frame_bytes:(start + n) * self.frame_bytes])
+            self.sizes.append(n)
+
+    def encode(self):
+        # Block -> payload bytes (nothing to do for little-endian float32)
+        # and fresh headers; returns the iovec list
+        block = self.block
+        if self.fmt == 'float32':
+            if self.payload is not block:
+                self.payload[:] = block
+        else:
+            np.multiply(block, 8388608.0, out=self.scaled)
+            np.clip(self.scaled, -8388608.0, 8388607.0, out=self.scaled)
+            np.rint(self.scaled, out=self.scaled)
+            np.copyto(self.ints, self.scaled, casting='unsafe')
+            for plane, shift in enumerate((16, 8, 0)):
+                np.right_shift(self.ints, shift, out=self.shifted)
+                np.copyto(self.payload[..., plane], self.shifted, casting='unsafe')
+        ts = self.timestamp
+        for k, n in enumerate(self.sizes):
+            second = self.pt | (0x80 if self.marker and k == 0 else 0)
+            RTP_HEADER.pack_into(self.headers, k * RTP_HEADER.size, 0x80, second,
+                                 self.seq, ts, self.ssrc)
+            self.seq = (self.seq + 1) & 0xFFFF
+            ts = (ts + n) & 0xFFFFFFFF
+        self.timestamp = ts
+        self.marker = False
+        return self.iovecs
+
+
+class RtpSender:
+    # One UDP socket sending a packetizer's blocks. With UDP GSO (Linux)
+    # a block's packets go out in as few sendmsg() calls as the segment
+    # limits allow, otherwise one call per packet. A full socket buffer
+    # drops packets rather than blocking the audio clock.
+    def __init__(self, host, port, packetizer):
+        self.address = (socket.gethostbyname(host), port)
+        self.packetizer = packetizer
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        if _is_multicast(host):
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self.packets_sent = 0
+        self.send_calls = 0
+        self.dropped = 0
+        self.batches = self._gso_batches(packetizer)
+
+    def _gso_batches(self, packetizer):
+        # Runs of iovecs that go out as one call; None without GSO
+        segment = RTP_HEADER.size + packetizer.packet_frames * packetizer.frame_bytes
+        if packetizer.packets < 2 or not sys.platform.startswith('linux'):
+            return None
+        try:
+            self.sock.setsockopt(socket.SOL_UDP, UDP_SEGMENT, segment)
+        except OSError:
+            return None
+        per_call = max(1, min(GSO_MAX_SEGMENTS, GSO_MAX_BYTES // segment))
+        iovecs = packetizer.iovecs
+        return [(iovecs[2 * k:2 * (k + per_call)], min(per_call, packetizer.packets - k))
+                for k in range(0, packetizer.packets, per_call)]
+
+    def send(self):
+        iovecs = self.packetizer.encode()
+        if self.batches is not None:
+            for batch, packets in self.batches:
+                self._sendmsg(batch, packets)
+        else:
+            for k in range(0, len(iovecs), 2):
+                self._sendmsg(iovecs[k:k + 2], 1)
+
+    def _sendmsg(self, iovecs, packets):
+        self.send_calls += 1
+        try:
+            self.sock.sendmsg(iovecs, (), 0, self.address)
+            self.packets_sent += packets
+        except BlockingIOError:
+            self.dropped += packets
+        except OSError as e:
+            self.dropped += packets
+            if packets > 1:
+                # Offload refused (e.g. by the route's device): per packet
+                # from the next block on
+                print(f"UDP segmentation offload unavailable ({e}), sending per packet")
+                self.batches = None
+
+    def close(self):
+        self.sock.close()
+
+
+class NetworkOutputStream(ClockedStream):
+    # Engine output -> RTP: each tick the callback fills the block and its
+    # packets are sent together
+    def __init__(self, endpoint, channels, samplerate, blocksize, callback):
+        super().__init__('output', channels, samplerate, blocksize, callback,
+                         f"rtp-out-{endpoint.port}")
+        self.endpoint = endpoint
+        self.sender = RtpSender(endpoint.host, endpoint.port,
+                                RtpPacketizer(self.buffer, endpoint.fmt))
+
+    def _tick(self, now, status):
+        info = self.time_info
+        info.currentTime = info.outputBufferDacTime = now
+        self.callback(self.buffer, self.blocksize, info, status)
+        self.sender.send()
+
+    def close(self):
+        super().close()
+        self.sender.close()
+
+    def stats(self):
+        return {'packets': self.sender.packets_sent, 'send_calls': self.sender.send_calls,
+                'dropped_packets': self.sender.dropped, 'late_blocks': self.late_blocks}
+
+
+class JitterBuffer:
+    # Receive side of one RTP stream. Packets are written by RTP timestamp
+    # into a ring (with a flag per frame), so reordering costs nothing and
+    # a lost packet reads as silence. Playout runs `delay` frames behind the
+    # newest frame received, and the delay follows the network: the RFC 3550
+    # interarrival jitter estimate J sets target = block + packet + 4 J
+    # (within min_delay..max_delay). A buffer that has grown past the target
+    # by more than a packet skips ahead; one that runs dry is re-anchored at
+    # the target, i.e. plays silence while it refills.
+    #
+    # Senders put a whole block's packets on the wire at once, so within a
+    # burst the transit steps by a packet per packet although nothing
+    # jittered. Only the first packet of each burst (one that doesn't
+    # arrive right behind another) is a transit sample, i.e. J is the
+    # jitter of the sender's blocks.
+    def __init__(self, channels, samplerate, block, capacity_seconds=1.0, min_delay=0.005,
+                 max_delay=0.25):
+        self.channels = channels
+        self.samplerate = samplerate
+        self.block = block
+        self.capacity = int(capacity_seconds * samplerate)
+        self.min_delay = int(min_delay * samplerate)
+        self.max_delay = min(int(max_delay * samplerate), self.capacity // 2)
+        self.buffer = np.zeros((self.capacity, channels), dtype=np.float32)
+        self.present = np.zeros(self.capacity, dtype=bool)
+        self.lock = threading.Lock()
+        self.reset()
+        self.lost = 0
+        self.late = 0
+        self.skips = 0
+        self.underruns = 0
+        self.resyncs = 0
+        self.packets = 0
+
+    def reset(self):
+        self.read_ts = None  # Extended timestamp of the next frame to play
+        self.newest_end = None  # ... one past the newest frame received
+        self.last_raw = None
+        self.last_ext = 0
+        self.last_transit = None
+        self.last_arrival = None
+        self.jitter = 0.0  # J, in frames
+        self.packet = 0
+        self.present[:] = False
+
+    def target(self):
+        delay = self.block + self.packet + int(4 * self.jitter)
+        return max(self.min_delay, min(self.max_delay, delay))
+
+    def _extend(self, ts):
+        # 32-bit RTP timestamp -> unbounded, by the signed step from the last
+        if self.last_raw is None:
+            ext = ts
+        else:
+            step = (ts - self.last_raw) & 0xFFFFFFFF
+            if step >= 1 << 31:
+                step -= 1 << 32
+            ext = self.last_ext + step
+        self.last_raw = ts
+        self.last_ext = ext
+        return ext
+
+    def put(self, ts, samples, arrival):
+        # samples: (frames, channels) float32; arrival in seconds
+        frames = len(samples)
+        with self.lock:
+            ts = self._extend(ts)
+            self.packets += 1
+            self.packet = frames
+            # Closer than a quarter packet behind the one before it: sent
+            # together with it (in whatever order they arrive)
+            in_burst = (self.last_arrival is not None and
+                        (arrival - self.last_arrival) * self.samplerate < frames / 4)
+            self.last_arrival = arrival
+            if not in_burst:
+                transit = arrival * self.samplerate - ts
+                if self.last_transit is not None:
+                    self.jitter += (abs(transit - self.last_transit) - self.jitter) / 16
+                self.last_transit = transit
+            if self.read_ts is not None and abs(ts - self.read_ts) > self.capacity // 2:
+                # Sender restarted or we lost touch: start over
+                self.resyncs += 1
+                self.reset()
+                self._extend(ts)
+                ts = self.last_ext
+            if self.read_ts is None:
+                self.read_ts = ts + frames - self.target()
+                self.newest_end = ts + frames
+            if ts + frames <= self.read_ts:
+                self.late += 1
+                return
+            if ts < self.read_ts:
+                samples = samples[self.read_ts - ts:]
+                ts = self.read_ts
+                frames = len(samples)
+            start = ts % self.capacity
+            first = min(frames, self.capacity - start)
+            self.buffer[start:start + first] = samples[:first]
+            self.present[start:start + first] = True
+            if first < frames:
+                self.buffer[:frames - first] = samples[first:]
+                self.present[:frames - first] = True
+            if ts + frames > self.newest_end:
+                self.newest_end = ts + frames
+
+    def get(self, out):
+        # Fills out (frames, channels) with the next block to play
+        frames = len(out)
+        with self.lock:
+            if self.read_ts is None:
+                out[:] = 0
+                return
+            target = self.target()
+            fill = self.newest_end - self.read_ts
+            if fill > target + max(self.packet, self.block):
+                self.skips += 1
+                self._clear(self.read_ts, fill - target)
+                self.read_ts = self.newest_end - target
+            elif fill < frames:
+                self.underruns += 1
+                self.read_ts = self.newest_end - target
+            start = self.read_ts % self.capacity
+            first = min(frames, self.capacity - start)
+            self._read(start, out[:first])
+            if first < frames:
+                self._read(0, out[first:])
+            self.read_ts += frames
+
+    def _read(self, start, out):
+        n = len(out)
+        present = self.present[start:start + n]
+        out[:] = self.buffer[start:start + n]
+        missing = n - int(np.count_nonzero(present))
+        if missing:
+            out[~present] = 0
+            self.lost += missing
+        present[:] = False
+
+    def _clear(self, ts, frames):
+        frames = min(frames, self.capacity)
+        start = ts % self.capacity
+        first = min(frames, self.capacity - start)
+        self.present[start:start + first] = False
+        self.present[:frames - first] = False
+
+    def stats(self):
+        fill = 0 if self.read_ts is None else self.newest_end - self.read_ts
+        rate = self.samplerate
+        return {'delay_ms': 1000 * fill / rate, 'target_ms': 1000 * self.target() / rate,
+                'jitter_ms': 1000 * self.jitter / rate, 'packets': self.packets,
+                'lost_frames': self.lost, 'late_packets': self.late, 'skips': self.skips,
+                'underruns': self.underruns, 'resyncs': self.resyncs}
+
+
+class RtpReceiver:
+    # Thread reading one UDP port into a JitterBuffer. Datagrams land in one
+    # preallocated buffer and are decoded from there (float32 in place,
+    # int24 through preallocated scratch).
+    def __init__(self, endpoint, jitter, name):
+        self.endpoint = endpoint
+        self.jitter = jitter
+        self.channels = jitter.channels
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        if _is_multicast(endpoint.host):
+            self.sock.bind(('', endpoint.port))
+            group = socket.inet_aton(socket.gethostbyname(endpoint.host))
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                 group + socket.inet_aton('0.0.0.0'))
+        else:
+            self.sock.bind((endpoint.host, endpoint.port))
+        self.sock.settimeout(0.2)
+        self.packet = bytearray(65536)
+        self.view = memoryview(self.packet)
+        max_frames = len(self.packet) // (3 * self.channels)
+        self.samples = np.zeros((max_frames, self.channels), dtype=np.float32)
+        self.ints = np.zeros((max_frames, self.channels), dtype=np.int32)
+        self.byte = np.zeros((max_frames, self.channels), dtype=np.int32)
+        self.bytes = np.frombuffer(self.packet, dtype=np.uint8)
+        self.invalid = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                size = self.sock.recv_into(self.packet)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            arrival = time.perf_counter()
+            samples = self._decode(size)
+            if samples is None:
+                self.invalid += 1
+                continue
+            self.jitter.put(self._timestamp, samples, arrival)
+
+    def _decode(self, size):
+        # Header checks, then the payload as (frames, channels) float32
+        if size < RTP_HEADER.size:
+            return None
+        first, second, _, self._timestamp, _ = RTP_HEADER.unpack_from(self.packet)
+        if first >> 6 != 2:
+            return None
+        offset = RTP_HEADER.size + 4 * (first & 0x0F)  # CSRC list
+        if first & 0x10:  # Header extension
+            if size < offset + 4:
+                return None
+            offset += 4 + 4 * struct.unpack_from('!H', self.packet, offset + 2)[0]
+        if first & 0x20:  # Padding
+            size -= self.packet[size - 1]
+        fmt = PAYLOAD_TYPES.get(second & 0x7F)
+        if fmt is None or size <= offset:
+            return None
+        width = FORMATS[fmt][1]
+        frames = (size - offset) // (width * self.channels)
+        if frames == 0:
+            return None
+        if fmt == 'float32':
+            data = np.frombuffer(self.packet, dtype='<f4', count=frames * self.channels,
+                                 offset=offset)
+            return data.reshape(frames, self.channels)
+        raw = self.bytes[offset:offset + frames * self.channels * 3].reshape(
+            frames, self.channels, 3)
+        ints = self.ints[:frames]
+        # Sign-extend: put the 24 bits at the top of an int32, shift back
+        byte = self.byte[:frames]
+        np.left_shift(raw[..., 0], 24, out=ints, dtype=np.int32)
+        for plane, shift in ((1, 16), (2, 8)):
+            np.left_shift(raw[..., plane], shift, out=byte, dtype=np.int32)
+            np.bitwise_or(ints, byte, out=ints)
+        np.right_shift(ints, 8, out=ints)
+        samples = self.samples[:frames]
+        np.multiply(ints, 1 / 8388608.0, out=samples, casting='unsafe')
+        return samples
+
+    def close(self):
+        self.running = False
+        self.sock.close()
+        self.thread.join(timeout=1.0)
+
+
+class NetworkInputStream(ClockedStream):
+    # RTP -> engine input: the receiver thread fills the jitter buffer, the
+    # clock thread plays a block out of it each period
+    def __init__(self, endpoint, channels, samplerate, blocksize, callback):
+        name = f"rtp-in-{endpoint.port}"
+        super().__init__('input', channels, samplerate, blocksize, callback, name)
+        self.endpoint = endpoint
+        self.jitter = JitterBuffer(channels, samplerate, blocksize)
+        self.receiver = RtpReceiver(endpoint, self.jitter, name + "-recv")
+
+    @property
+    def latency(self):
+        # Follows the jitter buffer
+        return (self.blocksize + self.jitter.target()) / self.samplerate
+
+    def _tick(self, now, status):
+        self.jitter.get(self.buffer)
+        info = self.time_info
+        info.currentTime = now
+        info.inputBufferAdcTime = now - self.latency
+        self.callback(self.buffer, self.blocksize, info, status)
+
+    def close(self):
+        super().close()
+        self.receiver.close()
+
+    def stats(self):
+        stats = self.jitter.stats()
+        stats['invalid_packets'] = self.receiver.invalid
+        stats['late_blocks'] = self.late_blocks
+        return stats
+
+
+class NetworkBackend:
+    # Another backend's devices plus network endpoints, which are listed
+    # after them (hostapi "RTP") and open as NetworkInput/OutputStreams, so
+    # the engine and the GUI route them like any device. Without a base
+    # backend only the endpoints exist.
+    def __init__(self, base=None, endpoints=()):
+        self.base = base
+        self.endpoints = list(endpoints)
+        self.name = f"{base.name}+rtp" if base is not None else "rtp"
+        self.streams = []
+
+    def _base_devices(self):
+        return list(self.base.query_devices()) if self.base is not None else []
+
+    def query_devices(self):
+        devices = self._base_devices()
+        first = len(devices)
+        for k, ep in enumerate(self.endpoints):
+            devices.append({
+                'name': ep.name,
+                'index': first + k,
+                'hostapi': -1,
+                'hostapi_name': "RTP",
+                'max_input_channels': ep.channels if ep.kind == 'input' else 0,
+                'max_output_channels': ep.channels if ep.kind == 'output' else 0,
+                'default_samplerate': float(ep.samplerate),
+            })
+        return devices
+
+    def refresh_devices(self):
+        if self.base is not None:
+            self.base.refresh_devices()
+        return self.query_devices()
+
+    def hostapi_name(self, device):
+        return device['hostapi_name']
+
+    def now(self):
+        return self.base.now() if self.base is not None else time.perf_counter()
+
+    def _endpoint(self, device, kind):
+        # The endpoint behind a device index, None for a base device
+        if device is None:
+            return None
+        k = device - len(self._base_devices())
+        if not 0 <= k < len(self.endpoints):
+            return None
+        ep = self.endpoints[k]
+        if ep.kind != kind:
+            raise ValueError(f"{ep.name} is not an {kind}")
+        return ep
+
+    def _open(self, cls, ep, channels, samplerate, blocksize, callback):
+        if samplerate != ep.samplerate:
+            raise ValueError(f"{ep.name} runs at {ep.samplerate} Hz, not {samplerate}")
+        if channels > ep.channels:
+            raise ValueError(f"{ep.name} has {ep.channels} channels, not {channels}")
+        stream = cls(ep, channels, samplerate, blocksize, callback)
+        self.streams = [s for s in self.streams if not s.closed]
+        self.streams.append(stream)
+        return stream
+
+    def open_input(self, device, channels, samplerate, blocksize, callback, latency=None):
+        ep = self._endpoint(device, 'input')
+        if ep is None:
+            return self.base.open_input(device, channels, samplerate, blocksize, callback,
+                                        latency)
+        return self._open(NetworkInputStream, ep, channels, samplerate, blocksize, callback)
+
+    def open_output(self, device, channels, samplerate, blocksize, callback, latency=None):
+        ep = self._endpoint(device, 'output')
+        if ep is None:
+            return self.base.open_output(device, channels, samplerate, blocksize, callback,
+                                         latency)
+        return self._open(NetworkOutputStream, ep, channels, samplerate, blocksize, callback)
+
+    def stats(self):
+        # Per open network stream: packets, losses, jitter buffer state
+        return {s.endpoint.name: s.stats() for s in self.streams if not s.closed}
@@ -0,0 +1,91 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def param_dtype(num_outputs):
+    # One row per input: fader, tone knobs, compressor (threshold and
+    # makeup in dB, attack and release in ms; ratio 1 is off) and the
+    # A-buttons
+    return np.dtype([('level', 'f4'), ('bass', 'f4'), ('treble', 'f4'), ('eq', 'f4'),
+                     ('comp_threshold', 'f4'), ('comp_ratio', 'f4'), ('comp_attack', 'f4'),
+                     ('comp_release', 'f4'), ('comp_makeup', 'f4'),
+                     ('routes', '?', (num_outputs,))])
+
+
+def routing_gains(inputs):
+    # inputs x outputs gains: the slider curve where routed. An input's
+    # gain doesn't depend on what else is routed to the bus; the output
+    # limiters keep the sum from clipping.
+    gains = np.power(inputs['level'], 4)[:, None] * inputs['routes']
+    return gains.astype(np.float32)
+
+
+class MixParams:
+    # One published snapshot of every control, plus what the mixer needs
+    # from it, worked out on the writer's side. Never changed once
+    # published, so a block can use it without a lock.
+    def __init__(self, inputs, version):
+        inputs.setflags(write=False)
+        self.inputs = inputs
+        self.version = version
+        gains = routing_gains(inputs)
+        # (outputs, inputs), the layout the routing matmul takes
+        self.gains_t = np.ascontiguousarray(gains.T)
+        self.gains_t.setflags(write=False)
+        self.routed = tuple(bool(r) for r in gains.any(axis=1))
+        self.tones = tuple((float(row['bass']), float(row['treble']), float(row['eq']))
+                           for row in inputs)
+
+
+class ParamStore:
+    # All mixer controls in one struct array (param_dtype). Writers edit a
+    # copy and publish it as a new MixParams with a single reference
+    # assignment; the engine reads `current` once per block. A block never
+    # sees half an update, and the audio side never reads widgets.
+    def __init__(self, num_inputs, num_outputs):
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+        inputs = np.zeros(num_inputs, dtype=param_dtype(num_outputs))
+        inputs['level'] = 0.5
+        inputs['comp_threshold'] = -20.0
+        inputs['comp_ratio'] = 1.0
+        inputs['comp_attack'] = 10.0
+        inputs['comp_release'] = 150.0
+        self.lock = threading.Lock()  # Between writers only
+        self.current = MixParams(inputs, 0)
+
+    @contextmanager
+    def edit(self):
+        # Changes made in the block are published together:
+        #   with store.edit() as p:
+        #       p['level'][0] = 0.8
+        #       p['routes'][0, 2] = True
+        with self.lock:
+            draft = self.current.inputs.copy()
+            yield draft
+            self.current = MixParams(draft, self.current.version + 1)
+
+    def set_level(self, idx, level):
+        with self.edit() as p:
+            p['level'][idx] = level
+
+    def set_tone(self, idx, bass=None, treble=None, eq=None):
+        with self.edit() as p:
+            for name, value in (('bass', bass), ('treble', treble), ('eq', eq)):
+                if value is not None:
+                    p[name][idx] = value
+
+    def set_compressor(self, idx, threshold=None, ratio=None, attack=None, release=None,
+                       makeup=None):
+        with self.edit() as p:
+            for name, value in (('comp_threshold', threshold), ('comp_ratio', ratio),
+                                ('comp_attack', attack), ('comp_release', release),
+                                ('comp_makeup', makeup)):
+                if value is not None:
+                    p[name][idx] = value
+
+    def set_route(self, in_idx, out_idx, enabled):
+        with self.edit() as p:
+            p['routes'][in_idx, out_idx] = bool(enabled)
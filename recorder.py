@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from ringbuffer import RingBuffer
+from wavio import WavWriter
+
+
+class FlacWriter:
+    # Same interface as wavio.WavWriter, through libsndfile (soundfile is
+    # only needed for FLAC). 24-bit; flush() keeps a cut-off file decodable
+    # up to the last update.
+    def __init__(self, path, samplerate, channels):
+        import soundfile
+        self.path = path
+        self.frames = 0
+        self.f = soundfile.SoundFile(path, 'w', samplerate, channels, subtype='PCM_24',
+                                     format='FLAC')
+
+    def write(self, data):
+        self.f.write(data)
+        self.frames += len(data)
+
+    def update_header(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+WRITERS = {'wav': WavWriter, 'flac': FlacWriter}
+
+
+class Tap:
+    # One recorded bus. push() runs in the audio thread: it copies the
+    # block into a preallocated ring and never waits. A block that doesn't
+    # fit is dropped and counted; where it was is remembered, and the
+    # writer fills the hole with silence so every file of a session stays
+    # sample-aligned.
+    MAX_GAPS = 256
+
+    def __init__(self, name, path, samplerate, channels, fmt='wav', buffer_seconds=10.0):
+        self.name = name
+        self.path = path
+        self.writer = WRITERS[fmt](path, samplerate, channels)
+        self.ring = RingBuffer(int(buffer_seconds * samplerate), channels)
+        # Dropped blocks: ring position and length, another SPSC queue
+        self.gap_pos = np.zeros(self.MAX_GAPS, dtype=np.int64)
+        self.gap_frames = np.zeros(self.MAX_GAPS, dtype=np.int64)
+        self.gaps_written = 0
+        self.gaps_read = 0
+        self.overflows = 0
+        self.dropped_frames = 0
+        self.peak_fill = 0
+
+    def push(self, block):
+        ring = self.ring
+        frames = len(block)
+        fill = ring.write_pos - ring.read_pos
+        if fill + frames > ring.capacity:
+            self.overflows += 1
+            self.dropped_frames += frames
+            k = self.gaps_written
+            if k - self.gaps_read < self.MAX_GAPS:
+                self.gap_pos[k % self.MAX_GAPS] = ring.write_pos
+                self.gap_frames[k % self.MAX_GAPS] = frames
+                self.gaps_written = k + 1
+            return
+        ring.write(block)
+        if fill + frames > self.peak_fill:
+            self.peak_fill = fill + frames
+
+    def stats(self):
+        return {'frames': self.writer.frames, 'queued': self.ring.fill(),
+                'peak_queued': self.peak_fill, 'overflows': self.overflows,
+                'dropped_frames': self.dropped_frames}
+
+
+class Recorder:
+    # A session of taps and the one thread that writes them all. Every
+    # batch_interval seconds the writer moves whatever is queued to disk in
+    # large writes (the ring's contiguous spans, not per block); every
+    # header_interval seconds it rewrites the headers and syncs, which is
+    # how much a crash can lose.
+    def __init__(self, batch_interval=0.5, header_interval=2.0):
+        self.taps = []
+        self.batch_interval = batch_interval
+        self.header_interval = header_interval
+        self.silence = None
+        self.started = None
+        self.closing = False
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+
+    def add(self, name, path, samplerate, channels, fmt='wav', buffer_seconds=10.0):
+        # Before start() only
+        tap = Tap(name, path, samplerate, channels, fmt, buffer_seconds)
+        self.taps.append(tap)
+        return tap
+
+    def start(self):
+        self.started = time.time()
+        self.thread.start()
+        return self
+
+    def _run(self):
+        last_header = time.monotonic()
+        while not self.closing:
+            self.wake.wait(self.batch_interval)
+            for tap in self.taps:
+                self._drain(tap)
+            if time.monotonic() - last_header >= self.header_interval:
+                for tap in self.taps:
+                    tap.writer.update_header()
+                last_header = time.monotonic()
+        for tap in self.taps:
+            self._drain(tap)
+            tap.writer.close()
+
+    def _drain(self, tap):
+        ring = tap.ring
+        while True:
+            limit = None
+            if tap.gaps_read < tap.gaps_written:
+                k = tap.gaps_read % Tap.MAX_GAPS
+                limit = tap.gap_pos[k] - ring.read_pos
+                if limit == 0:
+                    self._write_silence(tap, int(tap.gap_frames[k]))
+                    tap.gaps_read += 1
+                    continue
+            view = ring.read_view(limit)
+            if len(view) == 0:
+                return
+            tap.writer.write(view)
+            ring.advance(len(view))
+
+    def _write_silence(self, tap, frames):
+        if self.silence is None or self.silence.shape[1] != tap.ring.channels:
+            self.silence = np.zeros((65536, tap.ring.channels), dtype=np.float32)
+        while frames > 0:
+            n = min(frames, len(self.silence))
+            tap.writer.write(self.silence[:n])
+            frames -= n
+
+    def close(self):
+        # Writes out what is queued and finalizes the files
+        self.closing = True
+        if self.started is None:
+            for tap in self.taps:
+                tap.writer.close()
+            return
+        self.wake.set()
+        self.thread.join()
+
+    def stats(self):
+        return {tap.name: tap.stats() for tap in self.taps}
+
+
+def session_directory(root):
+    # A fresh, timestamped directory for one recording session
+    path = os.path.join(root, time.strftime("rec-%Y%m%d-%H%M%S"))
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_backend import SyntheticBackend
+from mixer_engine import MixerEngine
+from resampler import StreamingResampler
+from wavio import create_wav, open_wav, read_wav_info, to_float32
+
+# Offline render: runs recorded input files through the same tone stack and
+# routing matrix as the live mixer and writes one WAV per output bus.
+#
+# Preset (JSON):
+# {
+#   "samplerate": 48000,          # optional, default: first input's rate
+#   "channels": 2,                # optional
+#   "outputs": 6,                 # bus count (files A1.wav..A6.wav) or a list of file names
+#   "output_irs": {"A1": "room.wav"},   # optional, convolution per bus
+#   "limiter": -1.0,              # optional, ceiling in dBTP on every bus, null: off
+#   "inputs": [
+#     {"file": "vox.wav", "level": 0.5, "bass": 0, "treble": 2, "eq": 0,
+#      "routes": ["A1", "A3"], "ir": "plate.wav",
+#      "compressor": {"threshold": -24, "ratio": 3, "attack": 10, "release": 150,
+#                     "makeup": 4}}
+#   ]
+# }
+# level is the fader position (0..1), bass/treble/eq the knob values
+# (-10..10), routes the A-buttons that are on, ir an optional impulse
+# response WAV convolved after the tone stack, compressor optional settings
+# (dB, ms; missing keys keep the mixer's defaults). Relative paths are
+# resolved against the preset's directory. The limiter's look-ahead delay
+# is taken out, so the buses line up with the inputs.
+
+
+def load_preset(path):
+    with open(path) as f:
+        preset = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for inp in preset['inputs']:
+        inp['file'] = os.path.join(base, inp['file'])
+        if inp.get('ir'):
+            inp['ir'] = os.path.join(base, inp['ir'])
+    preset['output_irs'] = {bus: os.path.join(base, path)
+                            for bus, path in preset.get('output_irs', {}).items()}
+    return preset
+
+
+def output_names(preset):
+    outputs = preset.get('outputs', 6)
+    if isinstance(outputs, int):
+        return [f"A{i+1}.wav" for i in range(outputs)]
+    return list(outputs)
+
+
+def route_indices(routes):
+    # "A3" or 3 -> 2
+    indices = []
+    for r in routes:
+        if isinstance(r, str):
+            r = int(r.upper().lstrip('A'))
+        indices.append(r - 1)
+    return indices
+
+
+def bus_groups(preset):
+    # Split the routing graph into connected input/output groups; each one
+    # can be rendered on its own without changing any bus
+    num_outputs = len(output_names(preset))
+    out_owner = list(range(num_outputs))
+
+    def find(o):
+        while out_owner[o] != o:
+            out_owner[o] = out_owner[out_owner[o]]
+            o = out_owner[o]
+        return o
+
+    routes = [route_indices(inp.get('routes', [])) for inp in preset['inputs']]
+    for outs in routes:
+        for o in outs[1:]:
+            out_owner[find(o)] = find(outs[0])
+    groups = {}
+    for o in range(num_outputs):
+        groups.setdefault(find(o), ([], []))[1].append(o)
+    for i, outs in enumerate(routes):
+        if outs:
+            groups[find(outs[0])][0].append(i)
+    return list(groups.values())
+
+
+class FileSource:
+    # Chunked reader over a memory-mapped WAV, resampled to the render rate
+    # if needed and mapped onto the engine's channel count
+    def __init__(self, path, samplerate, channels, chunk):
+        self.info, self.raw = open_wav(path)
+        self.channels = channels
+        self.position = 0
+        self.resampler = None
+        max_in = chunk
+        if self.info.samplerate != samplerate:
+            ratio = self.info.samplerate / samplerate
+            self.resampler = StreamingResampler(self.info.channels, ratio, max_frames=chunk)
+            max_in = self.resampler.frames_needed(chunk) + 1
+        self.scratch = np.zeros((max_in, self.info.channels), dtype=np.float32)
+        self.converted = np.zeros((chunk, self.info.channels), dtype=np.float32)
+
+    def _read_raw(self, out):
+        start = min(self.position, self.info.frames)
+        end = min(self.position + len(out), self.info.frames)
+        to_float32(self.raw[start:end], self.info.bits, out[:end - start])
+        out[end - start:] = 0
+        self.position += len(out)
+
+    def read(self, block):
+        frames = len(block)
+        if self.resampler is None:
+            data = self.scratch[:frames]
+            self._read_raw(data)
+        else:
+            needed = self.resampler.frames_needed(frames)
+            if needed > len(self.scratch):
+                self.scratch = np.zeros((needed, self.info.channels), dtype=np.float32)
+            self._read_raw(self.scratch[:needed])
+            data = self.converted[:frames]
+            self.resampler.process(self.scratch[:needed], data)
+        if data.shape[1] == 1:
+            block[:] = data
+        else:
+            n = min(data.shape[1], self.channels)
+            block[:, :n] = data[:, :n]
+            block[:, n:] = 0
+
+
+def render_group(inputs, out_paths, routes, samplerate, channels, chunk, total, out_irs=None,
+                 limiter=-1.0):
+    # inputs: preset input dicts; routes: per input, indices into out_paths;
+    # total: session length in frames, the same for every bus; out_irs:
+    # impulse response path (or None) per entry of out_paths; limiter: bus
+    # ceiling in dBTP or None.
+    # No devices are opened, the backend only satisfies the engine.
+    engine = MixerEngine(SyntheticBackend(), num_inputs=max(1, len(inputs)),
+                         num_outputs=len(out_paths), channels=channels,
+                         samplerate=samplerate, blocksize=chunk,
+                         limiter=limiter is not None,
+                         limiter_ceiling=limiter if limiter is not None else -1.0)
+    sources = []
+    for i, inp in enumerate(inputs):
+        engine.set_level(i, inp.get('level', 0.5))
+        engine.set_tone(i, bass=inp.get('bass', 0), treble=inp.get('treble', 0),
+                        eq=inp.get('eq', 0))
+        for o in routes[i]:
+            engine.set_route(i, o, True)
+        if inp.get('ir'):
+            engine.set_input_ir(i, inp['ir'])
+        if inp.get('compressor'):
+            engine.set_compressor(i, **inp['compressor'])
+        sources.append(FileSource(inp['file'], samplerate, channels, chunk))
+    for o, ir in enumerate(out_irs or []):
+        if ir:
+            engine.set_output_ir(o, ir)
+    outs = [create_wav(path, samplerate, channels, total) for path in out_paths]
+    # The limiters delay every bus by the same look-ahead: run that much
+    # past the end (the sources read silence) and drop it from the front
+    delay = engine.limiter.delay if engine.limiter is not None else 0
+    for start in range(0, total + delay, chunk):
+        for i, src in enumerate(sources):
+            src.read(engine.input_blocks[i])
+        engine.process_block()
+        skip = max(0, delay - start)
+        begin = start + skip - delay
+        frames = min(chunk - skip, total - begin)
+        if frames <= 0:
+            continue
+        for o, out in enumerate(outs):
+            out[begin:begin + frames] = engine.mixed_buffers[o, skip:skip + frames]
+    for out in outs:
+        if isinstance(out, np.memmap):
+            out.flush()
+    return out_paths, total
+
+
+def render_jobs(preset, output_dir, chunk):
+    names = output_names(preset)
+    channels = preset.get('channels', 2)
+    infos = [read_wav_info(inp['file']) for inp in preset['inputs']]
+    samplerate = preset.get('samplerate') or (infos[0].samplerate if infos else 48000)
+    total = max([int(np.ceil(info.frames * samplerate / info.samplerate)) for info in infos],
+                default=0)
+    # Bus names as in routes ("A1" or 1) -> output index
+    output_irs = {route_indices([bus])[0]: path
+                  for bus, path in preset.get('output_irs', {}).items()}
+    jobs = []
+    for in_idx, out_idx in bus_groups(preset):
+        local = {o: k for k, o in enumerate(out_idx)}
+        inputs = [preset['inputs'][i] for i in in_idx]
+        routes = [[local[o] for o in route_indices(inp.get('routes', []))] for inp in inputs]
+        out_paths = [os.path.join(output_dir, names[o]) for o in out_idx]
+        out_irs = [output_irs.get(o) for o in out_idx]
+        jobs.append((inputs, out_paths, routes, samplerate, channels, chunk, total, out_irs,
+                     preset.get('limiter', -1.0)))
+    return jobs
+
+
+def render(presets, output_dir='.', chunk=65536, jobs=None):
+    # Render one or more presets. Every independent bus group of every
+    # preset is a separate job; with jobs > 1 they run on a process pool.
+    if isinstance(presets, (dict, str)):
+        presets = [presets]
+    os.makedirs(output_dir, exist_ok=True)
+    work = []
+    for k, preset in enumerate(presets):
+        if isinstance(preset, str):
+            preset = load_preset(preset)
+        target = output_dir if len(presets) == 1 else os.path.join(output_dir, str(k))
+        os.makedirs(target, exist_ok=True)
+        work.extend(render_jobs(preset, target, chunk))
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(work) <= 1:
+        return [render_group(*job) for job in work]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(work))) as pool:
+        return list(pool.map(render_group, *zip(*work)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render input files through the mixer offline")
+    parser.add_argument('presets', nargs='+', help="preset JSON file(s)")
+    parser.add_argument('-o', '--output-dir', default='.')
+    parser.add_argument('--chunk', type=int, default=65536, help="frames per processing chunk")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="worker processes")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = render(args.presets, args.output_dir, args.chunk, args.jobs)
+    elapsed = time.perf_counter() - start
+    audio_seconds = 0.0
+    for paths, frames in results:
+        for path in paths:
+            print(path)
+        if frames:
+            audio_seconds = max(audio_seconds, frames / read_wav_info(paths[0]).samplerate)
+    if elapsed > 0 and audio_seconds:
+        print(f"Rendered {audio_seconds:.1f} s of audio in {elapsed:.2f} s "
+              f"({audio_seconds / elapsed:.1f}x real time)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
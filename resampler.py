@@ -0,0 +1,176 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=32)
+def sinc_table(taps, phases, cutoff, beta=8.0):
+    # Kaiser-windowed sinc, one row per fractional delay p / phases
+    # (p = 0..phases inclusive), one column per tap. Rows are normalized
+    # to unity DC gain.
+    half = taps // 2
+    k = np.arange(taps) - (half - 1)
+    frac = np.arange(phases + 1) / phases
+    x = k[None, :] - frac[:, None]
+    window = np.i0(beta * np.sqrt(np.clip(1 - (x / half) ** 2, 0, None))) / np.i0(beta)
+    table = cutoff * np.sinc(cutoff * x) * window
+    table /= table.sum(axis=1, keepdims=True)
+    table = table.astype(np.float32)
+    table.setflags(write=False)
+    return table
+
+
+class StreamingResampler:
+    # Windowed-sinc polyphase resampler for a continuous stream. ratio is
+    # input frames consumed per output frame and may be changed between
+    # calls (drift correction) without restarting the stream. Phases are
+    # picked to the nearest of `phases` fractional delays; 4096 keeps the
+    # error ~75 dB down up to 18 kHz.
+    def __init__(self, channels, ratio, taps=32, phases=4096, max_frames=4096):
+        self.channels = channels
+        self.nominal_ratio = ratio
+        self.ratio = ratio
+        self.taps = taps
+        self.phases = phases
+        self.half = taps // 2
+        # Anti-aliasing: when decimating, cut off at the output Nyquist
+        cutoff = round(min(1.0, 1.0 / ratio) * 0.95, 3)
+        self.table = sinc_table(taps, phases, cutoff)
+        # One row of phase coefficients per tap, for the per-tap gather
+        self.table_t = np.ascontiguousarray(self.table.T)
+        self.offsets = list(range(-(self.half - 1), taps - (self.half - 1)))
+        self._allocate(max_frames)
+        self.reset()
+
+    def _allocate(self, max_frames):
+        self.max_frames = max_frames
+        capacity = 2 * self.taps + int(np.ceil(max_frames * self.ratio * 1.01)) + 4
+        self.buffer = np.zeros((capacity, self.channels), dtype=np.float32)
+        # Per-block scratch for _render, so rendering allocates nothing
+        self._steps = np.arange(max_frames, dtype=np.float64)
+        self._t = np.zeros(max_frames, dtype=np.float64)
+        self._frac = np.zeros(max_frames, dtype=np.float64)
+        self._floor = np.zeros(max_frames, dtype=np.float64)
+        self._base = np.zeros(max_frames, dtype=np.intp)
+        self._phase = np.zeros((max_frames, self.channels), dtype=np.intp)
+        self._idx = np.zeros(max_frames, dtype=np.intp)
+        self._coef = np.zeros((max_frames, self.channels), dtype=np.float32)
+        self._acc = np.zeros((max_frames, self.channels), dtype=np.float32)
+
+    def reset(self):
+        self.buffer[:] = 0
+        # half - 1 frames of silent history before the first real frame
+        self.length = self.half - 1
+        self.position = float(self.half - 1)
+        self.ratio = self.nominal_ratio
+
+    def prime(self, history):
+        # Replace the silent history with the frames that played just
+        # before, so taking over from a straight copy continues the signal
+        # instead of filtering in from silence
+        count = min(len(history), self.half - 1)
+        if count:
+            self.buffer[self.length - count:self.length] = history[len(history) - count:]
+
+    def set_correction(self, correction):
+        self.ratio = self.nominal_ratio * (1.0 + correction)
+
+    def frames_needed(self, frames):
+        last = self.position + (frames - 1) * self.ratio
+        return max(0, int(last) + self.half + 1 - self.length)
+
+    def pull(self, ring, out):
+        # Take exactly the input frames needed for len(out) output frames
+        # from ring (silence-padded on underrun) and render them into out
+        frames = len(out)
+        if frames > self.max_frames:
+            self._grow(frames)
+        needed = self.frames_needed(frames)
+        ring.read(self.buffer[self.length:self.length + needed])
+        self.length += needed
+        self._render(out)
+
+    def process(self, data, out):
+        # Push variant: append data, render len(out) frames. Callers size
+        # data with frames_needed(len(out)).
+        frames = len(out)
+        if frames > self.max_frames:
+            self._grow(frames)
+        self.buffer[self.length:self.length + len(data)] = data
+        self.length += len(data)
+        self._render(out)
+
+    def _grow(self, frames):
+        old = self.buffer[:self.length].copy()
+        self._allocate(frames)
+        self.buffer[:len(old)] = old
+
+    def _render(self, out):
+        frames = len(out)
+        t = self._t[:frames]
+        np.multiply(self._steps[:frames], self.ratio, out=t)
+        t += self.position
+        # Mixed int/float operands or a broadcast operand make ufuncs
+        # buffer, i.e. allocate; every step below has matching shapes and
+        # dtypes
+        floor = self._floor[:frames]
+        np.floor(t, out=floor)
+        base = self._base[:frames]
+        np.copyto(base, floor, casting='unsafe')
+        frac = self._frac[:frames]
+        np.subtract(t, floor, out=frac)
+        frac *= self.phases
+        np.rint(frac, out=frac)
+        # Phase index repeated per channel, so the coefficient gather
+        # comes out in the sample layout
+        phase = self._phase[:frames]
+        phase[:] = frac[:, None]
+        # Sum over taps of coefficient(phase) * buffer[base + offset], one
+        # tap at a time through gathers into preallocated scratch. Indices
+        # are always in range; mode='clip' keeps take() from buffering out.
+        idx = self._idx[:frames]
+        coef = self._coef[:frames]
+        acc = self._acc[:frames]
+        for j, offset in enumerate(self.offsets):
+            np.add(base, offset, out=idx)
+            np.take(self.table_t[j], phase, out=coef, mode='clip')
+            if j == 0:
+                np.take(self.buffer, idx, axis=0, out=out, mode='clip')
+                out *= coef
+            else:
+                np.take(self.buffer, idx, axis=0, out=acc, mode='clip')
+                acc *= coef
+                out += acc
+        # Drop input that no future output frame can reach
+        t_next = self.position + frames * self.ratio
+        drop = min(int(t_next) - (self.half - 1), self.length)
+        keep = self.length - drop
+        self.buffer[:keep] = self.buffer[drop:self.length]
+        self.length = keep
+        self.position = t_next - drop
+
+
+class DriftController:
+    # PI loop that trims a resampler ratio so a ring buffer hovers at its
+    # target fill. Above target the consumer is too slow, so it returns a
+    # positive correction (consume more input per output frame).
+    def __init__(self, target, scale, kp=0.005, ki=6.25e-6, limit=0.002, smoothing=0.05):
+        self.target = target
+        self.scale = scale  # frames per unit of error, usually one block
+        self.kp = kp
+        self.ki = ki
+        self.limit = limit
+        self.smoothing = smoothing
+        self.reset()
+
+    def reset(self):
+        self.error = 0.0
+        self.integral = 0.0
+        self.correction = 0.0
+
+    def update(self, fill):
+        err = (fill - self.target) / self.scale
+        self.error += self.smoothing * (err - self.error)
+        self.integral = min(self.limit, max(-self.limit, self.integral + self.ki * self.error))
+        self.correction = min(self.limit, max(-self.limit, self.kp * self.error + self.integral))
+        return self.correction
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+class RingBuffer:
+    # Single-producer / single-consumer frame ring. The producer only moves
+    # write_pos and the consumer only moves read_pos, and each position is
+    # published after the copy, so the audio callback and the mixer never
+    # need a lock. Positions count frames since reset and never wrap.
+    def __init__(self, capacity, channels, prefill=0):
+        self.capacity = capacity
+        self.channels = channels
+        # Frames that must be queued before reads start (and restart after
+        # an underrun): the jitter margin, and the steady-state latency
+        self.prefill = min(prefill, capacity)
+        self.buffer = np.zeros((capacity, channels), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.write_pos = 0
+        self.read_pos = 0
+        self.primed = self.prefill == 0
+        self.overruns = 0
+        self.underruns = 0
+        self.dropped_frames = 0
+        self.missing_frames = 0
+
+    def fill(self):
+        return self.write_pos - self.read_pos
+
+    def fill_level(self):
+        return self.fill() / self.capacity
+
+    def write(self, data):
+        # Producer side. Frames that don't fit are dropped, never blocked on.
+        frames = len(data)
+        free = self.capacity - (self.write_pos - self.read_pos)
+        if frames > free:
+            self.overruns += 1
+            self.dropped_frames += frames - free
+            frames = free
+        start = self.write_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        if frames > first:
+            self.buffer[:frames - first] = data[first:frames]
+        self.write_pos += frames
+        return frames
+
+    def read(self, out):
+        # Consumer side. Fills out completely, padding with silence when the
+        # ring runs dry; returns the number of real frames copied.
+        frames = len(out)
+        available = self.write_pos - self.read_pos
+        if not self.primed:
+            if available < max(self.prefill, frames):
+                out[:] = 0
+                return 0
+            self.primed = True
+        if available < frames:
+            self.underruns += 1
+            self.missing_frames += frames - available
+            self.primed = self.prefill == 0
+        count = min(frames, available)
+        start = self.read_pos % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        if count > first:
+            out[first:count] = self.buffer[:count - first]
+        if count < frames:
+            out[count:] = 0
+        self.read_pos += count
+        return count
+
+    def read_view(self, max_frames=None):
+        # Consumer side, without copying: the queued frames up to the end of
+        # the buffer (call again after a wrap). advance() releases them.
+        start = self.read_pos % self.capacity
+        count = min(self.write_pos - self.read_pos, self.capacity - start)
+        if max_frames is not None:
+            count = min(count, max_frames)
+        return self.buffer[start:start + count]
+
+    def advance(self, frames):
+        self.read_pos += frames
@@ -0,0 +1,276 @@
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Bucket upper bounds. Everything above the last bound lands in +Inf.
+DURATION_BUCKETS = (1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3,
+                    1e-2, 2e-2, 5e-2, 0.1, 0.2, 0.5, 1.0)
+LOAD_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.5, 2.0)
+XRUN_FLAGS = ('input_underflow', 'input_overflow', 'output_underflow', 'output_overflow')
+
+
+class Histogram:
+    # Fixed buckets, preallocated; observe() only bumps counters. Counts
+    # live in an int64 array: Python ints past 256 are new objects.
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = np.zeros(len(self.bounds) + 1, dtype=np.int64)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-quantile (inf if above all)
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds + (float('inf'),), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(self.bounds + (float('inf'),), self.counts):
+            total += n
+            yield bound, total
+
+    def reset(self):
+        self.counts[:] = 0
+        self.sum = 0.0
+        self.count = 0
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.sum += other.sum
+        self.count += other.count
+
+
+class StreamStats:
+    # Per-stream callback instrumentation, updated from the audio thread
+    def __init__(self, name, kind, samplerate):
+        self.name = name
+        self.kind = kind
+        self.samplerate = samplerate
+        self.callbacks = 0
+        self.xruns = dict.fromkeys(XRUN_FLAGS, 0)
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.gap = Histogram(DURATION_BUCKETS)
+        self.load = Histogram(LOAD_BUCKETS)
+        self.max_load = 0.0
+        self.last_start = None
+        # Stats of the stream this one replaced (a device swap), folded in
+        # by this stream's own callback so the counters carry on and only
+        # one thread ever writes them
+        self.carry = None
+        # Device-side buffering from the callback's time info, seconds: ADC
+        # to callback for inputs, callback to DAC for outputs. 0 until a
+        # host API reports it.
+        self.device_latency = 0.0
+
+    def record(self, start, end, frames, status, time_info=None):
+        if self.carry is not None:
+            self._fold(self.carry)
+        self.callbacks += 1
+        if time_info is not None:
+            if self.kind == 'input':
+                latency = time_info.currentTime - time_info.inputBufferAdcTime
+            else:
+                latency = time_info.outputBufferDacTime - time_info.currentTime
+            if latency > 0:
+                self.device_latency = latency
+        if status:
+            for flag in XRUN_FLAGS:
+                if getattr(status, flag, False):
+                    self.xruns[flag] += 1
+        if self.last_start is not None:
+            self.gap.observe(start - self.last_start)
+        self.last_start = start
+        duration = end - start
+        self.duration.observe(duration)
+        if frames:
+            load = duration * self.samplerate / frames
+            self.load.observe(load)
+            if load > self.max_load:
+                self.max_load = load
+
+    def total_xruns(self):
+        return sum(self.xruns.values())
+
+    def _fold(self, old):
+        self.carry = None
+        self.callbacks += old.callbacks
+        for flag, n in old.xruns.items():
+            self.xruns[flag] += n
+        self.duration.merge(old.duration)
+        self.gap.merge(old.gap)
+        self.load.merge(old.load)
+        self.max_load = max(self.max_load, old.max_load)
+
+
+def instrument(stats, callback, clock=time.perf_counter):
+    def instrumented(data, frames, time_info, status):
+        start = clock()
+        callback(data, frames, time_info, status)
+        stats.record(start, clock(), frames, status, time_info)
+    return instrumented
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+def _histogram_lines(name, hist, labels):
+    lines = []
+    for bound, total in hist.cumulative():
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append(f"{name}_bucket{_labels(**labels, le=le)} {total}")
+    lines.append(f"{name}_sum{_labels(**labels)} {hist.sum!r}")
+    lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+    return lines
+
+
+def prometheus_text(engine):
+    # Prometheus text exposition format (version 0.0.4)
+    stats = list(engine.stream_stats.values())
+    out = []
+
+    def metric(name, kind, help_text, lines):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        out.extend(lines)
+
+    metric('mixer_running', 'gauge', "1 while the mixer's streams are open",
+           [f"mixer_running {int(engine.running)}"])
+    metric('mixer_callbacks_total', 'counter', "Stream callbacks run",
+           [f"mixer_callbacks_total{_labels(stream=s.name, kind=s.kind)} {s.callbacks}"
+            for s in stats])
+    metric('mixer_xruns_total', 'counter', "PortAudio under/overflow flags seen in callbacks",
+           [f"mixer_xruns_total{_labels(stream=s.name, kind=s.kind, flag=flag)} {n}"
+            for s in stats for flag, n in s.xruns.items()])
+    for attr, name, help_text in (
+            ('duration', 'mixer_callback_duration_seconds', "Time spent inside the callback"),
+            ('gap', 'mixer_callback_gap_seconds', "Time between consecutive callback starts"),
+            ('load', 'mixer_dsp_load_ratio', "Callback time as a fraction of its block period")):
+        lines = []
+        for s in stats:
+            lines.extend(_histogram_lines(name, getattr(s, attr), {'stream': s.name, 'kind': s.kind}))
+        metric(name, 'histogram', help_text, lines)
+
+    metric('mixer_device_latency_seconds', 'gauge', "Device buffering from stream time info",
+           [f"mixer_device_latency_seconds{_labels(stream=s.name, kind=s.kind)} {s.device_latency!r}"
+            for s in stats])
+    metric('mixer_blocksize_frames', 'gauge', "Engine block size",
+           [f"mixer_blocksize_frames {engine.blocksize}"])
+    if getattr(engine, 'dsp_workers', 0):
+        metric('mixer_dsp_deadline_misses_total', 'counter',
+               "Blocks mixed without inputs whose DSP worker ran late",
+               [f"mixer_dsp_deadline_misses_total {engine.deadline_misses}"])
+        metric('mixer_input_late_blocks_total', 'counter', "Blocks an input was left out of the mix",
+               [f"mixer_input_late_blocks_total{_labels(input=f'input{i}')} {n}"
+                for i, n in enumerate(engine.late_blocks)])
+    probe = getattr(engine, 'last_loopback', None)
+    if probe is not None and probe.get('median') is not None:
+        metric('mixer_loopback_latency_seconds', 'gauge', "Last measured loopback round trip",
+               [f"mixer_loopback_latency_seconds {probe['median']!r}"])
+
+    reductions = [(f"input{i}", db) for i, db in enumerate(engine.compressors.reduction.last)]
+    if engine.limiter is not None:
+        reductions += [(f"output{i}", db) for i, db in enumerate(engine.limiter.reduction.last)]
+    metric('mixer_gain_reduction_db', 'gauge', "Most compressor/limiter gain reduction in the last block",
+           [f"mixer_gain_reduction_db{_labels(stage=n)} {float(db)!r}" for n, db in reductions])
+
+    recorder = getattr(engine, 'recorder', None)
+    if recorder is not None:
+        taps = recorder.stats()
+        metric('mixer_recorder_frames_total', 'counter', "Frames written to the recording",
+               [f"mixer_recorder_frames_total{_labels(tap=n)} {t['frames']}" for n, t in taps.items()])
+        metric('mixer_recorder_queued_frames', 'gauge', "Frames waiting for the writer thread",
+               [f"mixer_recorder_queued_frames{_labels(tap=n)} {t['queued']}" for n, t in taps.items()])
+        metric('mixer_recorder_overflows_total', 'counter', "Blocks dropped because the queue was full",
+               [f"mixer_recorder_overflows_total{_labels(tap=n)} {t['overflows']}"
+                for n, t in taps.items()])
+
+    net_stats = getattr(engine.backend, 'stats', None)
+    if net_stats is not None:
+        streams = net_stats()
+        receiving = {n: s for n, s in streams.items() if 'jitter_ms' in s}
+        sending = {n: s for n, s in streams.items() if 'jitter_ms' not in s}
+        metric('mixer_net_packets_total', 'counter', "RTP packets sent or received",
+               [f"mixer_net_packets_total{_labels(stream=n)} {s['packets']}"
+                for n, s in streams.items()])
+        metric('mixer_net_dropped_packets_total', 'counter', "RTP packets the socket refused",
+               [f"mixer_net_dropped_packets_total{_labels(stream=n)} {s['dropped_packets']}"
+                for n, s in sending.items()])
+        metric('mixer_net_lost_frames_total', 'counter', "Frames played as silence, never received",
+               [f"mixer_net_lost_frames_total{_labels(stream=n)} {s['lost_frames']}"
+                for n, s in receiving.items()])
+        metric('mixer_net_jitter_seconds', 'gauge', "RTP interarrival jitter estimate",
+               [f"mixer_net_jitter_seconds{_labels(stream=n)} {s['jitter_ms'] / 1000!r}"
+                for n, s in receiving.items()])
+        metric('mixer_net_delay_seconds', 'gauge', "Jitter buffer delay",
+               [f"mixer_net_delay_seconds{_labels(stream=n)} {s['delay_ms'] / 1000!r}"
+                for n, s in receiving.items()])
+
+    paths = [(f"input{i}", p) for i, p in enumerate(engine.input_paths) if p is not None]
+    paths += [(f"output{i}", p) for i, p in enumerate(engine.output_paths) if p is not None]
+    ring_stats = [(name, p.stats()) for name, p in paths]
+    metric('mixer_ring_fill_frames', 'gauge', "Frames queued in the stream's ring",
+           [f"mixer_ring_fill_frames{_labels(path=n)} {s['fill']}" for n, s in ring_stats])
+    metric('mixer_ring_underruns_total', 'counter', "Reads that found the ring short",
+           [f"mixer_ring_underruns_total{_labels(path=n)} {s['underruns']}" for n, s in ring_stats])
+    metric('mixer_ring_overruns_total', 'counter', "Writes that found the ring full",
+           [f"mixer_ring_overruns_total{_labels(path=n)} {s['overruns']}" for n, s in ring_stats])
+    metric('mixer_drift_correction_ppm', 'gauge', "Resampler ratio trim from drift control",
+           [f"mixer_drift_correction_ppm{_labels(path=n)} {s['correction_ppm']!r}"
+            for n, s in ring_stats if 'correction_ppm' in s])
+    return '\n'.join(out) + '\n'
+
+
+class StatsServer:
+    # Local HTTP endpoint serving prometheus_text(engine) on /metrics
+    def __init__(self, engine, host='127.0.0.1', port=9464):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        engine = self.engine
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = prometheus_text(engine).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
@@ -0,0 +1,54 @@
+import os
+import sys
+
+# The mixer is a set of flat modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import contextlib  # noqa: E402
+import io  # noqa: E402
+
+import numpy as np  # noqa: E402
+
+from audio_backend import CaptureSink, SyntheticBackend  # noqa: E402
+from mixer_engine import MixerEngine  # noqa: E402
+from wavio import open_wav, to_float32  # noqa: E402
+
+
+def read_wav(path):
+    # (WavInfo, float32 frames) of a file the mixer wrote
+    info, raw = open_wav(str(path))
+    data = np.zeros((info.frames, info.channels), dtype=np.float32)
+    to_float32(raw, info.bits, data)
+    return info, data
+
+
+def run_engine(sources, routes, blocks=200, setup=None, blocksize=512):
+    # Pull-mode engine on synthetic devices, every input at fader 1.0 (unity
+    # gain); routes: (input, output) pairs. Returns the engine (stopped)
+    # and one capture sink per output.
+    sinks = [CaptureSink(), CaptureSink()]
+    backend = SyntheticBackend(sources=sources, sinks=sinks)
+    engine = MixerEngine(backend, num_inputs=len(sources), num_outputs=len(sinks),
+                         blocksize=blocksize, scheduling='pull')
+    engine.set_devices([(i, None) for i in range(len(sources))],
+                       [(len(sources) + o, None) for o in range(len(sinks))])
+    for i in range(len(sources)):
+        engine.set_level(i, 1.0)
+    for i, o in routes:
+        engine.set_route(i, o, True)
+    if setup is not None:
+        setup(engine)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.start()
+        backend.pump(blocks)
+        engine.stop()
+    return engine, sinks
+
+
+def settled(sink, seconds=1.0):
+    data = sink.data()
+    return data[-int(seconds * 48000):]
+
+
+def rms(data):
+    return float(np.sqrt(np.mean(np.square(data, dtype=np.float64))))
@@ -0,0 +1,15 @@
+import pytest
+
+import bench
+
+
+@pytest.mark.parametrize('options', [
+    {'compress': True},
+    {'drift_compensation': True},
+    {'dsp_workers': 1},
+], ids=['compress', 'resample', 'workers'])
+def test_steady_state_does_not_allocate(options):
+    # Same check as bench.py --check-alloc (128 and 256 frames), on a small
+    # configuration
+    result = bench.check_alloc(inputs=2, outputs=2, tone='on', **options)
+    assert not bench.allocates(result), result
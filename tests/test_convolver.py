@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import convolver
+from convolver import ImpulseResponse, PartitionedConvolver
+
+
+def convolve_blocks(ir, signal, block):
+    conv = PartitionedConvolver(ir, block, signal.shape[1])
+    out = np.zeros_like(signal)
+    for start in range(0, len(signal), block):
+        conv.process(signal[start:start + block], out[start:start + block])
+    return out
+
+
+@pytest.mark.parametrize('fft_out', [True, False], ids=['fft-out', 'fft-alloc'])
+@pytest.mark.parametrize('taps', [1, 64, 65, 200, 1000])
+def test_matches_direct_convolution(taps, fft_out, monkeypatch):
+    # Responses shorter than, equal to and spanning several 64-frame
+    # partitions, mono response on two channels
+    monkeypatch.setattr(convolver, 'FFT_OUT', fft_out)
+    rng = np.random.default_rng(taps)
+    response = rng.standard_normal(taps).astype(np.float32) * 0.1
+    signal = rng.standard_normal((64 * 40, 2)).astype(np.float32)
+    out = convolve_blocks(ImpulseResponse(response, 48000), signal, 64)
+    for ch in range(2):
+        expected = np.convolve(signal[:, ch].astype(np.float64), response)[:len(signal)]
+        assert np.abs(out[:, ch] - expected).max() < 1e-4
+
+
+def test_stereo_response_per_channel():
+    rng = np.random.default_rng(3)
+    response = rng.standard_normal((300, 2)).astype(np.float32) * 0.1
+    signal = rng.standard_normal((128 * 10, 2)).astype(np.float32)
+    out = convolve_blocks(ImpulseResponse(response, 48000), signal, 128)
+    for ch in range(2):
+        expected = np.convolve(signal[:, ch], response[:, ch])[:len(signal)]
+        assert np.abs(out[:, ch] - expected).max() < 1e-4
+
+
+@pytest.mark.parametrize('rate', [44100, 96000])
+def test_resampled_keeps_gain_and_length(rate):
+    # A lowpass FIR (unit DC gain) at 48 kHz, taken to another rate
+    taps = 201
+    n = np.arange(taps) - taps // 2
+    response = np.sinc(n * 0.25) * np.hanning(taps)
+    response /= response.sum()
+    ir = ImpulseResponse(response, 48000)
+    moved = ir.resampled(rate)
+    assert moved.samplerate == rate
+    assert abs(moved.taps.sum() - 1) < 1e-3
+    # The interpolation kernel (32 taps at the response's rate) rings on
+    # both sides: at most that much longer, and the peak at most its
+    # leading half later
+    kernel = 32 * rate / 48000
+    extra = len(moved.taps) - len(response) * rate / 48000
+    assert 0 <= extra <= kernel + 2
+    shift = np.argmax(moved.taps[:, 0]) - (taps // 2) * rate / 48000
+    assert -1 <= shift <= kernel / 2 + 1
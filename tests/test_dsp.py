@@ -0,0 +1,34 @@
+import numpy as np
+
+import dsp
+
+
+def filter_blocks(signal, block=256):
+    tone = dsp.ToneFilter(48000, signal.shape[1])
+    out = np.zeros_like(signal)
+    for start in range(0, len(signal), block):
+        tone.process(signal[start:start + block], 6, -4, 3, out=out[start:start + block])
+    return out
+
+
+def test_in_place_kernel_is_found():
+    dsp.scipy_signal()
+    assert dsp._sosfilt is not None
+
+
+def test_fallback_filters_the_same(monkeypatch):
+    # Without SciPy's private kernel the tone stack uses signal.sosfilt
+    dsp.scipy_signal()
+    signal = np.random.default_rng(4).standard_normal((256 * 20, 2)).astype(np.float32) * 0.1
+    kernel = filter_blocks(signal)
+    monkeypatch.setattr(dsp, '_sosfilt', None)
+    fallback = filter_blocks(signal)
+    assert np.abs(kernel).max() > 0
+    assert np.abs(kernel - fallback).max() < 1e-5
+
+
+def test_probe_reports_a_missing_kernel(monkeypatch, capsys):
+    import scipy.signal._sosfilt as module
+    monkeypatch.delattr(module, '_sosfilt')
+    assert dsp._probe_sosfilt() is None
+    assert "allocates per block" in capsys.readouterr().out
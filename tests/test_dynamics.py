@@ -0,0 +1,30 @@
+import numpy as np
+
+from audio_backend import SineSource
+from conftest import rms, run_engine, settled
+
+
+def test_bus_level_does_not_depend_on_other_routes():
+    # Routing a silent second input to the bus leaves the first one's level
+    _, alone = run_engine([SineSource(1000, amplitude=0.5)], [(0, 0)])
+    _, shared = run_engine([SineSource(1000, amplitude=0.5), SineSource(1000, amplitude=0.0)],
+                           [(0, 0), (1, 0)])
+    assert abs(rms(settled(alone[0])) - rms(settled(shared[0]))) < 1e-4
+
+
+def test_limiter_holds_the_ceiling():
+    _, sinks = run_engine([SineSource(1000, amplitude=1.0), SineSource(1000, amplitude=1.0)],
+                          [(0, 0), (1, 0)])
+    peak_db = 20 * np.log10(np.abs(settled(sinks[0])).max())
+    assert -1.5 < peak_db <= -1.0 + 1e-3
+
+
+def test_compressor_gain_reduction():
+    # A -6 dBFS sine, 14 dB over a -20 dB threshold at 4:1: 10.5 dB down
+    def setup(engine):
+        engine.set_compressor(0, threshold=-20, ratio=4)
+    engine, sinks = run_engine([SineSource(1000, amplitude=0.5)], [(0, 0)], setup=setup)
+    reduction, _ = engine.gain_reduction()
+    assert abs(reduction[0] - 10.5) < 0.3
+    expected = 0.5 / np.sqrt(2) * 10 ** (-10.5 / 20)
+    assert abs(rms(settled(sinks[0])) / expected - 1) < 0.05
@@ -0,0 +1,78 @@
+import contextlib
+import io
+
+import numpy as np
+
+from audio_backend import CaptureSink, SineSource, SyntheticBackend
+from conftest import rms, run_engine, settled
+from mixer_engine import MixerEngine
+
+
+def test_routed_input_reaches_only_its_bus():
+    _, sinks = run_engine([SineSource(1000, amplitude=0.5)], [(0, 0)])
+    assert abs(rms(settled(sinks[0])) - 0.5 / np.sqrt(2)) < 0.005
+    assert np.abs(sinks[1].data()).max() == 0
+
+
+def test_input_swap_crossfades_and_gets_its_own_stats():
+    sink = CaptureSink()
+    backend = SyntheticBackend(sources=[SineSource(440, amplitude=0.5), SineSource(440, amplitude=0.5)],
+                               sinks=[sink])
+    engine = MixerEngine(backend, num_inputs=1, num_outputs=1, blocksize=512, scheduling='pull',
+                         limiter=False)
+    engine.set_devices([(0, None)], [(2, None)])
+    engine.set_level(0, 1.0)
+    engine.set_route(0, 0, True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.start()
+        backend.pump(50)
+        old = engine.stream_stats['input0']
+        assert engine.set_devices([(1, None)], None) == [('input', 0)]
+        backend.pump(50)
+        engine.release_swaps()
+        new = engine.stream_stats['input0']
+        closed_at = old.callbacks
+        backend.pump(20)
+        engine.stop()
+    # Published once the old stream is closed: a new object, which took over
+    # the old counters, while the old one stopped counting
+    assert new is not old
+    assert old.callbacks == closed_at
+    assert new.callbacks > closed_at + 20
+    # Over the one-block crossfade (sources out of phase) the output never
+    # steps: no sample moves further than the sine's own slope allows
+    data = sink.data()[:, 0]
+    data = data[np.flatnonzero(data)[0]:]
+    assert np.abs(np.diff(data)).max() < 0.5 * 2 * np.pi * 440 / 48000 + 0.005
+
+
+class ConstantSource(SineSource):
+    def read(self, frames, channels, samplerate):
+        return np.full((frames, channels), self.amplitude, dtype=np.float32)
+
+
+def test_gain_change_ramps_over_one_block():
+    sink = CaptureSink()
+    backend = SyntheticBackend(sources=[ConstantSource(amplitude=0.5)], sinks=[sink])
+    engine = MixerEngine(backend, num_inputs=1, num_outputs=1, blocksize=512, scheduling='pull',
+                         limiter=False)
+    engine.set_devices([(0, None)], [(1, None)])
+    engine.set_level(0, 1.0)
+    engine.set_route(0, 0, True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.start()
+        backend.pump(20)
+        engine.set_level(0, 0.5)
+        backend.pump(5)
+        engine.stop()
+    blocks = sink.data()[:, 0].reshape(-1, 512)
+    changed = [k for k, block in enumerate(blocks) if block[0] != block[-1]]
+    assert len(changed) == 1
+    k = changed[0]
+    before, after = blocks[k - 1][-1], blocks[k + 1][0]
+    assert before == 0.5 and after < before
+    # Straight from the old gain to the new one across the block, then held
+    ramp = before + (after - before) * np.arange(1, 513) / 512
+    assert np.abs(blocks[k] - ramp).max() < 1e-6
+    assert np.all(blocks[k + 1:] == after)
+    assert np.all(blocks[k - 5:k] == before)
@@ -0,0 +1,124 @@
+import socket
+import time
+
+import numpy as np
+import pytest
+
+from netaudio import JitterBuffer, NetEndpoint, RtpPacketizer, RtpReceiver, RtpSender
+
+RATE = 48000
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def put_block(jitter, ts, block, packet, arrival, order=None, drop=()):
+    # One sender block as packets sent back to back; order permutes them
+    packets = range(0, len(block), packet)
+    if order is not None:
+        packets = [packets[k] for k in order]
+    for start in packets:
+        if start // packet not in drop:
+            jitter.put(ts + start, block[start:start + packet], arrival)
+            arrival += 1e-6
+
+
+def stream(jitter, blocks, packet, delays=None, order=None, drop=None):
+    # A sender's blocks of jitter.block frames, each put a block period
+    # (plus delays[k]) apart and followed by one block of playout; returns
+    # what was sent and what played
+    frames = jitter.block
+    sent = np.arange(1, 1 + blocks * frames, dtype=np.float32)[:, None].repeat(jitter.channels, 1)
+    played = np.zeros_like(sent)
+    for k in range(blocks):
+        arrival = k * frames / RATE + (delays[k] if delays is not None else 0)
+        put_block(jitter, 1000 + k * frames, sent[k * frames:(k + 1) * frames], packet, arrival,
+                  order, drop(k) if drop is not None else ())
+        jitter.get(played[k * frames:(k + 1) * frames])
+    return sent, played
+
+
+def test_reordered_packets_play_in_order_and_lost_ones_as_silence():
+    jitter = JitterBuffer(1, RATE, 128)
+    sent, played = stream(jitter, 20, 32, order=[0, 2, 1, 3],
+                          drop=lambda k: {1} if k == 5 else ())
+    # Playout starts the target behind the first packet's end
+    lead = jitter.target() - 32
+    assert np.all(played[:lead] == 0)
+    expected = sent[:len(sent) - lead, 0].copy()
+    expected[128 * 5 + 32:128 * 5 + 64] = 0
+    assert np.array_equal(played[lead:, 0], expected)
+    stats = jitter.stats()
+    assert stats['lost_frames'] == lead + 32
+    assert stats['skips'] == stats['underruns'] == stats['late_packets'] == 0
+
+
+def test_block_bursts_are_not_jitter():
+    # Blocks of 8 packets sent at once, right on the block clock: no jitter
+    steady = JitterBuffer(2, RATE, 1024)
+    stream(steady, 200, 128)
+    assert steady.stats()['jitter_ms'] < 0.01
+    assert steady.target() == 1024 + 128
+    # Each block 0 or 1 ms late at random: J is around the mean step,
+    # 0.5 ms, and nowhere near the 2.7 ms a burst's packets span
+    late = JitterBuffer(2, RATE, 1024)
+    stream(late, 2000, 128, delays=np.random.default_rng(0).integers(2, size=2000) * 1e-3)
+    assert 0.2 < late.stats()['jitter_ms'] < 0.8
+    assert late.target() == 1024 + 128 + int(4 * late.jitter)
+
+
+def test_fill_holds_at_the_target():
+    jitter = JitterBuffer(2, RATE, 256)
+    stream(jitter, 100, 128)
+    stats = jitter.stats()
+    assert stats['skips'] == 0 and stats['underruns'] == 0
+    assert stats['lost_frames'] == jitter.target() - 128  # Only the lead-in
+    # Anchored on the first packet's end: after each get the rest of that
+    # block (a packet) plus the target, less the block just played
+    assert jitter.newest_end - jitter.read_ts == jitter.target() + 128 - 256
+
+
+class Received:
+    # Stands in for the JitterBuffer behind an RtpReceiver: keeps copies
+    def __init__(self, channels):
+        self.channels = channels
+        self.packets = []
+
+    def put(self, ts, samples, arrival):
+        self.packets.append((ts, samples.copy()))
+
+
+@pytest.mark.parametrize('fmt', ['float32', 'int24'])
+def test_localhost_loopback(fmt):
+    endpoint = NetEndpoint('input', '127.0.0.1', free_port(), fmt)
+    received = Received(2)
+    receiver = RtpReceiver(endpoint, received, "test-recv")
+    block = np.zeros((1024, 2), dtype=np.float32)
+    packetizer = RtpPacketizer(block, fmt)
+    sender = RtpSender('127.0.0.1', endpoint.port, packetizer)
+    first_ts = packetizer.timestamp
+    rng = np.random.default_rng(2)
+    sent = (rng.uniform(-1, 1, (20 * 1024, 2)) * 0.9).astype(np.float32)
+    try:
+        for k in range(20):
+            block[:] = sent[k * 1024:(k + 1) * 1024]
+            sender.send()
+            time.sleep(0.002)
+        deadline = time.perf_counter() + 2.0
+        while len(received.packets) < sender.packets_sent and time.perf_counter() < deadline:
+            time.sleep(0.01)
+    finally:
+        sender.close()
+        receiver.close()
+
+    assert sender.dropped == 0 and receiver.invalid == 0
+    assert len(received.packets) == sender.packets_sent == 20 * packetizer.packets
+    got = np.zeros_like(sent)
+    for ts, samples in received.packets:
+        start = (ts - first_ts) & 0xFFFFFFFF
+        got[start:start + len(samples)] = samples
+    tolerance = 0 if fmt == 'float32' else 1 / 8388608
+    assert np.abs(got - sent).max() <= tolerance
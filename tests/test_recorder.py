@@ -0,0 +1,35 @@
+import contextlib
+import io
+
+import numpy as np
+
+from audio_backend import CaptureSink, SineSource, SyntheticBackend
+from conftest import read_wav
+from mixer_engine import MixerEngine
+
+
+def test_recording_matches_what_played(tmp_path):
+    sink = CaptureSink()
+    backend = SyntheticBackend(sources=[SineSource(440, amplitude=0.5)], sinks=[sink])
+    engine = MixerEngine(backend, num_inputs=1, num_outputs=1, blocksize=512, scheduling='pull')
+    engine.set_devices([(0, None)], [(1, None)])
+    engine.set_level(0, 1.0)
+    engine.set_route(0, 0, True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.start()
+        backend.pump(20)
+        engine.start_recording(str(tmp_path), session=False)
+        backend.pump(100)
+        stats = engine.stop_recording()
+        engine.stop()
+    assert all(tap['overflows'] == 0 for tap in stats.values())
+
+    info, bus = read_wav(tmp_path / "A1.wav")
+    assert info.samplerate == 48000 and len(bus) > 0
+    # The bus file holds exactly the blocks the device got while recording
+    played = sink.data()
+    assert np.array_equal(bus, played[len(played) - len(bus):])
+
+    _, recorded_input = read_wav(tmp_path / "in1.wav")
+    assert len(recorded_input) == len(bus)
+    assert abs(np.abs(recorded_input).max() - 0.5) < 1e-3
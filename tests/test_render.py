@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+
+import render
+from conftest import read_wav
+from wavio import create_wav
+
+RATE = 48000
+
+
+def write_wav(path, data):
+    out = create_wav(str(path), RATE, data.shape[1], len(data))
+    out[:] = data
+    out.flush()
+
+
+def render_preset(tmp_path, preset, chunk, name):
+    path = tmp_path / f"{name}.json"
+    path.write_text(json.dumps(preset))
+    render.render(str(path), str(tmp_path / name), chunk=chunk, jobs=1)
+    return read_wav(tmp_path / name / "A1.wav")[1]
+
+
+def test_output_does_not_depend_on_chunk_size(tmp_path):
+    rng = np.random.default_rng(1)
+    frames = 60000
+    swell = np.sin(np.arange(frames) / 3000)[:, None] ** 2
+    write_wav(tmp_path / "noise.wav", (rng.standard_normal((frames, 2)) * 0.3 * swell)
+              .astype(np.float32))
+    preset = {"outputs": 1, "inputs": [{
+        "file": "noise.wav", "level": 1.0, "treble": 3, "routes": ["A1"],
+        "compressor": {"threshold": -30, "ratio": 6, "attack": 0.5, "release": 50}}]}
+    small = render_preset(tmp_path, preset, 1000, "small")
+    large = render_preset(tmp_path, preset, 65536, "large")
+    assert len(small) == len(large) == frames
+    assert np.abs(small - large).max() < 1e-6
+
+
+def test_limiter_delay_is_taken_out(tmp_path):
+    frames = 20000
+    data = np.zeros((frames, 2), dtype=np.float32)
+    data[5000] = 0.3
+    data[10000:12000] = 1.5
+    write_wav(tmp_path / "click.wav", data)
+    preset = {"outputs": 1, "inputs": [{"file": "click.wav", "level": 1.0, "routes": ["A1"]}]}
+    out = render_preset(tmp_path, preset, 4096, "out")
+    assert len(out) == frames
+    assert np.argmax(np.abs(out[:8000, 0])) == 5000
+    assert 20 * np.log10(np.abs(out).max()) <= -1.0 + 1e-3
@@ -0,0 +1,78 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from audio_backend import CaptureSink, SineSource, SyntheticBackend
+from mixer_engine import MixerEngine
+from resampler import StreamingResampler
+
+
+def resample_sine(freq, ratio=44100 / 48000, rate=44100, blocks=40, frames=1024):
+    r = StreamingResampler(1, ratio, max_frames=frames)
+    x = np.sin(2 * np.pi * freq * np.arange(int(blocks * frames * ratio) + 100) / rate)
+    x = x.astype(np.float32)[:, None]
+    out = np.zeros((blocks * frames, 1), dtype=np.float32)
+    pos = 0
+    for b in range(blocks):
+        needed = r.frames_needed(frames)
+        r.process(x[pos:pos + needed], out[b * frames:(b + 1) * frames])
+        pos += needed
+    return out[200:, 0], (np.arange(200, blocks * frames) * ratio - (r.half - 1)) / rate
+
+
+@pytest.mark.parametrize('freq', [1000.0, 10000.0, 18000.0])
+def test_conversion_error_is_70_db_down(freq):
+    # 44.1 -> 48 kHz; the error left after fitting the ideal sine (any
+    # gain and phase) is the interpolation and phase quantization error
+    y, t = resample_sine(freq)
+    basis = np.stack([np.sin(2 * np.pi * freq * t), np.cos(2 * np.pi * freq * t)], axis=1)
+    fit = basis @ np.linalg.lstsq(basis, y, rcond=None)[0]
+    snr = 10 * np.log10(np.sum(fit ** 2) / np.sum((y - fit) ** 2))
+    assert snr > 70
+
+
+def test_consumes_ratio_frames_per_output_frame():
+    r = StreamingResampler(2, 1.25, max_frames=512)
+    out = np.zeros((512, 2), dtype=np.float32)
+    consumed = 0
+    for _ in range(100):
+        needed = r.frames_needed(512)
+        r.process(np.zeros((needed, 2), dtype=np.float32), out)
+        consumed += needed
+    assert abs(consumed - 100 * 512 * 1.25) <= r.taps
+
+
+def run_drifting(ppm, seconds=30, blocksize=256):
+    # The input and the second output run ppm fast against the master
+    # output, which mixes: both paths start as straight copies in 'auto'
+    backend = SyntheticBackend(sources=[SineSource(440, amplitude=0.5, drift_ppm=ppm)],
+                               sinks=[CaptureSink(), CaptureSink(drift_ppm=-ppm)])
+    engine = MixerEngine(backend, num_inputs=1, num_outputs=2, blocksize=blocksize,
+                         scheduling='pull', limiter=False)
+    engine.set_devices([(0, None)], [(1, None), (2, None)])
+    engine.set_level(0, 1.0)
+    engine.set_route(0, 0, True)
+    engine.set_route(0, 1, True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.start()
+        backend.pump(int(seconds * 48000 / blocksize))
+        engine.stop()
+    return engine, backend.sinks
+
+
+@pytest.mark.parametrize('ppm', [300, -300])
+def test_auto_drift_engages_and_tracks(ppm):
+    engine, sinks = run_drifting(ppm)
+    paths = [engine.input_ring_stats()[0], engine.output_ring_stats()[1]]
+    for stats in paths:
+        assert stats['underruns'] == 0 and stats['overruns'] == 0
+        assert abs(stats['correction_ppm'] - ppm) < 30
+    # No gap or step anywhere, the switch included: a 440 Hz sine at 0.5
+    # changes its slope by at most 0.5 * w**2 per frame
+    bound = 0.5 * (2 * np.pi * 440 / 48000) ** 2
+    for sink in sinks:
+        data = sink.data()[:, 0]
+        data = data[np.flatnonzero(data)[0]:]
+        assert np.abs(np.diff(data, 2)).max() < 1.1 * bound
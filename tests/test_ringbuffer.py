@@ -0,0 +1,70 @@
+import numpy as np
+
+from ringbuffer import RingBuffer
+
+
+def frames(start, count, channels=2):
+    return np.arange(start, start + count, dtype=np.float32)[:, None].repeat(channels, 1)
+
+
+def test_reads_wrap_around_in_order():
+    ring = RingBuffer(100, 2)
+    out = np.zeros((30, 2), dtype=np.float32)
+    written = 0
+    for k in range(20):
+        ring.write(frames(written, 30))
+        written += 30
+        assert ring.read(out) == 30
+        assert np.array_equal(out, frames(k * 30, 30))
+    assert ring.write_pos == ring.read_pos == 600
+    assert ring.underruns == ring.overruns == 0
+
+
+def test_fill_level():
+    ring = RingBuffer(64, 2)
+    ring.write(frames(0, 48))
+    assert ring.fill() == 48 and ring.fill_level() == 0.75
+    ring.read(np.zeros((16, 2), dtype=np.float32))
+    assert ring.fill() == 32 and ring.fill_level() == 0.5
+
+
+def test_overrun_drops_what_does_not_fit():
+    ring = RingBuffer(64, 2)
+    assert ring.write(frames(0, 50)) == 50
+    assert ring.write(frames(50, 30)) == 14
+    assert ring.overruns == 1 and ring.dropped_frames == 16
+    out = np.zeros((64, 2), dtype=np.float32)
+    ring.read(out)
+    # The oldest frames are kept, the newest dropped
+    assert np.array_equal(out, frames(0, 64))
+
+
+def test_underrun_pads_with_silence_and_waits_for_the_prefill():
+    ring = RingBuffer(64, 1, prefill=16)
+    out = np.ones((8, 1), dtype=np.float32)
+    ring.write(frames(1, 10, 1))
+    # Not primed yet: silence, nothing consumed
+    assert ring.read(out) == 0 and np.all(out == 0) and ring.fill() == 10
+    ring.write(frames(11, 10, 1))
+    assert ring.read(out) == 8
+    assert ring.read(out) == 8
+    # 4 left for 8: an underrun, padded with silence
+    assert ring.read(out) == 4
+    assert np.array_equal(out[:4, 0], [17, 18, 19, 20]) and np.all(out[4:] == 0)
+    assert ring.underruns == 1 and ring.missing_frames == 4
+    # It primes again before playing on
+    ring.write(frames(21, 8, 1))
+    assert ring.read(out) == 0 and ring.underruns == 1
+    ring.write(frames(29, 8, 1))
+    assert ring.read(out) == 8 and out[0, 0] == 21
+
+
+def test_read_view_stops_at_the_wrap():
+    ring = RingBuffer(10, 1)
+    ring.write(frames(0, 8, 1))
+    ring.advance(6)
+    ring.write(frames(8, 6, 1))
+    first = ring.read_view()
+    assert np.array_equal(first[:, 0], [6, 7, 8, 9])
+    ring.advance(len(first))
+    assert np.array_equal(ring.read_view(max_frames=3)[:, 0], [10, 11, 12])
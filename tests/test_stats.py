@@ -0,0 +1,64 @@
+import re
+import types
+
+from audio_backend import SineSource
+from conftest import run_engine
+from stats import Histogram, StreamStats, prometheus_text
+
+
+def test_histogram_buckets_are_upper_bounds():
+    hist = Histogram((1.0, 2.0, 5.0))
+    for value in (0.5, 1.0, 1.5, 2.0, 4.0, 9.0):
+        hist.observe(value)
+    # A value equal to a bound counts in that bound's bucket (Prometheus le)
+    assert list(hist.counts) == [2, 2, 1, 1]
+    assert list(hist.cumulative()) == [(1.0, 2), (2.0, 4), (5.0, 5), (float('inf'), 6)]
+    assert hist.count == 6 and hist.sum == 18.0
+    assert hist.quantile(0.5) == 2.0 and hist.quantile(1.0) == float('inf')
+
+
+def test_histogram_merge_and_reset():
+    a, b = Histogram((1.0,)), Histogram((1.0,))
+    a.observe(0.5)
+    b.observe(3.0)
+    b.observe(0.2)
+    a.merge(b)
+    assert list(a.counts) == [2, 1] and a.count == 3 and a.sum == 3.7
+    a.reset()
+    assert list(a.counts) == [0, 0] and a.count == 0 and a.quantile(0.5) == 0.0
+
+
+def test_stream_stats_record_and_carry():
+    old = StreamStats('input0', 'input', 48000)
+    old.record(0.0, 0.001, 480, types.SimpleNamespace(input_overflow=True))
+    new = StreamStats('input0', 'input', 48000)
+    new.carry = old
+    new.record(0.01, 0.0125, 480, None)
+    assert new.carry is None
+    assert new.callbacks == 2 and new.xruns['input_overflow'] == 1 and new.total_xruns() == 1
+    # Load: time in the callback over the block's period (10 ms)
+    assert abs(new.max_load - 0.25) < 1e-9 and new.load.count == 2
+
+
+def test_prometheus_text_format():
+    engine, _ = run_engine([SineSource(1000)], [(0, 0)], blocks=20)
+    text = prometheus_text(engine)
+    assert text.endswith('\n')
+    sample = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? \S+$')
+    described = set()
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            described.add(line.split()[2])
+        elif line.startswith('# TYPE '):
+            name, kind = line.split()[2:]
+            assert name in described and kind in ('gauge', 'counter', 'histogram')
+        else:
+            assert sample.match(line), line
+            assert re.sub(r'_(bucket|sum|count)$', '', line.split('{')[0].split()[0]) in described
+    assert 'mixer_callbacks_total{stream="input0",kind="input"} 20' in text
+    # Histogram buckets are cumulative and end at +Inf == _count
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+               if line.startswith('mixer_callback_duration_seconds_bucket{stream="input0"')]
+    assert buckets == sorted(buckets)
+    assert f'mixer_callback_duration_seconds_count{{stream="input0",kind="input"}} {buckets[-1]}' in text
+    assert 'le="+Inf"' in text
@@ -0,0 +1,27 @@
+import numpy as np
+
+from conftest import read_wav
+from wavio import create_wav, float_wav_header, read_wav_info
+
+
+def test_create_wav_round_trip(tmp_path):
+    data = np.random.default_rng(5).standard_normal((1000, 2)).astype(np.float32)
+    out = create_wav(str(tmp_path / "a.wav"), 44100, 2, len(data))
+    out[:] = data
+    out.flush()
+    info, back = read_wav(tmp_path / "a.wav")
+    assert (info.samplerate, info.channels, info.bits) == (44100, 2, 32)
+    assert np.array_equal(back, data)
+
+
+def test_header_turns_rf64_past_4_gb(tmp_path):
+    # Same header length either way, so the data offset doesn't move
+    small = float_wav_header(48000, 2, 1000)
+    frames = 5 * 2 ** 30 // 8  # 5 GB of stereo float32
+    large = float_wav_header(48000, 2, frames)
+    assert len(large) == len(small)
+    assert small[:4] == b'RIFF' and large[:4] == b'RF64'
+    path = tmp_path / "large.wav"
+    path.write_bytes(large)
+    info = read_wav_info(str(path))
+    assert info.frames == frames and info.data_offset == len(large)
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from workers import BlockWorkerPool, partition
+
+
+class SlowRelease:
+    # A finish lock whose release() is preempted for a while first, the
+    # window where a worker is done with its share but hasn't said so yet
+    def __init__(self, lock, delay):
+        self.lock = lock
+        self.delay = delay
+
+    def acquire(self, *args, **kwargs):
+        return self.lock.acquire(*args, **kwargs)
+
+    def release(self):
+        time.sleep(self.delay)
+        self.lock.release()
+
+
+def test_partition_covers_every_index_once():
+    shares = partition(range(10), 3)
+    assert [len(s) for s in shares] == [4, 3, 3]
+    assert sorted(i for s in shares for i in s) == list(range(10))
+
+
+def test_every_job_runs_once_per_block():
+    runs = [0] * 8
+    pool = BlockWorkerPool(8, 3, lambda i: runs.__setitem__(i, runs[i] + 1))
+    try:
+        for _ in range(50):
+            assert pool.run() == []
+    finally:
+        pool.close()
+    assert runs == [50] * 8
+
+
+def test_missed_deadline_recovers():
+    # Index 1 (the worker's share) overruns one block by far; it is
+    # reported missed until it is done, then the pool is back to normal
+    slow = {'block': 3}
+    blocks = {'n': 0}
+
+    def job(i):
+        if i == 1 and blocks['n'] == slow['block']:
+            time.sleep(0.05)
+
+    pool = BlockWorkerPool(2, 1, job)
+    try:
+        missed = []
+        for n in range(20):
+            blocks['n'] = n
+            missed.append(pool.run(time.perf_counter() + 0.005))
+            time.sleep(0.005)
+        assert missed[slow['block']] == [1]
+        assert missed[-5:] == [[]] * 5
+        assert pool.workers[0].thread.is_alive()
+    finally:
+        pool.close()
+
+
+def test_preempted_finish_does_not_kill_the_worker():
+    # The worker is preempted around releasing its finish token while the
+    # next blocks start, and the calling thread's own share overruns the
+    # deadline so the token isn't collected: the worker must survive
+    errors = []
+    hook = threading.excepthook
+    threading.excepthook = lambda args: errors.append(args.exc_value)
+    pool = BlockWorkerPool(2, 1, lambda i: time.sleep(0.002) if i == 0 else None)
+    worker = pool.workers[0]
+    worker.finished = SlowRelease(worker.finished, 0.02)
+    try:
+        for _ in range(10):
+            pool.run(time.perf_counter())  # Deadline already passed
+        worker.finished = worker.finished.lock
+        time.sleep(0.05)
+        missed = [pool.run(time.perf_counter() + 0.05) for _ in range(5)]
+        assert worker.thread.is_alive()
+        assert errors == []
+        assert missed[-3:] == [[]] * 3
+    finally:
+        pool.close()
+        threading.excepthook = hook
@@ -0,0 +1,156 @@
+import os
+import struct
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavInfo:
+    def __init__(self, path, samplerate, channels, bits, fmt, data_offset, frames):
+        self.path = path
+        self.samplerate = samplerate
+        self.channels = channels
+        self.bits = bits
+        self.format = fmt
+        self.data_offset = data_offset
+        self.frames = frames
+
+
+def read_wav_info(path):
+    with open(path, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff not in (b'RIFF', b'RF64') or wave != b'WAVE':
+            raise ValueError(f"{path}: not a RIFF/WAVE file")
+        fmt = None
+        ds64_data_size = None  # RF64: the real data size lives in ds64
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{path}: no data chunk")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'ds64':
+                body = f.read(size)
+                ds64_data_size = struct.unpack('<Q', body[8:16])[0]
+            elif chunk_id == b'fmt ':
+                body = f.read(size)
+                tag, channels, samplerate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE:
+                    tag = struct.unpack('<H', body[24:26])[0]
+                fmt = (tag, channels, samplerate, bits)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{path}: data chunk before fmt chunk")
+                tag, channels, samplerate, bits = fmt
+                if size == 0xFFFFFFFF and ds64_data_size is not None:
+                    size = ds64_data_size
+                frames = size // (channels * bits // 8)
+                return WavInfo(path, samplerate, channels, bits, tag, f.tell(), frames)
+            else:
+                f.seek(size + (size & 1), 1)
+
+
+def open_wav(path):
+    # Memory-mapped, read-only view of the sample data: (frames, channels)
+    # for 8/16/32-bit PCM and float, (frames, channels, 3) bytes for 24-bit
+    info = read_wav_info(path)
+    if info.format == WAVE_FORMAT_IEEE_FLOAT:
+        dtype = {32: '<f4', 64: '<f8'}[info.bits]
+    elif info.format == WAVE_FORMAT_PCM:
+        dtype = {8: 'u1', 16: '<i2', 24: 'u1', 32: '<i4'}[info.bits]
+    else:
+        raise ValueError(f"{path}: unsupported WAV format {info.format}")
+    shape = (info.frames, info.channels, 3) if info.bits == 24 else (info.frames, info.channels)
+    data = np.memmap(path, dtype=dtype, mode='r', offset=info.data_offset, shape=shape)
+    return info, data
+
+
+def to_float32(raw, bits, out):
+    # Convert a chunk of raw samples from open_wav() into float32 out
+    if raw.dtype.kind == 'f':
+        out[:] = raw
+    elif bits == 8:
+        np.subtract(raw, 128, out=out, dtype=np.float32)
+        out *= 1 / 128
+    elif bits == 24:
+        x = (raw[..., 0].astype(np.int32) | (raw[..., 1].astype(np.int32) << 8)
+             | (raw[..., 2].astype(np.int32) << 16))
+        x <<= 8
+        x >>= 8
+        np.multiply(x, 1 / (1 << 23), out=out, casting='unsafe')
+    else:
+        np.multiply(raw, 1 / (1 << (bits - 1)), out=out, casting='unsafe')
+    return out
+
+
+def float_wav_header(samplerate, channels, frames, junk_size=28):
+    # float32 WAV header whose JUNK chunk keeps room for an RF64 ds64 chunk:
+    # past 4 GB the same number of bytes says RF64 instead, so the data
+    # starts at the same offset either way
+    block_align = channels * 4
+    data_size = frames * block_align
+    fmt_chunk = struct.pack('<4sIHHIIHH', b'fmt ', 16, WAVE_FORMAT_IEEE_FLOAT, channels,
+                            samplerate, samplerate * block_align, block_align, 32)
+    tail_size = len(fmt_chunk) + 12 + 8  # fmt, fact, data headers
+    riff_size = 4 + 8 + junk_size + tail_size + data_size
+    if riff_size <= 0xFFFFFFFF:
+        return (struct.pack('<4sI4s', b'RIFF', riff_size, b'WAVE')
+                + struct.pack('<4sI', b'JUNK', junk_size) + bytes(junk_size)
+                + fmt_chunk + struct.pack('<4sII', b'fact', 4, min(frames, 0xFFFFFFFF))
+                + struct.pack('<4sI', b'data', data_size))
+    return (struct.pack('<4sI4s', b'RF64', 0xFFFFFFFF, b'WAVE')
+            + struct.pack('<4sIQQQI', b'ds64', junk_size, riff_size, data_size, frames, 0)
+            + fmt_chunk + struct.pack('<4sII', b'fact', 4, 0xFFFFFFFF)
+            + struct.pack('<4sI', b'data', 0xFFFFFFFF))
+
+
+def create_wav(path, samplerate, channels, frames):
+    # float32 WAV of a known length (RF64 past 4 GB); returns a writable
+    # (frames, channels) memmap over its data chunk
+    header = float_wav_header(samplerate, channels, frames)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.truncate(len(header) + frames * channels * 4)
+    if frames == 0:
+        return np.zeros((0, channels), dtype=np.float32)
+    return np.memmap(path, dtype='<f4', mode='r+', offset=len(header),
+                     shape=(frames, channels))
+
+
+class WavWriter:
+    # Streaming float32 WAV for recordings of unknown length. The header is
+    # rewritten by update_header(), so the file is readable up to the last
+    # update if the writer never gets to close(). Past 4 GB the header
+    # turns into RF64 in place (float_wav_header).
+    JUNK_SIZE = 28
+
+    def __init__(self, path, samplerate, channels):
+        self.path = path
+        self.samplerate = samplerate
+        self.channels = channels
+        self.frames = 0
+        self.f = open(path, 'wb')
+        self.f.write(self._header())
+
+    def _header(self):
+        return float_wav_header(self.samplerate, self.channels, self.frames, self.JUNK_SIZE)
+
+    def write(self, data):
+        # data: C-contiguous (frames, channels) float32
+        self.f.write(data)
+        self.frames += len(data)
+
+    def update_header(self):
+        # Also pushes everything written so far to the disk
+        pos = self.f.tell()
+        self.f.seek(0)
+        self.f.write(self._header())
+        self.f.seek(pos)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.update_header()
+        self.f.close()
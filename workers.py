@@ -0,0 +1,111 @@
+import threading
+import time
+
+
+def partition(indices, parts):
+    # Split indices into `parts` contiguous shares of near-equal size
+    indices = list(indices)
+    size, extra = divmod(len(indices), parts)
+    shares = []
+    pos = 0
+    for k in range(parts):
+        n = size + (1 if k < extra else 0)
+        shares.append(indices[pos:pos + n])
+        pos += n
+    return shares
+
+
+class _Worker:
+    # wake and finished are plain locks used as one-slot semaphores: unlike
+    # Event.wait(), acquiring a lock allocates nothing per block. A lock
+    # can't be released twice, so the token is always released before
+    # finished_gen says the worker is idle: run() only wakes an idle worker,
+    # after dropping any token left over, so the next release always finds
+    # the lock held.
+    def __init__(self, pool, share, name):
+        self.pool = pool
+        self.share = share
+        self.wake = threading.Lock()
+        self.wake.acquire()
+        self.finished = threading.Lock()
+        self.finished.acquire()
+        self.given_gen = 0
+        self.finished_gen = 0
+        self.thread = threading.Thread(target=self._loop, name=name, daemon=True)
+
+    def busy(self):
+        return self.finished_gen != self.given_gen
+
+    def _loop(self):
+        pool = self.pool
+        while True:
+            self.wake.acquire()
+            if pool.closed:
+                return
+            gen = self.given_gen
+            for i in self.share:
+                pool.job(i)
+                pool.done[i] = gen
+            self.finished.release()
+            self.finished_gen = gen
+
+
+class BlockWorkerPool:
+    # Persistent threads running job(i) for every index 0..count-1 once per
+    # block, over a fixed partition. run() wakes the workers, does the first
+    # share on the calling thread and then waits for the others, up to an
+    # optional deadline (perf_counter time). Only jobs whose heavy lifting
+    # happens in GIL-releasing NumPy/SciPy kernels actually run in parallel.
+    #
+    # A worker that misses the deadline keeps going; its indices are
+    # reported as missed for that block, and so are they for every block
+    # that starts before it is done with the late one.
+    def __init__(self, count, workers, job, name="dsp"):
+        self.count = count
+        self.job = job
+        self.generation = 0
+        self.done = [0] * count  # Generation each index last finished
+        self.closed = False
+        shares = partition(range(count), workers + 1)
+        self.own_share = shares[0]
+        self.workers = [_Worker(self, share, f"{name}-{k}")
+                        for k, share in enumerate(shares[1:], 1) if share]
+        for worker in self.workers:
+            worker.thread.start()
+
+    def run(self, deadline=None):
+        # Returns the indices not finished by the deadline (usually [])
+        self.generation += 1
+        gen = self.generation
+        for worker in self.workers:
+            if not worker.busy():
+                # Drop a finish token a missed deadline left behind
+                worker.finished.acquire(blocking=False)
+                worker.given_gen = gen
+                worker.wake.release()
+        for i in self.own_share:
+            self.job(i)
+            self.done[i] = gen
+        missed = []
+        for worker in self.workers:
+            if worker.given_gen == gen and worker.busy():
+                if deadline is None:
+                    worker.finished.acquire()
+                else:
+                    timeout = deadline - time.perf_counter()
+                    if timeout > 0:
+                        worker.finished.acquire(timeout=timeout)
+            if worker.finished_gen != gen:
+                missed.extend(i for i in worker.share if self.done[i] != gen)
+        return missed
+
+    def close(self):
+        # Busy workers stop after their current block
+        self.closed = True
+        for worker in self.workers:
+            try:
+                worker.wake.release()
+            except RuntimeError:
+                pass  # Woken already and about to see closed
+        for worker in self.workers:
+            worker.thread.join(timeout=1.0)